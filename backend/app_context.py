@@ -0,0 +1,123 @@
+import os
+import random
+import logging
+from typing import Any, Dict, Optional
+
+from shared_store import shared_store
+
+logger = logging.getLogger(__name__)
+
+YIELD_NAMESPACE = "app_yield"
+STATS_NAMESPACE = "app_context_stats"
+# Per-(user, app) yield is forgotten after 30 days without frames
+YIELD_TTL_SECONDS = 30 * 24 * 3600
+# Promise Keeper's own windows (Electron app name/appId, macOS app name/bundle id) never contain new promises
+DEFAULT_SELF_APPS = "promise keeper,promisekeeper,com.promisekeeper.app,com.example.mac.promisekeeper"
+
+
+def app_key(app_name: Optional[str], bundle_id: Optional[str]) -> str:
+    """Stable identifier of the frontmost app: the bundle id when known, else the app name"""
+    return " ".join((bundle_id or app_name or "").lower().split())
+
+
+class AppContextDecision:
+    """Whether a frame from a given app should be extracted at all"""
+    def __init__(self, run: bool, reason: str, app: str = ""):
+        self.run = run
+        self.reason = reason
+        self.app = app
+
+    def __repr__(self) -> str:
+        return f"AppContextDecision(run={self.run}, reason={self.reason!r}, app={self.app!r})"
+
+
+class AppContextPolicy:
+    """
+    Skips frames from apps that, for this user, historically never yield promises.
+
+    Clients send the frontmost app with each frame. Per (user, app) the policy
+    counts frames extracted and frames that had promises. Once an app has
+    enough frames and its yield is below the threshold, its frames are skipped,
+    except for a small exploration rate, so an app that starts yielding
+    (e.g. a new chat feature in an IDE) is noticed. Counts are halved once they
+    reach the window size, so old behavior fades out. Frames without app
+    metadata are always extracted.
+    """
+    def __init__(self):
+        self.enabled = os.getenv("APP_GATE_ENABLED", "true").lower() == "true"
+        self.min_frames = int(os.getenv("APP_GATE_MIN_FRAMES", "40"))
+        self.min_yield = float(os.getenv("APP_GATE_MIN_YIELD", "0.01"))
+        self.explore_rate = float(os.getenv("APP_GATE_EXPLORE_RATE", "0.05"))
+        self.window_frames = int(os.getenv("APP_GATE_WINDOW_FRAMES", "400"))
+        self.self_apps = {app_key(name, None) for name in os.getenv("APP_GATE_SELF_APPS", DEFAULT_SELF_APPS).split(",") if name.strip()}
+
+    def _is_self(self, app_name: Optional[str], bundle_id: Optional[str]) -> bool:
+        return app_key(app_name, None) in self.self_apps or app_key(None, bundle_id) in self.self_apps
+
+    def decide(self, user_id: str, app_name: Optional[str], bundle_id: Optional[str] = None) -> AppContextDecision:
+        key = app_key(app_name, bundle_id)
+        if not key:
+            decision = AppContextDecision(True, "no_app_context")
+        elif self._is_self(app_name, bundle_id):
+            decision = AppContextDecision(False, "self_app", key)
+        elif not self.enabled:
+            decision = AppContextDecision(True, "disabled", key)
+        else:
+            stats = shared_store.get(YIELD_NAMESPACE, f"{user_id}:{key}") or {"frames": 0, "hits": 0}
+            if stats["frames"] < self.min_frames:
+                decision = AppContextDecision(True, "learning", key)
+            elif stats["hits"] / stats["frames"] >= self.min_yield:
+                decision = AppContextDecision(True, "productive", key)
+            elif random.random() < self.explore_rate:
+                decision = AppContextDecision(True, "explore", key)
+            else:
+                decision = AppContextDecision(False, "low_yield", key)
+
+        shared_store.incr(STATS_NAMESPACE, "frames_extracted" if decision.run else "frames_skipped")
+        shared_store.incr(STATS_NAMESPACE, f"reason:{decision.reason}")
+        if not decision.run:
+            logger.info(f"App context - User {user_id} - Skipping frame from {decision.app} ({decision.reason})")
+        return decision
+
+    def record_outcome(self, user_id: str, decision: AppContextDecision, found_promises: bool):
+        """Count an extracted frame, and whether it had promises, towards the app's yield"""
+        if not decision.app or not decision.run:
+            return
+
+        def apply(stats: Optional[Dict[str, Any]]):
+            stats = stats or {"frames": 0, "hits": 0}
+            stats["frames"] += 1
+            stats["hits"] += 1 if found_promises else 0
+            if stats["frames"] >= self.window_frames:
+                stats["frames"] /= 2
+                stats["hits"] /= 2
+            return stats, None
+
+        shared_store.update(YIELD_NAMESPACE, f"{user_id}:{decision.app}", apply, ttl_seconds=YIELD_TTL_SECONDS)
+
+    def user_stats(self, user_id: str) -> Dict[str, Any]:
+        prefix = f"{user_id}:"
+        return {
+            key[len(prefix):]: {**stats, "yield": stats["hits"] / stats["frames"] if stats["frames"] else 0.0}
+            for key, stats in shared_store.items(YIELD_NAMESPACE).items()
+            if key.startswith(prefix)
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters for how many frames were skipped by app context, and why"""
+        counters = shared_store.items(STATS_NAMESPACE)
+        extracted = counters.get("frames_extracted", 0)
+        skipped = counters.get("frames_skipped", 0)
+        total = extracted + skipped
+        return {
+            "enabled": self.enabled,
+            "frames_extracted": extracted,
+            "frames_skipped": skipped,
+            "skipped_ratio": (skipped / total) if total else 0.0,
+            "decisions": {k.split(":", 1)[1]: v for k, v in counters.items() if k.startswith("reason:")},
+            "tracked_apps": shared_store.count(YIELD_NAMESPACE),
+        }
+
+
+# Global instance
+app_context_policy = AppContextPolicy()
@@ -3,6 +3,7 @@ from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from typing import Optional, Dict, Any
 from supabase_config import supabase_config
 from supabase import Client
+from metrics import timed_stage
 
 # Security scheme for Bearer token
 security = HTTPBearer()
@@ -20,7 +21,8 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     
     try:
         # Verify the token and get user info
-        user_data = supabase_config.verify_jwt_token(credentials.credentials)
+        with timed_stage("auth"):
+            user_data = supabase_config.verify_jwt_token(credentials.credentials)
         return user_data
     except HTTPException:
         raise
@@ -0,0 +1,86 @@
+"""
+Backfill promises.due_date for rows that have deadline text but no timestamp:
+rows saved before deadlines were resolved, and rows the clients insert directly.
+
+Rows are read in id order, batch_size at a time (keyset pagination), and each
+batch's timestamps are written with one set_promise_due_dates call
+(migrations/promise_due_dates.sql). Deadlines that can't be resolved stay NULL.
+Safe to re-run.
+
+    python -m backfill_due_dates --batch-size 500
+"""
+import argparse
+import logging
+import time
+from typing import Any, Dict, Optional
+
+from dotenv import load_dotenv
+
+# Before the imports below, which read their settings (e.g. DEFAULT_TIMEZONE) from the environment
+load_dotenv()
+
+from deadlines import deadline_resolver
+from row_codec import decode_json
+from supabase_config import supabase_config
+
+logger = logging.getLogger(__name__)
+
+
+def backfill_due_dates(client: Any, batch_size: int = 500, dry_run: bool = False, max_batches: Optional[int] = None) -> Dict[str, Any]:
+    """Resolve and write due_date for rows where it is NULL; returns counts"""
+    start = time.perf_counter()
+    counts = {"batches": 0, "scanned": 0, "with_deadline": 0, "resolved": 0, "updated": 0}
+    last_id = 0
+    while max_batches is None or counts["batches"] < max_batches:
+        rows = (
+            client.table("promises")
+            .select("id, owner_id, extraction_data, screenshot_timestamp, created_at")
+            .is_("due_date", "null")
+            .gt("id", last_id)
+            .order("id")
+            .limit(batch_size)
+            .execute()
+        ).data or []
+        if not rows:
+            break
+        last_id = rows[-1]["id"]
+        counts["batches"] += 1
+        counts["scanned"] += len(rows)
+
+        updates = []
+        for row in rows:
+            extraction_data = decode_json(row.get("extraction_data"), {})
+            deadline = extraction_data.get("deadline") if isinstance(extraction_data, dict) else None
+            if not deadline:
+                continue
+            counts["with_deadline"] += 1
+            # Relative deadlines are relative to when the promise was made
+            due = deadline_resolver.due_date(row["owner_id"], deadline, row.get("screenshot_timestamp") or row.get("created_at"))
+            if due:
+                updates.append({"id": row["id"], "due_date": due})
+        counts["resolved"] += len(updates)
+
+        if updates and not dry_run:
+            response = client.rpc("set_promise_due_dates", {"updates": updates}).execute()
+            counts["updated"] += response.data or 0
+        logger.info(f"Due date backfill - Batch {counts['batches']} up to id {last_id}: {len(updates)}/{len(rows)} rows resolved")
+        if len(rows) < batch_size:
+            break
+    counts["seconds"] = round(time.perf_counter() - start, 3)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--max-batches", type=int, default=None)
+    parser.add_argument("--dry-run", action="store_true", help="resolve deadlines without writing them")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    counts = backfill_due_dates(supabase_config.get_admin_client(), args.batch_size, args.dry_run, args.max_batches)
+    print(counts)
+
+
+if __name__ == "__main__":
+    main()
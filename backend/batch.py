@@ -0,0 +1,81 @@
+import os
+import hashlib
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from fastapi import UploadFile
+
+from frame_precheck import hamming, valid_hash
+
+logger = logging.getLogger(__name__)
+
+MAX_BATCH_FRAMES = int(os.getenv("BATCH_MAX_FRAMES", "200"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+# Frames whose perceptual hashes differ by at most this many bits count as the same screen
+BATCH_MAX_HASH_DISTANCE = int(os.getenv("BATCH_MAX_HASH_DISTANCE", os.getenv("PRECHECK_MAX_DISTANCE", "3")))
+
+
+def parse_capture_time(timestamp: Optional[str]) -> Optional[float]:
+    """POSIX time of an ISO 8601 timestamp; naive ones are taken as UTC, unparseable ones as missing"""
+    if not timestamp:
+        return None
+    try:
+        moment = datetime.fromisoformat(timestamp.strip().replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+
+class BatchFrame:
+    """One uploaded frame of a batch request, with its client metadata"""
+    def __init__(self, index: int, file: UploadFile, metadata: Dict[str, Any]):
+        self.index = index
+        self.file = file
+        self.screenshot_id: Optional[str] = metadata.get("screenshot_id")
+        self.screenshot_timestamp: Optional[str] = metadata.get("screenshot_timestamp")
+        self.captured_at: Optional[float] = parse_capture_time(self.screenshot_timestamp)
+        self.app_name: Optional[str] = metadata.get("app_name")
+        self.bundle_id: Optional[str] = metadata.get("bundle_id")
+        phash = (metadata.get("phash") or "").lower()
+        self.phash: Optional[str] = phash if valid_hash(phash) else None
+        self.digest: Optional[str] = None
+        self.duplicate_of: Optional[int] = None
+
+    def compute_digest(self):
+        """SHA-256 of the spooled upload, read in chunks and rewound"""
+        digest = hashlib.sha256()
+        self.file.file.seek(0)
+        for chunk in iter(lambda: self.file.file.read(1024 * 1024), b""):
+            digest.update(chunk)
+        self.file.file.seek(0)
+        self.digest = digest.hexdigest()
+
+    def summary(self) -> Dict[str, Any]:
+        return {"index": self.index, "screenshot_id": self.screenshot_id, "screenshot_timestamp": self.screenshot_timestamp}
+
+
+def plan_batch(frames: List[BatchFrame]) -> List[BatchFrame]:
+    """
+    Order frames by parsed capture time (frames without a usable timestamp
+    last, in upload order) and mark duplicates: byte-identical to any earlier frame, or within
+    BATCH_MAX_HASH_DISTANCE of the previous kept frame's perceptual hash.
+    Digests must already be computed.
+    """
+    ordered = sorted(frames, key=lambda f: (f.captured_at is None, f.captured_at or 0.0, f.index))
+    first_by_digest: Dict[str, int] = {}
+    previous: Optional[BatchFrame] = None
+    for frame in ordered:
+        if frame.digest in first_by_digest:
+            frame.duplicate_of = first_by_digest[frame.digest]
+        elif (
+            previous is not None and frame.phash and previous.phash and len(frame.phash) == len(previous.phash)
+            and hamming(frame.phash, previous.phash) <= BATCH_MAX_HASH_DISTANCE
+        ):
+            frame.duplicate_of = previous.index
+        else:
+            first_by_digest[frame.digest] = frame.index
+            previous = frame
+    return ordered
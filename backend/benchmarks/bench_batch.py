@@ -0,0 +1,140 @@
+"""
+Backlog catch-up benchmark: one batch request vs the same frames uploaded one by one.
+
+Simulates a client coming back online with a backlog of captures, where runs of
+consecutive frames show the same screen. Uploads the backlog (a) sequentially
+to /extract_promises_file_auth and (b) as one /extract_promises_batch_auth
+request, each against fresh fakes, and reports wall time, LLM calls and
+database queries for both.
+
+    python -m benchmarks.bench_batch --frames 60 --repeat 3 --output results/batch.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import time
+from typing import Any, Dict, List, Tuple
+
+from benchmarks.fakes import FakeBaml, FakeSupabase
+from benchmarks.harness import BenchApp, git_revision, synthetic_png
+
+USER = "bench-user-0"
+
+
+def backlog(args) -> List[Tuple[bytes, Dict[str, Any]]]:
+    """Frames with metadata; each distinct screen is shown for `repeat` captures in a row"""
+    rng = random.Random(args.seed)
+    frames = []
+    screen = None
+    for i in range(args.frames):
+        if i % args.repeat == 0:
+            screen = synthetic_png(args.image_kb * 1024, seed=args.seed + i)
+            phash = f"{rng.getrandbits(256):064x}"
+        frames.append((screen, {
+            "screenshot_id": f"backlog-{i}",
+            "screenshot_timestamp": f"2026-01-01T10:{i // 60:02d}:{i % 60:02d}Z",
+            "phash": phash,
+        }))
+    return frames
+
+
+def fakes(args) -> Tuple[FakeBaml, FakeSupabase]:
+    fake_baml = FakeBaml(
+        latency_ms={name: args.llm_latency_ms for name in FakeBaml().latency_ms},
+        promise_rate=args.promise_rate,
+        resolve_rate=args.resolve_rate,
+        seed=args.seed,
+    )
+    fake_db = FakeSupabase(query_latency_ms=args.db_latency_ms)
+    fake_db.seed_promises(USER, args.history, seed=args.seed)
+    return fake_baml, fake_db
+
+
+async def run_sequential(args, frames) -> Dict[str, Any]:
+    fake_baml, fake_db = fakes(args)
+    bench = BenchApp(fake_baml, fake_db)
+    try:
+        async with bench.client() as client:
+            start = time.perf_counter()
+            for image, meta in frames:
+                data = {"screenshot_id": meta["screenshot_id"], "screenshot_timestamp": meta["screenshot_timestamp"], "phash": meta["phash"]}
+                response = await client.post("/extract_promises_file_auth", files={"file": ("frame.png", image, "image/png")}, data=data)
+                response.raise_for_status()
+            wall = time.perf_counter() - start
+    finally:
+        bench.close()
+    return {"mode": "sequential", "wall_seconds": round(wall, 3), "llm_calls": dict(fake_baml.calls), "db_queries": fake_db.queries}
+
+
+async def run_batch(args, frames) -> Dict[str, Any]:
+    fake_baml, fake_db = fakes(args)
+    bench = BenchApp(fake_baml, fake_db)
+    try:
+        async with bench.client() as client:
+            start = time.perf_counter()
+            files = [("files", (f"frame-{i}.png", image, "image/png")) for i, (image, _) in enumerate(frames)]
+            response = await client.post("/extract_promises_batch_auth", files=files, data={"frames": json.dumps([meta for _, meta in frames])})
+            response.raise_for_status()
+            lines = [json.loads(line) for line in response.text.splitlines() if line]
+            wall = time.perf_counter() - start
+    finally:
+        bench.close()
+    return {
+        "mode": "batch",
+        "wall_seconds": round(wall, 3),
+        "llm_calls": dict(fake_baml.calls),
+        "db_queries": fake_db.queries,
+        "summary": lines[-1]["summary"],
+    }
+
+
+async def main_async(args) -> Dict[str, Any]:
+    frames = backlog(args)
+    # Distinct screenshot ids per run, so the batch isn't answered from the sequential run's stored responses
+    batch_frames = [(image, {**meta, "screenshot_id": f"batch-{meta['screenshot_id']}"}) for image, meta in frames]
+    results = [await run_sequential(args, frames), await run_batch(args, batch_frames)]
+    for result in results:
+        print(json.dumps({k: result[k] for k in ("mode", "wall_seconds", "llm_calls", "db_queries")}))
+    return {
+        "benchmark": "batch",
+        "meta": {
+            "git_revision": git_revision(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "args": vars(args),
+        },
+        "results": results,
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=60)
+    parser.add_argument("--repeat", type=int, default=3, help="consecutive captures showing the same screen")
+    parser.add_argument("--image-kb", type=int, default=300)
+    parser.add_argument("--history", type=int, default=50)
+    parser.add_argument("--llm-latency-ms", type=float, default=200.0)
+    parser.add_argument("--db-latency-ms", type=float, default=20.0)
+    parser.add_argument("--promise-rate", type=float, default=0.2)
+    parser.add_argument("--resolve-rate", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="write the JSON report here (default: stdout only)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    report = asyncio.run(main_async(args))
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Sync cost: the change feed vs re-fetching the full promise list.
+
+For each history size, seeds a user's promises, lets a client sync up, then
+changes --changes promises (new ones saved, open ones resolved) and syncs
+again both ways: (a) the full list, as the clients did, and (b) the change
+feed from the client's cursor. Reports rows, payload bytes and time per sync.
+
+    python -m benchmarks.bench_change_feed --history 100 1000 10000 --changes 5 --output results/change_feed.json
+"""
+import argparse
+import json
+import os
+import random
+import time
+from datetime import datetime, timezone
+
+from benchmarks.fakes import FakeSupabase, make_promise
+from benchmarks.harness import git_revision
+from change_feed import change_feed
+from fingerprints import promise_fingerprint
+
+USER = "bench-user-0"
+
+
+def full_sync(store: FakeSupabase) -> dict:
+    start = time.perf_counter()
+    rows = store.table("promises").select("*").eq("owner_id", USER).execute().data
+    return {"rows": len(rows), "bytes": len(json.dumps(rows, default=str)), "seconds": time.perf_counter() - start, "requests": 1}
+
+
+def feed_sync(store: FakeSupabase, cursor, limit: int):
+    start = time.perf_counter()
+    rows = nbytes = requests = 0
+    while True:
+        page = change_feed.fetch(store, USER, cursor, limit)
+        rows += len(page["changes"])
+        nbytes += len(json.dumps(page, default=str))
+        requests += 1
+        cursor = page["cursor"]
+        if not page["has_more"]:
+            break
+    return {"rows": rows, "bytes": nbytes, "seconds": time.perf_counter() - start, "requests": requests}, cursor
+
+
+def run_history(history: int, args) -> dict:
+    rng = random.Random(args.seed)
+    store = FakeSupabase(query_latency_ms=args.query_latency_ms)
+    store.seed_promises(USER, history, seed=args.seed)
+    store.seed_promises("bench-user-1", history, seed=args.seed + 1)
+    # The feed holds back rows changed in the settle window
+    time.sleep(change_feed.settle_ms / 1000)
+    _, cursor = feed_sync(store, None, args.limit)
+
+    for _ in range(args.changes):
+        open_rows = [row for row in store.tables["promises"] if row["owner_id"] == USER and not row["resolved"]]
+        if open_rows and rng.random() < 0.5:
+            row = rng.choice(open_rows)
+            # As a client resolves one promise; the database trigger would set updated_at
+            store.table("promises").update({"resolved": True, "updated_at": datetime.now(timezone.utc).isoformat()}).eq("id", row["id"]).execute()
+        else:
+            promise = make_promise(rng)
+            store.table("promises").insert({"content": promise.content, "owner_id": USER, "person": promise.to_whom,
+                                            "extraction_data": {"deadline": promise.deadline},
+                                            "fingerprint": promise_fingerprint(promise.content, promise.to_whom, None)}).execute()
+    time.sleep(change_feed.settle_ms / 1000)
+
+    full = full_sync(store)
+    feed, _ = feed_sync(store, cursor, args.limit)
+    return {
+        "history": history,
+        "changes": args.changes,
+        "full": {**full, "seconds": round(full["seconds"], 4)},
+        "feed": {**feed, "seconds": round(feed["seconds"], 4)},
+        "bytes_ratio": round(feed["bytes"] / full["bytes"], 4) if full["bytes"] else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--history", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--changes", type=int, default=5)
+    parser.add_argument("--limit", type=int, default=500)
+    parser.add_argument("--query-latency-ms", type=float, default=20.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    results = [run_history(history, args) for history in args.history]
+    for r in results:
+        print(f"history={r['history']:>6} changes={r['changes']} full: rows={r['full']['rows']} bytes={r['full']['bytes']} "
+              f"{r['full']['seconds'] * 1000:.0f}ms | feed: rows={r['feed']['rows']} bytes={r['feed']['bytes']} "
+              f"requests={r['feed']['requests']} {r['feed']['seconds'] * 1000:.0f}ms")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump({
+                "benchmark": "change_feed",
+                "meta": {"git_revision": git_revision(), "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                         "query_latency_ms": args.query_latency_ms},
+                "results": results,
+            }, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
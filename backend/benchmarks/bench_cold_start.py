@@ -0,0 +1,93 @@
+"""
+Cold-start benchmark: time to first successful extraction in a fresh process.
+
+Each run spawns a new interpreter that imports the app, runs its startup hooks
+and sends one /extract_promises_file_auth request against the local fakes.
+Warm-up is disabled in the child since it would reach the real Supabase.
+
+    python -m benchmarks.bench_cold_start --runs 10 --output results/cold_start.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmarks.harness import BACKEND_DIR, git_revision, percentile
+
+CHILD = r"""
+import asyncio, json, sys, time
+spawned_at = float(sys.argv[1])
+import main
+from startup import startup_timer
+from benchmarks.fakes import FakeBaml, FakeSupabase
+from benchmarks.harness import BenchApp, synthetic_png
+
+async def run():
+    await main.app.router.startup()
+    fake_baml = FakeBaml(latency_ms={k: 0.0 for k in FakeBaml().latency_ms}, promise_rate=1.0)
+    bench = BenchApp(fake_baml, FakeSupabase(query_latency_ms=0.0))
+    async with bench.client() as client:
+        response = await client.post(
+            "/extract_promises_file_auth",
+            files={"file": ("frame.png", synthetic_png(300 * 1024, seed=1), "image/png")},
+            headers={"Authorization": "Bearer bench-user-0"},
+        )
+    return response.status_code
+
+status = asyncio.run(run())
+report = startup_timer.report()
+report.update({"status": status, "wall_since_spawn_seconds": round(time.time() - spawned_at, 4)})
+print("RESULT " + json.dumps(report))
+"""
+
+
+def run_once(python: str) -> dict:
+    env = dict(os.environ, WARMUP_ON_START="false", BAML_CASSETTE_MODE="off")
+    output = subprocess.run(
+        [python, "-c", CHILD, str(time.time())],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    line = next(l for l in output.splitlines() if l.startswith("RESULT "))
+    return json.loads(line[len("RESULT "):])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--python", default=sys.executable)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    runs = [run_once(args.python) for _ in range(args.runs)]
+    first = [r["wall_since_spawn_seconds"] for r in runs if r["status"] == 200]
+    phases = {}
+    for r in runs:
+        for phase in r["phases"]:
+            phases.setdefault(phase["phase"], []).append(phase["seconds"])
+
+    result = {
+        "scenario": {"benchmark": "cold_start", "runs": args.runs},
+        "errors": sum(1 for r in runs if r["status"] != 200),
+        "time_to_first_extraction_ms": {
+            "mean": round(statistics.fmean(first) * 1000, 1) if first else 0.0,
+            "p50": round(percentile(first, 50) * 1000, 1),
+            "p95": round(percentile(first, 95) * 1000, 1),
+        },
+        "phases_ms": {name: round(statistics.fmean(values) * 1000, 1) for name, values in phases.items()},
+    }
+    print(json.dumps(result, indent=2))
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump({
+                "benchmark": "cold_start",
+                "meta": {"git_revision": git_revision(), "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())},
+                "results": [result],
+            }, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
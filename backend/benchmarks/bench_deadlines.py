@@ -0,0 +1,132 @@
+"""
+Deadline resolution throughput.
+
+(a) Parser: resolves a corpus of deadline phrases, as the model writes them,
+against random screenshot times in a few timezones, and reports parses per
+second, per-parse latency and how many phrases got a timestamp.
+(b) Backfill: seeds a fake promises table with rows whose due_date is NULL and
+runs backfill_due_dates at several batch sizes, against a baseline of one
+UPDATE per row, reporting rows per second and database round trips.
+
+    python -m benchmarks.bench_deadlines --parses 50000 --rows 5000 --batch-size 100 500 1000 --output results/deadlines.json
+"""
+import argparse
+import json
+import os
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+from backfill_due_dates import backfill_due_dates
+from benchmarks.fakes import FakeSupabase
+from benchmarks.harness import git_revision, percentile
+from deadlines import deadline_resolver, parse_deadline
+from row_codec import decode_json
+
+PHRASES = [
+    "today", "tonight", "tomorrow", "tomorrow at 8", "tomorrow morning", "tonight at 8", "by Friday", "Friday 5pm",
+    "end of week", "end of the day", "EOD", "by end of day", "next week", "next Tuesday at 3", "this weekend",
+    "end of month", "next month", "in 2 hours", "in an hour", "in 30 minutes", "in a couple of days", "in 3 days",
+    "2 weeks from now", "by Dec 3rd", "March 15", "the 20th", "12/15", "2025-08-01", "at 10:30", "by 5", "noon",
+    "Monday", "this Thursday", "asap", "soon", "later", "when I get a chance",
+]
+ZONES = ["UTC", "America/Los_Angeles", "America/New_York", "Europe/Berlin", "Asia/Kolkata"]
+
+
+def bench_parser(args) -> dict:
+    rng = random.Random(args.seed)
+    base = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    cases = [
+        (rng.choice(PHRASES), (base + timedelta(minutes=rng.randrange(365 * 24 * 60))).astimezone(ZoneInfo(rng.choice(ZONES))))
+        for _ in range(args.parses)
+    ]
+    latencies_us = []
+    resolved = 0
+    start = time.perf_counter()
+    for phrase, reference in cases:
+        parse_start = time.perf_counter()
+        due = parse_deadline(phrase, reference)
+        latencies_us.append((time.perf_counter() - parse_start) * 1e6)
+        resolved += due is not None
+    seconds = time.perf_counter() - start
+    return {
+        "parses": len(cases),
+        "parses_per_second": round(len(cases) / seconds),
+        "parse_us_p50": round(percentile(latencies_us, 50), 2),
+        "parse_us_p99": round(percentile(latencies_us, 99), 2),
+        "resolved_ratio": round(resolved / len(cases), 4),
+    }
+
+
+def seeded_store(args) -> FakeSupabase:
+    store = FakeSupabase(query_latency_ms=args.query_latency_ms)
+    store.seed_promises("bench-user-0", args.rows, seed=args.seed)
+    rng = random.Random(args.seed)
+    for row in store.tables["promises"]:
+        row["extraction_data"]["deadline"] = rng.choice(PHRASES + [None])
+        row["screenshot_timestamp"] = f"2026-01-{rng.randrange(1, 29):02d}T{rng.randrange(24):02d}:00:00Z"
+    return store
+
+
+def per_row_baseline(client) -> int:
+    """One select, then one UPDATE round trip per resolved row"""
+    rows = client.table("promises").select("*").is_("due_date", "null").execute().data
+    updated = 0
+    for row in rows:
+        deadline = (decode_json(row.get("extraction_data"), {}) or {}).get("deadline")
+        due = deadline_resolver.due_date(row["owner_id"], deadline, row.get("screenshot_timestamp"))
+        if due:
+            updated += len(client.table("promises").update({"due_date": due}).eq("id", row["id"]).execute().data)
+    return updated
+
+
+def bench_backfill(args) -> list:
+    results = []
+    store = seeded_store(args)
+    start = time.perf_counter()
+    updated = per_row_baseline(store)
+    seconds = time.perf_counter() - start
+    results.append({"mode": "per_row", "batch_size": None, "rows": args.rows, "updated": updated, "queries": store.queries,
+                    "seconds": round(seconds, 3), "rows_per_second": round(args.rows / seconds)})
+    for batch_size in args.batch_size:
+        store = seeded_store(args)
+        counts = backfill_due_dates(store, batch_size=batch_size)
+        results.append({"mode": "batched", "batch_size": batch_size, "rows": args.rows, "updated": counts["updated"],
+                        "queries": store.queries, "seconds": counts["seconds"],
+                        "rows_per_second": round(args.rows / counts["seconds"])})
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--parses", type=int, default=50000)
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--batch-size", type=int, nargs="+", default=[100, 500, 1000])
+    parser.add_argument("--query-latency-ms", type=float, default=2.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    parser_result = bench_parser(args)
+    print(f"parser: {parser_result['parses_per_second']} parses/s p50={parser_result['parse_us_p50']}us "
+          f"p99={parser_result['parse_us_p99']}us resolved={parser_result['resolved_ratio']:.1%}")
+    backfill_results = bench_backfill(args)
+    for r in backfill_results:
+        print(f"backfill {r['mode']:>7} batch={str(r['batch_size']):>5} rows={r['rows']} updated={r['updated']} "
+              f"queries={r['queries']:>5} {r['seconds']:.2f}s {r['rows_per_second']} rows/s")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump({
+                "benchmark": "deadlines",
+                "meta": {"git_revision": git_revision(), "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                         "query_latency_ms": args.query_latency_ms},
+                "parser": parser_result,
+                "backfill": backfill_results,
+            }, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
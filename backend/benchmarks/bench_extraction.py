@@ -0,0 +1,130 @@
+"""
+Load/throughput benchmark for the extraction endpoints.
+
+Runs every combination of concurrency x image size x promise-history size
+against the app wired to local fakes, and writes a JSON report.
+
+    python -m benchmarks.bench_extraction --concurrency 1 4 16 --image-kb 200 2000 \
+        --history 0 100 1000 --requests 50 --output results/extraction.json
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import time
+from typing import Any, Dict
+
+from benchmarks.fakes import FakeBaml, FakeSupabase
+from benchmarks.harness import BenchApp, RssSampler, BENCH_USER_PREFIX, drive, git_revision, synthetic_png
+
+ENDPOINTS = {
+    "file_auth": "/extract_promises_file_auth",
+    "file": "/extract_promises_file",
+}
+
+
+async def run_scenario(args, concurrency: int, image_kb: int, history: int) -> Dict[str, Any]:
+    fake_baml = FakeBaml(
+        latency_ms={name: args.llm_latency_ms for name in FakeBaml().latency_ms} if args.llm_latency_ms is not None else None,
+        promise_rate=args.promise_rate,
+        promises_per_frame=args.promises_per_frame,
+        resolve_rate=args.resolve_rate,
+        seed=args.seed,
+        latency_per_promise_ms=args.llm_ms_per_promise,
+    )
+    fake_db = FakeSupabase(query_latency_ms=args.db_latency_ms)
+    users = [f"{BENCH_USER_PREFIX}{i}" for i in range(args.users)]
+    for i, user in enumerate(users):
+        fake_db.seed_promises(user, history, seed=args.seed + i)
+
+    # Distinct frames so nothing downstream can treat them as repeats
+    frames = [synthetic_png(image_kb * 1024, seed=args.seed + i) for i in range(min(args.requests, args.distinct_frames))]
+    path = ENDPOINTS[args.endpoint]
+    bench = BenchApp(fake_baml, fake_db)
+    # Screenshot ids unique per scenario: a reused id would be answered from the idempotency cache
+    scenario_id = f"c{concurrency}-{image_kb}kb-h{history}"
+
+    async def send(client, index):
+        user = users[index % len(users)]
+        return await client.post(
+            path,
+            files={"file": (f"frame-{index}.png", frames[index % len(frames)], "image/png")},
+            data={"screenshot_id": f"bench-{scenario_id}-{index}", "screenshot_timestamp": "2025-07-01T12:00:00Z"},
+            headers={"Authorization": f"Bearer {user}"},
+        )
+
+    try:
+        async with bench.client() as client:
+            with RssSampler() as rss:
+                result = await drive(send, client, args.requests, concurrency)
+    finally:
+        bench.close()
+
+    result.update({
+        "scenario": {
+            "endpoint": path,
+            "concurrency": concurrency,
+            "image_kb": image_kb,
+            "history": history,
+            "users": args.users,
+        },
+        "peak_rss_mb": round(rss.peak / (1024 * 1024), 2),
+        "llm_calls": dict(fake_baml.calls),
+        "db_queries": fake_db.queries,
+    })
+    return result
+
+
+async def main_async(args) -> Dict[str, Any]:
+    results = []
+    for concurrency, image_kb, history in itertools.product(args.concurrency, args.image_kb, args.history):
+        result = await run_scenario(args, concurrency, image_kb, history)
+        print(json.dumps({k: result[k] for k in ("scenario", "throughput_rps", "latency_ms", "peak_rss_mb")}))
+        results.append(result)
+    return {
+        "benchmark": "extraction",
+        "meta": {
+            "git_revision": git_revision(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "args": vars(args),
+        },
+        "results": results,
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--endpoint", choices=sorted(ENDPOINTS), default="file_auth")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--image-kb", type=int, nargs="+", default=[300, 2000])
+    parser.add_argument("--history", type=int, nargs="+", default=[0, 100, 1000])
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--users", type=int, default=4)
+    parser.add_argument("--distinct-frames", type=int, default=32)
+    parser.add_argument("--llm-latency-ms", type=float, default=None, help="override every fake BAML function latency")
+    parser.add_argument("--llm-ms-per-promise", type=float, default=0.0, help="extra fake BAML latency per promise in the prompt")
+    parser.add_argument("--db-latency-ms", type=float, default=40.0)
+    parser.add_argument("--promise-rate", type=float, default=0.2)
+    parser.add_argument("--promises-per-frame", type=int, default=1)
+    parser.add_argument("--resolve-rate", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="write the JSON report here (default: stdout only)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    report = asyncio.run(main_async(args))
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
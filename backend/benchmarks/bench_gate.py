@@ -0,0 +1,108 @@
+"""
+Precision/recall of the extraction gate against recorded traffic.
+
+Reads a cassette recorded with EXTRACTION_GATE_MODE=shadow (and
+BAML_CASSETTE_MODE=record), where every frame has both a GateFrame verdict and
+a full ExtractPromises result. The full extraction is the ground truth: the
+gate should let through every frame ExtractPromises found promises in, and
+skip as many of the rest as possible. With --live, frames recorded without a
+verdict (e.g. before the gate existed) are sent to GateFrame from the stored
+images; this needs LLAMA_API_KEY and BAML_CASSETTE_STORE_IMAGES=true images.
+
+Also reports what "on" mode would have cost on the same frames, using the
+recorded call durations.
+
+    python -m benchmarks.bench_gate --cassette cassettes --output results/gate.json
+"""
+import argparse
+import base64
+import json
+import os
+import time
+from collections import Counter
+
+from benchmarks.harness import git_revision
+
+
+def frame_sha(entry: dict):
+    return next((i["image_sha256"] for i in entry["inputs"] if isinstance(i, dict) and "image_sha256" in i), None)
+
+
+def live_verdict(cassette_dir: str, entry: dict):
+    import baml_py
+    import llm
+    image = next(i for i in entry["inputs"] if isinstance(i, dict) and "image_sha256" in i)
+    path = os.path.join(cassette_dir, "images", image["image_sha256"] + "." + image["media_type"].split("/")[-1])
+    if not os.path.exists(path):
+        return None, 0.0
+    with open(path, "rb") as f:
+        data = base64.b64encode(f.read()).decode()
+    start = time.perf_counter()
+    verdict = llm.call("GateFrame", baml_py.Image.from_base64(image["media_type"], data))
+    return verdict.value, (time.perf_counter() - start) * 1000
+
+
+def evaluate(args):
+    from cassette import cassette, decode_output
+    from gate import cascade_metrics, has_promises
+
+    cassette.directory = args.cassette
+    verdicts = {}
+    for entry in cassette.load("GateFrame"):
+        sha = frame_sha(entry)
+        if sha:
+            verdicts[sha] = (decode_output(entry["output"]).value, entry["duration_ms"])
+
+    counts = Counter()
+    unscored = 0
+    gate_ms = extract_ms = on_mode_ms = 0.0
+    for entry in cassette.load("ExtractPromises"):
+        sha = frame_sha(entry)
+        verdict, verdict_ms = verdicts.get(sha, (None, 0.0))
+        if verdict is None and args.live and sha:
+            verdict, verdict_ms = live_verdict(args.cassette, entry)
+        if verdict is None:
+            unscored += 1
+            continue
+        counts[(verdict, has_promises(decode_output(entry["output"])))] += 1
+        gate_ms += verdict_ms
+        extract_ms += entry["duration_ms"]
+        # In "on" mode the gate runs first, and extraction only when it doesn't say NO
+        on_mode_ms += verdict_ms + (entry["duration_ms"] if verdict != "NO" else 0.0)
+
+    result = cascade_metrics(dict(counts))
+    frames = result["frames"]
+    result.update({
+        "unscored_frames": unscored,
+        "by_verdict": {f"{verdict}:{'promises' if found else 'none'}": n for (verdict, found), n in sorted(counts.items())},
+        "extract_ms_per_frame_off": round(extract_ms / frames, 1) if frames else 0.0,
+        "gate_ms_per_frame": round(gate_ms / frames, 1) if frames else 0.0,
+        "ms_per_frame_on": round(on_mode_ms / frames, 1) if frames else 0.0,
+        "extract_calls_avoided": result["skipped"],
+    })
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cassette", default="cassettes")
+    parser.add_argument("--live", action="store_true", help="call GateFrame for frames recorded without a verdict")
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    result = evaluate(args)
+    print(json.dumps(result, indent=2))
+    if not result["frames"]:
+        raise SystemExit(f"No frames with both a verdict and an extraction in {args.cassette} (record with EXTRACTION_GATE_MODE=shadow)")
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump({
+                "benchmark": "gate",
+                "meta": {"git_revision": git_revision(), "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())},
+                "results": [result],
+            }, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
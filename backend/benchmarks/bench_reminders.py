@@ -0,0 +1,138 @@
+"""
+Load test for the reminder scheduler's timing wheel, up to millions of promises.
+
+For each size, schedules that many promises with due dates spread over
+--horizon-days, resolves (cancels) --resolve-ratio of them, then advances the
+clock one tick at a time over --advance-hours, as the scheduler does. Reports
+schedule and cancel rates, memory per scheduled promise, and per-tick latency.
+The same workload runs on a binary heap with lazy deletion for comparison.
+
+    python -m benchmarks.bench_reminders --promises 100000 1000000 3000000 --output results/reminders.json
+"""
+import argparse
+import gc
+import heapq
+import json
+import os
+import random
+import time
+
+from benchmarks.harness import current_rss_bytes, git_revision, percentile
+from reminders import TimingWheel
+
+
+class HeapSchedule:
+    """Baseline: heap of (time, key) with a dict of live times, stale entries skipped on pop"""
+    def __init__(self, now: float, tick_seconds: float):
+        self.tick_seconds = tick_seconds
+        self.deadlines = {}
+        self._heap = []
+
+    def __len__(self):
+        return len(self.deadlines)
+
+    def schedule(self, key, when: float):
+        self.deadlines[key] = when
+        heapq.heappush(self._heap, (when, key))
+
+    def cancel(self, key) -> bool:
+        return self.deadlines.pop(key, None) is not None
+
+    def advance(self, now: float):
+        fired = []
+        while self._heap and self._heap[0][0] <= now:
+            when, key = heapq.heappop(self._heap)
+            if self.deadlines.get(key) == when:
+                del self.deadlines[key]
+                fired.append((key, when))
+        return fired
+
+
+def run(structure: str, size: int, args) -> dict:
+    rng = random.Random(args.seed)
+    start_time = 1_767_225_600.0  # 2026-01-01T00:00:00Z
+    horizon = args.horizon_days * 86400
+    due_times = [start_time + rng.random() * horizon for _ in range(size)]
+    gc.collect()
+    rss_before = current_rss_bytes()
+
+    schedule = TimingWheel(start_time, args.tick_seconds) if structure == "wheel" else HeapSchedule(start_time, args.tick_seconds)
+    begin = time.perf_counter()
+    for key, when in enumerate(due_times):
+        schedule.schedule(key, when)
+    schedule_seconds = time.perf_counter() - begin
+    rss_after = current_rss_bytes()
+
+    cancelled = rng.sample(range(size), int(size * args.resolve_ratio))
+    begin = time.perf_counter()
+    for key in cancelled:
+        schedule.cancel(key)
+    cancel_seconds = time.perf_counter() - begin
+
+    ticks = int(args.advance_hours * 3600 / args.tick_seconds)
+    tick_ms = []
+    fired = 0
+    begin = time.perf_counter()
+    for step in range(1, ticks + 1):
+        tick_start = time.perf_counter()
+        fired += len(schedule.advance(start_time + step * args.tick_seconds))
+        tick_ms.append((time.perf_counter() - tick_start) * 1000)
+    advance_seconds = time.perf_counter() - begin
+
+    expected = sum(1 for when in due_times if when <= start_time + ticks * args.tick_seconds) - sum(
+        1 for key in cancelled if due_times[key] <= start_time + ticks * args.tick_seconds
+    )
+    result = {
+        "structure": structure,
+        "promises": size,
+        "schedule_per_second": round(size / schedule_seconds),
+        "cancel_per_second": round(len(cancelled) / cancel_seconds) if cancelled else None,
+        "bytes_per_promise": round((rss_after - rss_before) / size, 1),
+        "ticks": ticks,
+        "fired": fired,
+        "fired_expected": expected,
+        "advance_seconds": round(advance_seconds, 3),
+        "tick_ms_p50": round(percentile(tick_ms, 50), 4),
+        "tick_ms_p99": round(percentile(tick_ms, 99), 4),
+        "tick_ms_max": round(max(tick_ms), 3),
+        "remaining": len(schedule),
+    }
+    del schedule, due_times
+    gc.collect()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--promises", type=int, nargs="+", default=[100000, 1000000])
+    parser.add_argument("--structures", nargs="+", default=["wheel", "heap"], choices=["wheel", "heap"])
+    parser.add_argument("--horizon-days", type=float, default=30)
+    parser.add_argument("--resolve-ratio", type=float, default=0.1)
+    parser.add_argument("--advance-hours", type=float, default=24)
+    parser.add_argument("--tick-seconds", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    results = []
+    for size in args.promises:
+        for structure in args.structures:
+            r = run(structure, size, args)
+            results.append(r)
+            print(f"{r['structure']:>5} promises={r['promises']:>8} schedule={r['schedule_per_second']}/s "
+                  f"cancel={r['cancel_per_second']}/s mem={r['bytes_per_promise']}B/promise fired={r['fired']}/{r['fired_expected']} "
+                  f"tick_p50={r['tick_ms_p50']}ms p99={r['tick_ms_p99']}ms max={r['tick_ms_max']}ms")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump({
+                "benchmark": "reminders",
+                "meta": {"git_revision": git_revision(), "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                         "tick_seconds": args.tick_seconds, "horizon_days": args.horizon_days},
+                "results": results,
+            }, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
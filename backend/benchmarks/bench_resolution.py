@@ -0,0 +1,123 @@
+"""
+Resolution recall: does the promise a frame resolves reach CheckResolvedPromises?
+
+For each open-set size, runs a stream of frames that each resolve one random
+open promise. The resolving message stays on screen for --frames-on-screen
+frames, and a frame also extracts new promises at --promise-rate (as FakeBaml
+does). Two candidate selections are compared:
+
+- `frame_retrieval`: the top RESOLUTION_MAX_CANDIDATES open promises ranked
+  by BM25 against what the frame extracted (the previous selection);
+- `open_set`: resolution_checker.candidates, all open promises up to the cap
+  and a rotating window beyond it.
+
+Recall is the share of resolved promises that were among the candidates of at
+least one frame showing the resolution (the model can't resolve what it isn't
+shown). Also reports candidates and shards per frame, the cost side.
+
+    python -m benchmarks.bench_resolution --open 50 200 1000 --frames 500 --output results/resolution.json
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import time
+
+from benchmarks.fakes import make_promise
+from benchmarks.harness import git_revision
+from resolution_check import resolution_checker
+from retrieval import promise_retriever
+
+
+def promise_query(promise) -> str:
+    return " ".join(filter(None, [promise.content, promise.to_whom, promise.platform]))
+
+
+def make_row(rng: random.Random, index: int) -> dict:
+    promise = make_promise(rng)
+    return {
+        "id": index,
+        "content": promise.content,
+        "person": promise.to_whom,
+        "platform": promise.platform,
+        "resolved": False,
+        "created_at": f"2026-01-01T00:00:{index:08d}",
+    }
+
+
+def select(strategy: str, user_id: str, rows: list, query: str, max_candidates: int) -> list:
+    if strategy == "frame_retrieval":
+        return promise_retriever.select(user_id, rows, query, open_only=True, k=max_candidates)
+    return resolution_checker.candidates(user_id, rows)
+
+
+def run(strategy: str, open_count: int, args) -> dict:
+    rng = random.Random(args.seed)
+    rows = [make_row(rng, i) for i in range(open_count)]
+    next_id = open_count
+    user_id = f"bench-resolution-{strategy}-{open_count}"
+    hits = 0
+    candidate_counts = []
+    for _ in range(args.frames):
+        target = rng.choice([row for row in rows if not row["resolved"]])
+        found = False
+        for _ in range(args.frames_on_screen):
+            extracted = [make_promise(rng) for _ in range(args.promises_per_frame)] if rng.random() < args.promise_rate else []
+            candidates = select(strategy, user_id, rows, " ".join(promise_query(p) for p in extracted), args.max_candidates)
+            candidate_counts.append(len(candidates))
+            if any(row["id"] == target["id"] for row in candidates):
+                found = True
+                break
+        hits += found
+        if found:
+            # Resolved, and replaced by a new open promise so the open set keeps its size
+            target["resolved"] = True
+            rows.append(make_row(rng, next_id))
+            next_id += 1
+    mean_candidates = statistics.mean(candidate_counts)
+    return {
+        "strategy": strategy,
+        "open": open_count,
+        "frames": args.frames,
+        "recall": round(hits / args.frames, 4),
+        "candidates_per_frame": round(mean_candidates, 1),
+        "shards_per_frame": round(statistics.mean(len(resolution_checker.shards([None] * n)) for n in candidate_counts), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--open", type=int, nargs="+", default=[50, 200, 1000])
+    parser.add_argument("--strategies", nargs="+", default=["frame_retrieval", "open_set"], choices=["frame_retrieval", "open_set"])
+    parser.add_argument("--frames", type=int, default=500)
+    parser.add_argument("--frames-on-screen", type=int, default=3)
+    parser.add_argument("--promise-rate", type=float, default=0.2)
+    parser.add_argument("--promises-per-frame", type=int, default=1)
+    parser.add_argument("--max-candidates", type=int, default=32, help="k for frame_retrieval (its old default)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    results = []
+    for open_count in args.open:
+        for strategy in args.strategies:
+            r = run(strategy, open_count, args)
+            results.append(r)
+            print(f"{r['strategy']:>15} open={r['open']:>5} recall={r['recall']:.3f} "
+                  f"candidates/frame={r['candidates_per_frame']} shards/frame={r['shards_per_frame']}")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump({
+                "benchmark": "resolution",
+                "meta": {"git_revision": git_revision(), "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                         "frames_on_screen": args.frames_on_screen, "max_candidates_open_set": resolution_checker.max_candidates,
+                         "shard_size": resolution_checker.shard_size},
+                "results": results,
+            }, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Recall benchmark for the promise retrieval index.
+
+Builds synthetic promise histories, then queries each with a paraphrase of one
+of its open promises (words dropped or swapped, recipient sometimes missing,
+as a re-extraction from a new screenshot would look). With the full list the
+model can always see that promise, so recall@k is the fraction of queries whose
+target (or an identical duplicate of it) is still among the k rows selected.
+Also reports how much of the prompt the selection saves and the index cost.
+
+    python -m benchmarks.bench_retrieval --history 50 200 1000 --k 4 8 16 24 32 --output results/retrieval.json
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import time
+
+import numpy as np
+
+from benchmarks.harness import git_revision, percentile
+from retrieval import PromiseIndex, tokenize
+
+VERBS = ["send", "review", "call", "email", "share", "book", "fix", "pick up", "finish", "schedule",
+         "draft", "update", "submit", "return", "order", "check", "prepare", "write", "print", "sign"]
+OBJECTS = ["the report", "the slides", "the invoice", "the contract", "the budget analysis", "the login bug",
+           "the package", "the restaurant", "the flight", "the proposal", "the design mockups", "the tax forms",
+           "the grocery list", "the birthday gift", "the quarterly numbers", "the onboarding doc",
+           "the release notes", "the photos", "the lease", "the meeting notes"]
+RECIPIENTS = ["John", "Sarah", "mom", "dad", "the team", "Priya", "Alex", "Marco", "Lena", "the landlord", "myself"]
+PLATFORMS = ["Messages", "Slack", "Gmail", "Discord", "WhatsApp", "Teams"]
+SYNONYMS = {"send": "get you", "email": "mail", "review": "look over", "fix": "sort out", "book": "reserve",
+            "the report": "that report", "the slides": "the deck", "schedule": "set up", "finish": "wrap up"}
+FILLER = ["today", "tomorrow", "by Friday", "tonight", "asap", "this week", "after lunch"]
+
+
+def make_row(rng: random.Random, index: int) -> dict:
+    verb, obj, person = rng.choice(VERBS), rng.choice(OBJECTS), rng.choice(RECIPIENTS)
+    return {
+        "id": index,
+        "content": f"I'll {verb} {obj}" + (f" for {person}" if rng.random() < 0.5 else "") + f" {rng.choice(FILLER)}",
+        "person": person,
+        "platform": rng.choice(PLATFORMS),
+        "resolved": rng.random() < 0.3,
+        "created_at": f"2025-01-01T00:00:{index:08d}",
+    }
+
+
+def paraphrase(rng: random.Random, row: dict) -> str:
+    text = row["content"]
+    for phrase, replacement in SYNONYMS.items():
+        if phrase in text and rng.random() < 0.5:
+            text = text.replace(phrase, replacement)
+    words = [w for w in text.split() if rng.random() > 0.15] or text.split()
+    parts = [" ".join(words)]
+    if rng.random() < 0.6:
+        parts.append(row["person"])
+    if rng.random() < 0.5:
+        parts.append(row["platform"])
+    return " ".join(parts)
+
+
+def same_promise(a: dict, b: dict) -> bool:
+    return tokenize(a["content"]) == tokenize(b["content"]) and a["person"] == b["person"]
+
+
+def run_history(history: int, ks: list, queries: int, seed: int) -> list:
+    rng = random.Random(seed)
+    rows = [make_row(rng, i) for i in range(history)]
+    open_positions = [i for i, row in enumerate(rows) if not row["resolved"]]
+    mask = [not row["resolved"] for row in rows]
+
+    build_start = time.perf_counter()
+    index = PromiseIndex(rows)
+    build_ms = (time.perf_counter() - build_start) * 1000
+
+    mask = np.asarray(mask)
+    full_chars = sum(len(rows[i]["content"]) + len(rows[i]["person"]) for i in open_positions)
+    results = []
+    for k in ks:
+        hits = 0
+        query_ms = []
+        selected_chars = []
+        for _ in range(queries):
+            target = rows[rng.choice(open_positions)]
+            query = paraphrase(rng, target)
+            start = time.perf_counter()
+            selected = index.top_k(query, k, mask)
+            query_ms.append((time.perf_counter() - start) * 1000)
+            hits += any(same_promise(rows[i], target) for i in selected)
+            selected_chars.append(sum(len(rows[i]["content"]) + len(rows[i]["person"]) for i in selected))
+        results.append({
+            "history": history,
+            "open": len(open_positions),
+            "k": k,
+            "recall": round(hits / queries, 4),
+            "prompt_share": round(statistics.fmean(selected_chars) / full_chars, 4) if full_chars else 1.0,
+            "index_build_ms": round(build_ms, 2),
+            "index_bytes": index.nbytes,
+            "query_ms_p50": round(percentile(query_ms, 50), 3),
+            "query_ms_p95": round(percentile(query_ms, 95), 3),
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--history", type=int, nargs="+", default=[50, 200, 1000])
+    parser.add_argument("--k", type=int, nargs="+", default=[4, 8, 12, 16, 24, 32, 48])
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--target-recall", type=float, default=0.98)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    results = []
+    for history in args.history:
+        results.extend(run_history(history, args.k, args.queries, args.seed))
+    for r in results:
+        print(f"history={r['history']:>5} open={r['open']:>5} k={r['k']:>3} recall={r['recall']:.3f} "
+              f"prompt_share={r['prompt_share']:.3f} build={r['index_build_ms']:.1f}ms query_p95={r['query_ms_p95']:.3f}ms")
+
+    # Smallest k that meets the recall target at every history size
+    recommended = next(
+        (k for k in sorted(args.k) if all(r["recall"] >= args.target_recall for r in results if r["k"] == k)),
+        None,
+    )
+    print(f"recommended RETRIEVAL_TOP_K for recall >= {args.target_recall}: {recommended}")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump({
+                "benchmark": "retrieval",
+                "meta": {"git_revision": git_revision(), "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())},
+                "recommended_top_k": recommended,
+                "results": results,
+            }, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
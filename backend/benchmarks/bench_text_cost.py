@@ -0,0 +1,142 @@
+"""
+Cost comparison: image extraction vs text extraction with transcript diffing.
+
+Simulates a chat window over a run of captures: every few seconds a new message
+may appear, and the window shows the last N messages. For each capture it
+renders the real BAML requests (offline, via `b.request`) for three paths:
+
+  image      ExtractPromises + CheckResolvedPromises on the screenshot
+  text_full  the text variants with the whole visible transcript
+  text_diff  the text variants with only new lines plus context; captures with
+             no new lines make no call at all
+
+and reports prompt tokens per capture and in total, LLM calls made, and cost at
+the given per-million-token price. Text tokens are estimated at 4 characters
+per token; image tokens use the same tile estimate as the metrics.
+
+    python -m benchmarks.bench_text_cost --captures 300 --output results/text_cost.json
+"""
+import argparse
+import json
+import os
+import random
+import time
+
+os.environ.setdefault("LLAMA_API_KEY", "benchmark")
+
+import baml_py
+from baml_client import b
+from baml_client.types import ExistingPromise
+
+from benchmarks.fakes import COMMITMENTS, RECIPIENTS
+from benchmarks.harness import git_revision, synthetic_png
+from images import estimate_image_tokens
+from shared_store import MemoryStore
+import transcripts
+
+CHATTER = ["sounds good", "haha yes", "what time works?", "did you see the game", "ok", "on my way",
+           "can you check the doc", "thanks!", "lunch tomorrow?", "let me think about it", "sure thing"]
+CHARS_PER_TOKEN = 4
+
+
+def prompt_tokens(request) -> int:
+    """Text tokens of a rendered BAML request (image parts are counted separately)"""
+    tokens = 0
+    for message in request.body.json()["messages"]:
+        content = message["content"]
+        parts = content if isinstance(content, list) else [{"type": "text", "text": content}]
+        tokens += sum(len(part.get("text", "")) for part in parts if part.get("type") == "text") // CHARS_PER_TOKEN
+    return tokens
+
+
+def simulate(args):
+    rng = random.Random(args.seed)
+    screenshot = synthetic_png(args.image_kb * 1024, width=args.width, height=args.height, seed=args.seed)
+    image_tokens = estimate_image_tokens(screenshot)
+    image = baml_py.Image.from_url("https://example.invalid/frame.png")
+    existing = [ExistingPromise(content=f"I'll {rng.choice(COMMITMENTS)}", to_whom=rng.choice(RECIPIENTS), deadline=None) for _ in range(args.open_promises)]
+
+    # Diff against an in-memory store so the benchmark never touches a shared SQLite file
+    transcripts.shared_store = MemoryStore()
+    store = transcripts.TranscriptStore()
+
+    messages = [f"{rng.choice(['me', 'Sam'])}: {rng.choice(CHATTER)}" for _ in range(args.window_messages)]
+    totals = {path: {"prompt_tokens": 0, "calls": 0} for path in ("image", "text_full", "text_diff")}
+    skipped = 0
+    for capture in range(args.captures):
+        if rng.random() < args.new_message_rate:
+            if rng.random() < args.promise_rate:
+                messages.append(f"me: I'll {rng.choice(COMMITMENTS)} for {rng.choice(RECIPIENTS)}")
+            else:
+                messages.append(f"{rng.choice(['me', 'Sam'])}: {rng.choice(CHATTER)}")
+        visible = "\n".join(["Chat with Sam"] + messages[-args.window_messages:])
+
+        totals["image"]["prompt_tokens"] += (
+            prompt_tokens(b.request.ExtractPromises(image)) + image_tokens
+            + prompt_tokens(b.request.CheckResolvedPromises(image, existing)) + image_tokens
+        )
+        totals["image"]["calls"] += 2
+
+        totals["text_full"]["prompt_tokens"] += (
+            prompt_tokens(b.request.ExtractPromisesFromText("Messages", "", visible))
+            + prompt_tokens(b.request.CheckResolvedPromisesFromText(existing, "", visible))
+        )
+        totals["text_full"]["calls"] += 2
+
+        diff = store.diff("bench-user", "Messages\x1fChat with Sam", visible)
+        if not diff.new_lines:
+            skipped += 1
+            continue
+        totals["text_diff"]["prompt_tokens"] += (
+            prompt_tokens(b.request.ExtractPromisesFromText("Messages", diff.context_text, diff.new_text))
+            + prompt_tokens(b.request.CheckResolvedPromisesFromText(existing, diff.context_text, diff.new_text))
+        )
+        totals["text_diff"]["calls"] += 2
+
+    image_total = totals["image"]["prompt_tokens"] or 1
+    result = {
+        "scenario": {k: getattr(args, k) for k in ("captures", "window_messages", "new_message_rate", "promise_rate", "open_promises", "width", "height")},
+        "image_tokens_per_screenshot": image_tokens,
+        "captures_skipped_by_diff": skipped,
+        "paths": {},
+    }
+    for path, total in totals.items():
+        result["paths"][path] = {
+            "prompt_tokens": total["prompt_tokens"],
+            "prompt_tokens_per_capture": round(total["prompt_tokens"] / args.captures, 1),
+            "llm_calls": total["calls"],
+            "relative_to_image": round(total["prompt_tokens"] / image_total, 4),
+            "cost_usd": round(total["prompt_tokens"] / 1e6 * args.price_per_mtok, 4),
+        }
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--captures", type=int, default=300)
+    parser.add_argument("--window-messages", type=int, default=25, help="messages visible in the window")
+    parser.add_argument("--new-message-rate", type=float, default=0.2, help="chance a capture shows a new message")
+    parser.add_argument("--promise-rate", type=float, default=0.1, help="chance a new message is a promise")
+    parser.add_argument("--open-promises", type=int, default=16)
+    parser.add_argument("--image-kb", type=int, default=400)
+    parser.add_argument("--width", type=int, default=1440)
+    parser.add_argument("--height", type=int, default=900)
+    parser.add_argument("--price-per-mtok", type=float, default=0.27, help="USD per million prompt tokens")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    result = simulate(args)
+    print(json.dumps(result, indent=2))
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump({
+                "benchmark": "text_cost",
+                "meta": {"git_revision": git_revision(), "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())},
+                "results": [result],
+            }, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Compare two benchmark reports and flag regressions.
+
+    python -m benchmarks.compare results/before.json results/after.json --threshold 0.10
+
+Scenarios are matched on their "scenario" dict. Exits non-zero if any tracked
+metric regressed by more than the threshold.
+"""
+import argparse
+import json
+import sys
+from typing import Any, Dict, List, Tuple
+
+# (path into a result, True if higher is better)
+TRACKED_METRICS: List[Tuple[Tuple[str, ...], bool]] = [
+    (("throughput_rps",), True),
+    (("latency_ms", "p50"), False),
+    (("latency_ms", "p95"), False),
+    (("latency_ms", "p99"), False),
+    (("peak_rss_mb",), False),
+]
+
+
+def _get(result: Dict[str, Any], path: Tuple[str, ...]):
+    value: Any = result
+    for key in path:
+        if not isinstance(value, dict) or key not in value:
+            return None
+        value = value[key]
+    return value
+
+
+def _key(result: Dict[str, Any]) -> str:
+    return json.dumps(result.get("scenario", {}), sort_keys=True)
+
+
+def compare(before: Dict[str, Any], after: Dict[str, Any], threshold: float) -> List[Dict[str, Any]]:
+    baseline = {_key(r): r for r in before.get("results", [])}
+    rows = []
+    for result in after.get("results", []):
+        previous = baseline.get(_key(result))
+        if previous is None:
+            continue
+        for path, higher_is_better in TRACKED_METRICS:
+            old, new = _get(previous, path), _get(result, path)
+            if not isinstance(old, (int, float)) or not isinstance(new, (int, float)) or old == 0:
+                continue
+            change = (new - old) / old
+            regressed = change < -threshold if higher_is_better else change > threshold
+            rows.append({
+                "scenario": result.get("scenario"),
+                "metric": ".".join(path),
+                "before": old,
+                "after": new,
+                "change": round(change, 4),
+                "regressed": regressed,
+            })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--threshold", type=float, default=0.10, help="relative change that counts as a regression")
+    args = parser.parse_args()
+
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+
+    rows = compare(before, after, args.threshold)
+    for row in rows:
+        marker = "REGRESSED" if row["regressed"] else "ok"
+        print(f"{marker:9} {row['metric']:16} {row['before']:>10} -> {row['after']:>10} ({row['change']:+.1%}) {json.dumps(row['scenario'], sort_keys=True)}")
+    sys.exit(1 if any(row["regressed"] for row in rows) else 0)
+
+
+if __name__ == "__main__":
+    main()
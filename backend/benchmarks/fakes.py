@@ -0,0 +1,399 @@
+"""
+Local stand-ins for the BAML client and the Supabase tables, so the FastAPI app
+can be driven offline with controllable latency and outputs.
+"""
+import copy
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from baml_client.types import (
+    Promise,
+    FramePromises,
+    PromiseListResponse,
+    NoPromisesFoundResponse,
+    ShouldSaveNewPromiseEnum,
+    ResolvedPromise,
+    ResolvedPromisesResponse,
+    NoPromisesResolvedResponse,
+    FormattedPromise,
+    FrameVerdict,
+)
+
+from fingerprints import promise_fingerprint
+
+RECIPIENTS = ["John", "Sarah", "mom", "the team", "Priya", "Alex"]
+PLATFORMS = ["Messages", "Slack", "Gmail", "Discord", "WhatsApp"]
+COMMITMENTS = [
+    "send the report", "call you back", "review the draft", "share the slides",
+    "book the restaurant", "fix the login bug", "pick up the package", "email the invoice",
+]
+DEADLINES = ["today", "tomorrow", "by Friday", "end of week", "tonight at 8", None]
+
+
+def make_promise(rng: random.Random) -> Promise:
+    return Promise(
+        content=f"I'll {rng.choice(COMMITMENTS)} {rng.choice(['', 'for ' + rng.choice(RECIPIENTS)])}".strip(),
+        how_sure=True,
+        reasoning="benchmark",
+        to_whom=rng.choice(RECIPIENTS),
+        deadline=rng.choice(DEADLINES),
+        platform=rng.choice(PLATFORMS),
+        action=None,
+    )
+
+
+class FakeBaml:
+    """
+    Mimics the generated `b` client. Each function sleeps for its configured
+    latency (blocking, like the real sync client) and returns synthetic output.
+    """
+    def __init__(
+        self,
+        latency_ms: Optional[Dict[str, float]] = None,
+        promise_rate: float = 0.2,
+        promises_per_frame: int = 1,
+        resolve_rate: float = 0.1,
+        seed: int = 0,
+        latency_per_promise_ms: float = 0.0,
+        gate_pass_rate: float = 0.3,
+    ):
+        self.latency_ms = {
+            "ExtractPromises": 1500.0,
+            "ShouldSaveNewPromise": 600.0,
+            "CheckResolvedPromises": 1800.0,
+            "FormatPromiseForNotification": 500.0,
+            "ExtractPromisesFromText": 700.0,
+            "CheckResolvedPromisesFromText": 800.0,
+            "GateFrame": 300.0,
+            "ExtractPromisesMultiFrame": 2500.0,
+        }
+        self.latency_ms.update(latency_ms or {})
+        self.promise_rate = promise_rate
+        self.promises_per_frame = promises_per_frame
+        self.resolve_rate = resolve_rate
+        # Extra latency per promise in the prompt, so prompt size shows up in comparison/resolution calls
+        self.latency_per_promise_ms = latency_per_promise_ms
+        # Share of frames GateFrame lets through (its verdicts are independent of ExtractPromises output)
+        self.gate_pass_rate = gate_pass_rate
+        self.calls: Dict[str, int] = {}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _enter(self, name: str, prompt_promises: int = 0):
+        with self._lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+        time.sleep((self.latency_ms.get(name, 0.0) + self.latency_per_promise_ms * prompt_promises) / 1000)
+
+    def _roll(self) -> float:
+        with self._lock:
+            return self._rng.random()
+
+    def __getattr__(self, name: str):
+        # Functions added to the BAML source later fall back to the default latency with no output
+        if name.startswith("_"):
+            raise AttributeError(name)
+
+        def call(*args, baml_options=None, **kwargs):
+            self._enter(name)
+            return None
+        return call
+
+    def ExtractPromises(self, image, baml_options=None):
+        self._enter("ExtractPromises")
+        return self._extracted()
+
+    def ExtractPromisesMultiFrame(self, frames, captured_at, baml_options=None):
+        self._enter("ExtractPromisesMultiFrame")
+        outputs = [self._extracted() for _ in frames]
+        return [
+            FramePromises(frame=i, promises=output.promises)
+            for i, output in enumerate(outputs) if isinstance(output, PromiseListResponse)
+        ]
+
+    def GateFrame(self, image, baml_options=None):
+        self._enter("GateFrame")
+        return FrameVerdict.YES if self._roll() < self.gate_pass_rate else FrameVerdict.NO
+
+    def ExtractPromisesFromText(self, app_name, context, new_lines, baml_options=None):
+        self._enter("ExtractPromisesFromText")
+        return self._extracted()
+
+    def _extracted(self):
+        if self._roll() >= self.promise_rate:
+            return NoPromisesFoundResponse(reason="benchmark: no promise in frame")
+        with self._lock:
+            promises = [make_promise(self._rng) for _ in range(self.promises_per_frame)]
+        return PromiseListResponse(promises=promises)
+
+    def ShouldSaveNewPromise(self, existing, promise, baml_options=None):
+        self._enter("ShouldSaveNewPromise", len(existing))
+        return ShouldSaveNewPromiseEnum.DEFINITELY_SAVE
+
+    def CheckResolvedPromises(self, image, existing, baml_options=None):
+        self._enter("CheckResolvedPromises", len(existing))
+        return self._resolved(existing)
+
+    def CheckResolvedPromisesFromText(self, existing, context, new_lines, baml_options=None):
+        self._enter("CheckResolvedPromisesFromText", len(existing))
+        return self._resolved(existing)
+
+    def _resolved(self, existing):
+        if existing and self._roll() < self.resolve_rate:
+            with self._lock:
+                chosen = self._rng.choice(existing)
+            return ResolvedPromisesResponse(resolved_promises=[ResolvedPromise(
+                original_promise=chosen,
+                resolution_reasoning="benchmark: resolved",
+                resolution_evidence="benchmark",
+            )])
+        return NoPromisesResolvedResponse(reason="benchmark: nothing resolved")
+
+    def FormatPromiseForNotification(self, promise, baml_options=None):
+        self._enter("FormatPromiseForNotification")
+        return FormattedPromise(title=promise.content[:50], body=promise.content[:150], details=None)
+
+
+class FakeResponse:
+    def __init__(self, data: Any, count: Optional[int] = None):
+        self.data = data
+        self.count = count
+
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class FakeQuery:
+    """Chainable subset of the postgrest query builder used by the backend"""
+    def __init__(self, store: "FakeSupabase", table: str):
+        self._store = store
+        self._table = table
+        self._op = "select"
+        self._payload: Any = None
+        self._filters: List = []
+        self._order: List = []
+        self._limit: Optional[int] = None
+        self._on_conflict: Optional[str] = None
+        self._ignore_duplicates = False
+
+    def select(self, columns: str = "*", count: Optional[str] = None):
+        self._op = "select"
+        return self
+
+    def insert(self, rows):
+        self._op, self._payload = "insert", rows
+        return self
+
+    def upsert(self, rows, on_conflict: Optional[str] = None, ignore_duplicates: bool = False, **kwargs):
+        self._op, self._payload = "upsert", rows
+        self._on_conflict = on_conflict
+        self._ignore_duplicates = ignore_duplicates
+        return self
+
+    def update(self, values):
+        self._op, self._payload = "update", values
+        return self
+
+    def delete(self):
+        self._op = "delete"
+        return self
+
+    def _filter(self, column, predicate):
+        self._filters.append((column, predicate))
+        return self
+
+    def eq(self, column, value):
+        return self._filter(column, lambda v: v == value)
+
+    def neq(self, column, value):
+        return self._filter(column, lambda v: v != value)
+
+    def gt(self, column, value):
+        return self._filter(column, lambda v: v is not None and v > value)
+
+    def gte(self, column, value):
+        return self._filter(column, lambda v: v is not None and v >= value)
+
+    def lt(self, column, value):
+        return self._filter(column, lambda v: v is not None and v < value)
+
+    def lte(self, column, value):
+        return self._filter(column, lambda v: v is not None and v <= value)
+
+    def in_(self, column, values):
+        values = set(values)
+        return self._filter(column, lambda v: v in values)
+
+    def is_(self, column, value):
+        expected = None if value in ("null", None) else value
+        return self._filter(column, lambda v: v is expected or v == expected)
+
+    def order(self, column, desc: bool = False):
+        self._order.append((column, desc))
+        return self
+
+    def limit(self, count: int):
+        self._limit = count
+        return self
+
+    def _matches(self, row) -> bool:
+        return all(predicate(row.get(column)) for column, predicate in self._filters)
+
+    def execute(self) -> FakeResponse:
+        return self._store._execute(self)
+
+
+class FakeRpc:
+    """A database function call, executed like a query"""
+    def __init__(self, store: "FakeSupabase", name: str, params: Dict[str, Any]):
+        self._store = store
+        self._name = name
+        self._params = params
+
+    def execute(self) -> FakeResponse:
+        store = self._store
+        if store.query_latency_ms:
+            time.sleep(store.query_latency_ms / 1000)
+        with store._lock:
+            store.queries += 1
+            return FakeResponse(getattr(store, f"_{self._name}")(self._params))
+
+
+class FakeSupabase:
+    """In-memory tables with an optional per-query latency, standing in for the admin client"""
+    def __init__(self, query_latency_ms: float = 40.0):
+        self.query_latency_ms = query_latency_ms
+        self.tables: Dict[str, List[Dict[str, Any]]] = {}
+        self.queries = 0
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+    def table(self, name: str) -> FakeQuery:
+        return FakeQuery(self, name)
+
+    def rpc(self, name: str, params: Dict[str, Any]) -> "FakeRpc":
+        return FakeRpc(self, name, params)
+
+    def _resolve_promise(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Mirror of public.resolve_promise in migrations/jsonb_native_columns.sql"""
+        updated = []
+        for row in self.tables.setdefault("promises", []):
+            if row.get("owner_id") == params["p_owner_id"] and row.get("content") == params["p_content"] and row.get("resolved") is False:
+                metadata = row.get("metadata") if isinstance(row.get("metadata"), dict) else {}
+                row.update({
+                    "resolved": True,
+                    # The set_promise_fingerprint trigger takes resolved promises out of the unique index
+                    "fingerprint": None,
+                    "resolved_screenshot_id": params["p_screenshot_id"],
+                    "resolved_screenshot_time": params["p_screenshot_time"],
+                    "resolved_reason": params["p_reason"],
+                    "updated_at": _now_iso(),
+                    "metadata": {**metadata, "resolution_evidence": params["p_evidence"], "resolution_reasoning": params["p_reason"]},
+                })
+                updated.append(copy.deepcopy(row))
+        return updated
+
+    def _set_promise_due_dates(self, params: Dict[str, Any]) -> int:
+        """Mirror of public.set_promise_due_dates in migrations/promise_due_dates.sql"""
+        due_dates = {update["id"]: update["due_date"] for update in params["updates"]}
+        updated = 0
+        for row in self.tables.setdefault("promises", []):
+            if row.get("id") in due_dates and row.get("due_date") is None:
+                row["due_date"] = due_dates[row["id"]]
+                row["updated_at"] = _now_iso()
+                updated += 1
+        return updated
+
+    def _promise_changes(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Mirror of public.promise_changes in migrations/promise_change_feed.sql"""
+        after = (params["p_after_updated_at"] or "", params["p_after_id"] or 0)
+        settled = datetime.fromtimestamp(time.time() - params["p_settle_ms"] / 1000, timezone.utc).isoformat()
+        rows = [
+            row for row in self.tables.setdefault("promises", [])
+            if row.get("owner_id") == params["p_owner_id"] and (row["updated_at"], row["id"]) > after and row["updated_at"] <= settled
+        ]
+        rows.sort(key=lambda row: (row["updated_at"], row["id"]))
+        return copy.deepcopy(rows[:params["p_limit"]])
+
+    def seed_promises(self, owner_id: str, count: int, resolved_ratio: float = 0.3, seed: int = 1):
+        rng = random.Random(seed)
+        rows = []
+        for _ in range(count):
+            promise = make_promise(rng)
+            rows.append({
+                "content": promise.content,
+                "owner_id": owner_id,
+                "resolved": rng.random() < resolved_ratio,
+                "extracted_from_screenshot": True,
+                "extraction_data": {"to_whom": promise.to_whom, "deadline": promise.deadline, "platform": promise.platform},
+                "person": promise.to_whom,
+                "platform": promise.platform,
+                "fingerprint": promise_fingerprint(promise.content, promise.to_whom, None),
+                "metadata": None,
+            })
+        self.table("promises").insert(rows).execute()
+
+    def _resolve(self, value):
+        return _now_iso() if value == "now()" else value
+
+    def _execute(self, query: FakeQuery) -> FakeResponse:
+        if self.query_latency_ms:
+            time.sleep(self.query_latency_ms / 1000)
+        with self._lock:
+            self.queries += 1
+            rows = self.tables.setdefault(query._table, [])
+            if query._op == "select":
+                result = [row for row in rows if query._matches(row)]
+                for column, desc in reversed(query._order):
+                    result.sort(key=lambda r: (r.get(column) is None, r.get(column)), reverse=desc)
+                if query._limit is not None:
+                    result = result[:query._limit]
+                return FakeResponse(copy.deepcopy(result), count=len(result))
+
+            if query._op in ("insert", "upsert"):
+                payload = query._payload if isinstance(query._payload, list) else [query._payload]
+                keys = query._on_conflict.split(",") if query._on_conflict else None
+                inserted = []
+                for values in payload:
+                    if keys:
+                        # NULLs never conflict, as in a Postgres unique index
+                        existing = next((r for r in rows if all(r.get(k) is not None and r.get(k) == values.get(k) for k in keys)), None)
+                        if existing is not None:
+                            if not query._ignore_duplicates:
+                                existing.update({k: self._resolve(v) for k, v in values.items()})
+                                existing["updated_at"] = _now_iso()
+                                inserted.append(copy.deepcopy(existing))
+                            continue
+                    row = {k: self._resolve(v) for k, v in values.items()}
+                    row.setdefault("id", self._next_id)
+                    row.setdefault("created_at", _now_iso())
+                    row.setdefault("updated_at", row["created_at"])
+                    if query._table == "promises":
+                        # Column default in the promises table
+                        row.setdefault("resolved", False)
+                    self._next_id += 1
+                    rows.append(row)
+                    inserted.append(copy.deepcopy(row))
+                return FakeResponse(inserted)
+
+            if query._op == "update":
+                updated = []
+                for row in rows:
+                    if query._matches(row):
+                        row.update({k: self._resolve(v) for k, v in query._payload.items()})
+                        if query._table == "promises" and row.get("resolved"):
+                            # As the set_promise_fingerprint trigger does
+                            row["fingerprint"] = None
+                        updated.append(copy.deepcopy(row))
+                return FakeResponse(updated)
+
+            if query._op == "delete":
+                kept = [row for row in rows if not query._matches(row)]
+                deleted = [row for row in rows if query._matches(row)]
+                self.tables[query._table] = kept
+                return FakeResponse(deleted)
+
+        raise ValueError(f"Unsupported fake query operation: {query._op}")
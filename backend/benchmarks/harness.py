@@ -0,0 +1,161 @@
+"""
+Boots the FastAPI app against the local fakes and measures request latency,
+throughput and memory while driving it with an in-process HTTP client.
+"""
+import os
+import sys
+import time
+import random
+import struct
+import asyncio
+import resource
+import subprocess
+import threading
+import statistics
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+from fastapi import Request
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from benchmarks.fakes import FakeBaml, FakeSupabase  # noqa: E402
+
+BENCH_USER_PREFIX = "bench-user-"
+
+
+def synthetic_png(size_bytes: int, width: int = 1920, height: int = 1080, seed: Optional[int] = None) -> bytes:
+    """
+    Bytes with a valid PNG signature and IHDR (so header-based helpers work) padded
+    with random data to the requested size. The fakes never decode the pixels.
+    """
+    header = b"\x89PNG\r\n\x1a\n" + struct.pack(">I", 13) + b"IHDR" + struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)
+    rng = random.Random(seed)
+    padding = max(0, size_bytes - len(header))
+    return header + rng.randbytes(padding)
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def current_rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        # ru_maxrss is KiB on Linux and bytes on macOS
+        scale = 1 if sys.platform == "darwin" else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+class RssSampler:
+    """Samples RSS in a background thread to report the peak over a scenario"""
+    def __init__(self, interval_seconds: float = 0.02):
+        self.interval_seconds = interval_seconds
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, current_rss_bytes())
+            self._stop.wait(self.interval_seconds)
+
+    def __enter__(self):
+        self.peak = current_rss_bytes()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss_bytes())
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class BenchApp:
+    """The real `main.app` wired to a FakeBaml and FakeSupabase via dependency overrides"""
+    def __init__(self, fake_baml: FakeBaml, fake_db: FakeSupabase):
+        import main
+        import llm
+        from auth import get_current_user, get_supabase_admin_client
+
+        self.main = main
+        self.app = main.app
+        self.fake_baml = fake_baml
+        self.fake_db = fake_db
+        llm.b = fake_baml
+        # The write-behind flusher (when enabled) writes to the fake database too
+        main.write_behind_log.client_factory = lambda: fake_db
+
+        async def bench_user(request: Request) -> Dict[str, Any]:
+            # The bearer token is the user id, so scenarios can spread load over several users
+            token = request.headers.get("authorization", "Bearer bench-user-0").split(" ", 1)[-1]
+            return {"user_id": token, "email": f"{token}@bench.local"}
+
+        self.app.dependency_overrides[get_current_user] = bench_user
+        self.app.dependency_overrides[get_supabase_admin_client] = lambda: fake_db
+
+    def client(self) -> httpx.AsyncClient:
+        transport = httpx.ASGITransport(app=self.app)
+        return httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None)
+
+    def close(self):
+        self.app.dependency_overrides.clear()
+
+
+async def drive(
+    send: Callable[[httpx.AsyncClient, int], "asyncio.Future"],
+    client: httpx.AsyncClient,
+    total_requests: int,
+    concurrency: int,
+) -> Dict[str, Any]:
+    """Issue `total_requests` calls of `send` with at most `concurrency` in flight"""
+    latencies: List[float] = []
+    errors = 0
+    counter = iter(range(total_requests))
+
+    async def worker():
+        nonlocal errors
+        while True:
+            index = next(counter, None)
+            if index is None:
+                return
+            start = time.perf_counter()
+            try:
+                response = await send(client, index)
+                if response.status_code >= 400:
+                    errors += 1
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - start
+    return {
+        "requests": total_requests,
+        "errors": errors,
+        "wall_seconds": round(wall, 4),
+        "throughput_rps": round(total_requests / wall, 3) if wall else 0.0,
+        "latency_ms": {
+            "mean": round(statistics.fmean(latencies) * 1000, 2) if latencies else 0.0,
+            "p50": round(percentile(latencies, 50) * 1000, 2),
+            "p95": round(percentile(latencies, 95) * 1000, 2),
+            "p99": round(percentile(latencies, 99) * 1000, 2),
+            "max": round(max(latencies) * 1000, 2) if latencies else 0.0,
+        },
+    }
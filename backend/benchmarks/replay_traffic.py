@@ -0,0 +1,119 @@
+"""
+Replay recorded traffic through /extract_promises_file_auth offline.
+
+Frames come from a cassette recorded with BAML_CASSETTE_MODE=record and
+BAML_CASSETTE_STORE_IMAGES=true; every BAML call is served from the cassette
+(scaled by --latency-scale) and Supabase is the in-memory fake.
+
+    python -m benchmarks.replay_traffic --cassette cassettes --concurrency 4 --profile results/replay.collapsed
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+from benchmarks.fakes import FakeBaml, FakeSupabase
+from benchmarks.harness import BenchApp, RssSampler, drive, git_revision
+
+
+def load_frames(cassette_dir: str):
+    """Recorded ExtractPromises frames, in recorded order, with their image bytes"""
+    from cassette import cassette
+    frames = []
+    for entry in cassette.load("ExtractPromises"):
+        image = next((i for i in entry["inputs"] if isinstance(i, dict) and "image_sha256" in i), None)
+        if not image:
+            continue
+        path = os.path.join(cassette_dir, "images", image["image_sha256"] + "." + image["media_type"].split("/")[-1])
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                frames.append((f.read(), image["media_type"]))
+    return frames
+
+
+async def main_async(args):
+    from cassette import cassette
+    from profiler import SamplingProfiler
+
+    cassette.mode = "replay"
+    cassette.directory = args.cassette
+    cassette.latency_scale = args.latency_scale
+    cassette.match = args.match
+
+    frames = load_frames(args.cassette)
+    if not frames:
+        raise SystemExit(f"No replayable frames in {args.cassette} (record with BAML_CASSETTE_STORE_IMAGES=true)")
+
+    fake_db = FakeSupabase(query_latency_ms=args.db_latency_ms)
+    fake_db.seed_promises("bench-user-0", args.history, seed=args.seed)
+    bench = BenchApp(FakeBaml(), fake_db)
+    requests = args.requests or len(frames)
+
+    async def send(client, index):
+        image_bytes, media_type = frames[index % len(frames)]
+        return await client.post(
+            "/extract_promises_file_auth",
+            files={"file": (f"frame-{index}", image_bytes, media_type)},
+            data={"screenshot_id": f"replay-{index}", "screenshot_timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())},
+            headers={"Authorization": "Bearer bench-user-0"},
+        )
+
+    profiler = SamplingProfiler() if args.profile else None
+    if profiler:
+        profiler.start()
+    try:
+        async with bench.client() as client:
+            with RssSampler() as rss:
+                result = await drive(send, client, requests, args.concurrency)
+    finally:
+        bench.close()
+        if profiler:
+            profiler.stop()
+            os.makedirs(os.path.dirname(os.path.abspath(args.profile)), exist_ok=True)
+            with open(args.profile, "w") as f:
+                f.write(profiler.collapsed())
+
+    result.update({
+        "scenario": {
+            "endpoint": "/extract_promises_file_auth",
+            "cassette": os.path.abspath(args.cassette),
+            "concurrency": args.concurrency,
+            "latency_scale": args.latency_scale,
+            "history": args.history,
+        },
+        "frames": len(frames),
+        "peak_rss_mb": round(rss.peak / (1024 * 1024), 2),
+        "db_queries": fake_db.queries,
+    })
+    return {
+        "benchmark": "replay",
+        "meta": {"git_revision": git_revision(), "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()), "args": vars(args)},
+        "results": [result],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cassette", default="cassettes")
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--requests", type=int, default=0, help="default: one per recorded frame")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="0 replays without delay")
+    parser.add_argument("--match", choices=["exact", "loose"], default="loose")
+    parser.add_argument("--history", type=int, default=0, help="synthetic promises seeded for the replay user")
+    parser.add_argument("--db-latency-ms", type=float, default=40.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--profile", default=None, help="write collapsed stacks of the whole run here")
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    report = asyncio.run(main_async(args))
+    print(json.dumps(report["results"][0], indent=2))
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+import os
+import logging
+from typing import Any, Dict, Optional
+
+from frame_precheck import hamming, valid_hash
+from memory_budget import memory_budget
+from shared_store import shared_store
+
+logger = logging.getLogger(__name__)
+
+STATE_NAMESPACE = "capture_pacing"
+STATE_TTL_SECONDS = 24 * 3600
+# Weight of the latest frame in the frame-change rate
+CHANGE_ALPHA = 0.3
+
+
+class CapturePacer:
+    """
+    Recommends how long a client should wait before its next capture.
+
+    Starts from CAPTURE_BASE_DELAY_MS and:
+    - drops to the minimum for a few frames after promises were found (an active conversation);
+    - doubles for every CAPTURE_IDLE_STEP_FRAMES frames in a row without promises;
+    - scales with how often the user's screen changes (0.5x when every frame is new, 1.5x when none is);
+    - backs off up to 4x as this worker's in-flight extraction requests or image memory approach their limits.
+    """
+    def __init__(self):
+        self.min_delay_ms = int(os.getenv("CAPTURE_MIN_DELAY_MS", "5000"))
+        self.base_delay_ms = int(os.getenv("CAPTURE_BASE_DELAY_MS", "15000"))
+        self.max_delay_ms = int(os.getenv("CAPTURE_MAX_DELAY_MS", "120000"))
+        self.active_frames = int(os.getenv("CAPTURE_ACTIVE_FRAMES", "6"))
+        self.idle_step_frames = int(os.getenv("CAPTURE_IDLE_STEP_FRAMES", "10"))
+        # In-flight extraction requests per worker at which the load factor reaches its maximum
+        self.target_concurrency = int(os.getenv("CAPTURE_TARGET_CONCURRENCY", "8"))
+        self.max_hash_distance = int(os.getenv("PRECHECK_MAX_DISTANCE", "3"))
+        self.requests_in_flight = 0
+
+    def load(self) -> float:
+        """This worker's load, 0 (idle) to 1 (saturated): the higher of request and image-memory pressure"""
+        memory = memory_budget.in_flight_bytes / memory_budget.limit_bytes if memory_budget.limit_bytes else 0.0
+        return min(1.0, max(self.requests_in_flight / self.target_concurrency, memory))
+
+    def _changed(self, last_key: Optional[str], frame_key: str) -> bool:
+        if last_key is None:
+            return True
+        # Perceptual hashes count as unchanged within the pre-check distance; other keys must match exactly
+        if valid_hash(last_key) and valid_hash(frame_key) and len(last_key) == len(frame_key):
+            return hamming(last_key, frame_key) > self.max_hash_distance
+        return last_key != frame_key
+
+    def delay_ms(self, state: Dict[str, Any]) -> int:
+        if state["frames_since_promise"] < self.active_frames:
+            delay = float(self.min_delay_ms)
+        else:
+            idle_steps = (state["frames_since_promise"] - self.active_frames) // self.idle_step_frames
+            delay = self.base_delay_ms * 2 ** min(idle_steps, 8) * (1.5 - state["change_rate"])
+        delay *= 1 + 6 * max(0.0, self.load() - 0.5)
+        return int(min(self.max_delay_ms, max(self.min_delay_ms, delay)))
+
+    def observe(self, user_id: str, frame_key: Optional[str] = None, promises_found: int = 0) -> int:
+        """
+        Record a frame (identified by its perceptual hash or digest, when known) and
+        return the recommended delay before the next capture, in milliseconds.
+        """
+        def apply(state: Optional[Dict[str, Any]]):
+            state = state or {"frames_since_promise": self.active_frames, "change_rate": 0.5, "last_key": None}
+            state["frames_since_promise"] = 0 if promises_found else state["frames_since_promise"] + 1
+            if frame_key:
+                changed = self._changed(state["last_key"], frame_key)
+                state["change_rate"] = (1 - CHANGE_ALPHA) * state["change_rate"] + CHANGE_ALPHA * (1.0 if changed else 0.0)
+                state["last_key"] = frame_key
+            return state, self.delay_ms(state)
+
+        delay = shared_store.update(STATE_NAMESPACE, user_id, apply, ttl_seconds=STATE_TTL_SECONDS)
+        logger.debug(f"Capture pacing - User {user_id} - next capture in {delay} ms (load {self.load():.2f})")
+        return delay
+
+
+# Global instance
+capture_pacer = CapturePacer()
@@ -0,0 +1,191 @@
+import os
+import json
+import time
+import base64
+import hashlib
+import logging
+import threading
+from enum import Enum
+from typing import Any, Dict, List, Optional
+
+import baml_py
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+
+class CassetteMissError(Exception):
+    """Raised in replay mode when no recording matches a BAML call"""
+
+
+def _image_digest(image: baml_py.Image) -> Dict[str, str]:
+    if image.is_url():
+        return {"image_url": image.as_url()}
+    data, media_type = image.as_base64()
+    return {"image_sha256": hashlib.sha256(base64.b64decode(data)).hexdigest(), "media_type": media_type}
+
+
+def canonical_input(value: Any) -> Any:
+    """JSON-safe form of a BAML argument, with images replaced by their digests"""
+    if isinstance(value, baml_py.Image):
+        return _image_digest(value)
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, (list, tuple)):
+        return [canonical_input(v) for v in value]
+    if isinstance(value, dict):
+        return {k: canonical_input(v) for k, v in value.items()}
+    return value
+
+
+def encode_output(value: Any) -> Any:
+    """Serialize a BAML result, keeping type names so replay can rebuild the same objects"""
+    if isinstance(value, BaseModel):
+        return {"__type__": type(value).__name__, "value": value.model_dump(mode="json")}
+    if isinstance(value, Enum):
+        return {"__enum__": type(value).__name__, "value": value.value}
+    if isinstance(value, list):
+        return [encode_output(v) for v in value]
+    return value
+
+
+def decode_output(value: Any) -> Any:
+    from baml_client import types
+    if isinstance(value, dict) and "__type__" in value:
+        return getattr(types, value["__type__"]).model_validate(value["value"])
+    if isinstance(value, dict) and "__enum__" in value:
+        return getattr(types, value["__enum__"])(value["value"])
+    if isinstance(value, list):
+        return [decode_output(v) for v in value]
+    return value
+
+
+def _digest(payload: Any) -> str:
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, separators=(",", ":")).encode()).hexdigest()
+
+
+def _image_key(function_name: str, inputs: List[Any]) -> Optional[str]:
+    """Digest of a call's image inputs, image lists (ExtractPromisesMultiFrame) flattened; None without images"""
+    items = [item for value in inputs for item in (value if isinstance(value, list) else [value])]
+    images = [item for item in items if isinstance(item, dict) and "image_sha256" in item]
+    return _digest([function_name, images]) if images else None
+
+
+class Cassette:
+    """
+    Record/replay store for BAML calls.
+
+    record: every call's canonical inputs, parsed output and duration are appended
+            to <dir>/<Function>.jsonl (and optionally the images to <dir>/images/).
+    replay: calls are answered from the recordings, sleeping for the recorded
+            duration times BAML_CASSETTE_LATENCY_SCALE. Exact input matches win;
+            with BAML_CASSETTE_MATCH=loose a call falls back to a recording for the
+            same images, then to the next recording of that function in order.
+    """
+    def __init__(self):
+        self.mode = os.getenv("BAML_CASSETTE_MODE", "off").lower()
+        self.directory = os.getenv("BAML_CASSETTE_DIR", "cassettes")
+        self.latency_scale = float(os.getenv("BAML_CASSETTE_LATENCY_SCALE", "1.0"))
+        self.match = os.getenv("BAML_CASSETTE_MATCH", "exact").lower()
+        self.store_images = os.getenv("BAML_CASSETTE_STORE_IMAGES", "false").lower() == "true"
+
+        self._lock = threading.Lock()
+        self._loaded: Dict[str, Dict[str, Any]] = {}
+
+    @property
+    def recording(self) -> bool:
+        return self.mode == "record"
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == "replay"
+
+    def _path(self, function_name: str) -> str:
+        return os.path.join(self.directory, f"{function_name}.jsonl")
+
+    def _save_images(self, args: tuple):
+        images_dir = os.path.join(self.directory, "images")
+        # Image lists (ExtractPromisesMultiFrame) are saved image by image
+        images = [item for arg in args for item in (arg if isinstance(arg, (list, tuple)) else [arg])]
+        for arg in images:
+            if isinstance(arg, baml_py.Image) and not arg.is_url():
+                data, media_type = arg.as_base64()
+                raw = base64.b64decode(data)
+                path = os.path.join(images_dir, hashlib.sha256(raw).hexdigest() + "." + media_type.split("/")[-1])
+                if not os.path.exists(path):
+                    os.makedirs(images_dir, exist_ok=True)
+                    with open(path, "wb") as f:
+                        f.write(raw)
+
+    def record(self, function_name: str, args: tuple, result: Any, duration_seconds: float):
+        inputs = [canonical_input(a) for a in args]
+        entry = {
+            "function": function_name,
+            "key": _digest([function_name, inputs]),
+            "image_key": _image_key(function_name, inputs),
+            "inputs": inputs,
+            "output": encode_output(result),
+            "duration_ms": round(duration_seconds * 1000, 2),
+            "recorded_at": time.time(),
+        }
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            if self.store_images:
+                self._save_images(args)
+            with open(self._path(function_name), "a") as f:
+                f.write(json.dumps(entry) + "\n")
+
+    def load(self, function_name: str) -> List[Dict[str, Any]]:
+        """All recordings for a function, in recorded order"""
+        path = self._path(function_name)
+        if not os.path.exists(path):
+            return []
+        with open(path) as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def _index(self, function_name: str) -> Dict[str, Any]:
+        index = self._loaded.get(function_name)
+        if index is None:
+            entries = self.load(function_name)
+            index = {"entries": entries, "by_key": {}, "by_image": {}, "cursor": 0, "served": {}}
+            for entry in entries:
+                index["by_key"].setdefault(entry["key"], []).append(entry)
+                # Recomputed, so recordings made before image lists were flattened match too
+                image_key = _image_key(function_name, entry["inputs"])
+                if image_key is not None:
+                    index["by_image"].setdefault(image_key, []).append(entry)
+            self._loaded[function_name] = index
+        return index
+
+    def _pick(self, index: Dict[str, Any], bucket: str, key: str) -> Optional[Dict[str, Any]]:
+        candidates = index[bucket].get(key)
+        if not candidates:
+            return None
+        # Repeated identical calls cycle through their recordings deterministically
+        served = index["served"].get((bucket, key), 0)
+        index["served"][(bucket, key)] = served + 1
+        return candidates[served % len(candidates)]
+
+    def replay(self, function_name: str, args: tuple) -> Any:
+        inputs = [canonical_input(a) for a in args]
+        with self._lock:
+            index = self._index(function_name)
+            entry = self._pick(index, "by_key", _digest([function_name, inputs]))
+            if entry is None and self.match == "loose":
+                image_key = _image_key(function_name, inputs)
+                if image_key is not None:
+                    entry = self._pick(index, "by_image", image_key)
+                if entry is None and index["entries"]:
+                    entry = index["entries"][index["cursor"] % len(index["entries"])]
+                    index["cursor"] += 1
+        if entry is None:
+            raise CassetteMissError(f"No cassette recording for {function_name} in {self.directory}")
+        if self.latency_scale > 0:
+            time.sleep(entry["duration_ms"] / 1000 * self.latency_scale)
+        return decode_output(entry["output"])
+
+
+# Global instance
+cassette = Cassette()
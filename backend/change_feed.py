@@ -0,0 +1,123 @@
+import os
+import json
+import time
+import base64
+import asyncio
+import logging
+from typing import Any, Dict, Optional, Tuple
+
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+
+from metrics import timed_stage
+from row_codec import decode_row
+from shared_store import shared_store
+
+logger = logging.getLogger(__name__)
+
+VERSION_NAMESPACE = "change_feed_version"
+STATS_NAMESPACE = "change_feed_stats"
+# A user's change version is forgotten after a day without changes; waiters then fall back to polling
+VERSION_TTL_SECONDS = 24 * 3600
+# Columns clients don't render; left out of the feed
+OMITTED_COLUMNS = ("owner_id", "fingerprint", "potential_actions")
+
+
+def encode_cursor(updated_at: str, row_id: Any) -> str:
+    return base64.urlsafe_b64encode(json.dumps([updated_at, row_id], separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, Any]:
+    try:
+        updated_at, row_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return str(updated_at), row_id
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def compact_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    """A changed row as sent to clients: jsonb decoded, NULL columns and server-only columns left out"""
+    return {key: value for key, value in decode_row(row).items() if value is not None and key not in OMITTED_COLUMNS}
+
+
+class ChangeFeed:
+    """
+    Incremental sync of a user's promises, so clients fetch what changed
+    instead of the whole list.
+
+    Rows are read in (updated_at, id) order after the client's cursor, through
+    the promise_changes database function (migrations/promise_change_feed.sql),
+    which uses the (owner_id, updated_at, id) index and holds back rows changed
+    in the last CHANGE_FEED_SETTLE_MS, so a write that commits late can't land
+    behind a cursor already handed out. A client without a cursor starts from
+    the beginning, which pages through the full list once.
+
+    With `wait`, an empty page long-polls: the request waits until the pipeline
+    changes one of the user's promises (a per-user version in the shared store)
+    or CHANGE_FEED_DB_POLL_SECONDS pass, which catches writes made directly by
+    the clients, and returns an empty page when `wait` runs out.
+    """
+    def __init__(self):
+        self.default_limit = int(os.getenv("CHANGE_FEED_DEFAULT_LIMIT", "100"))
+        self.max_limit = int(os.getenv("CHANGE_FEED_MAX_LIMIT", "500"))
+        self.max_wait_seconds = float(os.getenv("CHANGE_FEED_MAX_WAIT_SECONDS", "25"))
+        self.settle_ms = int(os.getenv("CHANGE_FEED_SETTLE_MS", "1000"))
+        self.db_poll_seconds = float(os.getenv("CHANGE_FEED_DB_POLL_SECONDS", "5"))
+        self.poll_seconds = 0.25
+
+    def notify(self, user_id: str):
+        """Wake the user's long-polls: one of their promises changed"""
+        shared_store.incr(VERSION_NAMESPACE, user_id, ttl_seconds=VERSION_TTL_SECONDS)
+
+    def fetch(self, client: Any, user_id: str, cursor: Optional[str], limit: int) -> Dict[str, Any]:
+        """One page of changes after `cursor`"""
+        after_updated_at, after_id = decode_cursor(cursor) if cursor else (None, None)
+        with timed_stage("supabase.promise_changes"):
+            rows = client.rpc("promise_changes", {
+                "p_owner_id": user_id,
+                "p_after_updated_at": after_updated_at,
+                "p_after_id": after_id,
+                # One extra row tells whether there is another page
+                "p_limit": limit + 1,
+                "p_settle_ms": self.settle_ms,
+            }).execute().data or []
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if rows:
+            cursor = encode_cursor(rows[-1]["updated_at"], rows[-1]["id"])
+        shared_store.incr(STATS_NAMESPACE, "pages")
+        shared_store.incr(STATS_NAMESPACE, "rows", len(rows))
+        return {"changes": [compact_row(row) for row in rows], "cursor": cursor, "has_more": has_more}
+
+    async def changes(self, client: Any, user_id: str, cursor: Optional[str], limit: Optional[int], wait: float) -> Dict[str, Any]:
+        limit = max(1, min(limit or self.default_limit, self.max_limit))
+        wait = max(0.0, min(wait, self.max_wait_seconds))
+        deadline = time.monotonic() + wait
+        while True:
+            version = shared_store.get(VERSION_NAMESPACE, user_id)
+            page = await run_in_threadpool(self.fetch, client, user_id, cursor, limit)
+            if page["changes"] or time.monotonic() >= deadline:
+                return page
+            shared_store.incr(STATS_NAMESPACE, "waits")
+            next_poll = min(deadline, time.monotonic() + self.db_poll_seconds)
+            while time.monotonic() < next_poll:
+                await asyncio.sleep(self.poll_seconds)
+                if shared_store.get(VERSION_NAMESPACE, user_id) != version:
+                    # Let the change clear the settle window before reading it
+                    await asyncio.sleep(min(self.settle_ms / 1000, max(0.0, deadline - time.monotonic())))
+                    break
+
+    def stats(self) -> Dict[str, Any]:
+        counters = shared_store.items(STATS_NAMESPACE)
+        pages = counters.get("pages", 0)
+        return {
+            "pages": pages,
+            "rows": counters.get("rows", 0),
+            "rows_per_page": (counters.get("rows", 0) / pages) if pages else 0.0,
+            "long_poll_waits": counters.get("waits", 0),
+            "settle_ms": self.settle_ms,
+        }
+
+
+# Global instance
+change_feed = ChangeFeed()
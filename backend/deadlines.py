@@ -0,0 +1,299 @@
+import os
+import re
+import calendar
+import logging
+from datetime import date, datetime, time, timedelta, timezone, tzinfo
+from typing import Any, Dict, Optional, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from shared_store import shared_store
+
+logger = logging.getLogger(__name__)
+
+TIMEZONE_NAMESPACE = "user_timezone"
+STATS_NAMESPACE = "deadline_stats"
+# A user's timezone is forgotten after 30 days without uploads
+TIMEZONE_TTL_SECONDS = 30 * 24 * 3600
+
+# A deadline with a date but no time of day is due at the end of that day
+END_OF_DAY = time(23, 59, 59)
+# "EOD", "end of the day", "close of business"
+END_OF_WORKDAY = time(17, 0)
+DAY_PARTS = {"morning": time(9, 0), "noon": time(12, 0), "midday": time(12, 0), "lunch": time(12, 0), "lunchtime": time(12, 0),
+             "afternoon": time(15, 0), "evening": time(19, 0), "tonight": time(20, 0), "midnight": END_OF_DAY}
+
+WEEKDAYS = {"mon": 0, "monday": 0, "tue": 1, "tues": 1, "tuesday": 1, "wed": 2, "weds": 2, "wednesday": 2,
+            "thu": 3, "thur": 3, "thurs": 3, "thursday": 3, "fri": 4, "friday": 4, "sat": 5, "saturday": 5, "sun": 6, "sunday": 6}
+MONTHS = {**{name.lower(): i for i, name in enumerate(calendar.month_name) if name},
+          **{name.lower(): i for i, name in enumerate(calendar.month_abbr) if name}, "sept": 9}
+NUMBER_WORDS = {"a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7, "eight": 8,
+                "nine": 9, "ten": 10, "eleven": 11, "twelve": 12, "couple": 2, "couple of": 2, "few": 3, "several": 3}
+UNITS = {"min": "minutes", "mins": "minutes", "minute": "minutes", "hr": "hours", "hrs": "hours", "hour": "hours",
+         "day": "days", "week": "weeks", "month": "months"}
+
+def _alternation(words) -> str:
+    return "|".join(sorted((re.escape(w) for w in words), key=len, reverse=True))
+
+MONTH = _alternation(MONTHS)
+WEEKDAY = _alternation(WEEKDAYS)
+AMOUNT = r"\d+|" + _alternation(NUMBER_WORDS)
+UNIT = _alternation(UNITS)
+
+# Times of day, most explicit first
+MERIDIEM_TIME = re.compile(r"\b(\d{1,2})(?::(\d{2}))?\s*([ap])\.?m\b\.?")
+COLON_TIME = re.compile(r"(?<![\d:])(\d{1,2}):(\d{2})\b")
+AT_TIME = re.compile(r"\b(?:at|@|around|by|before)\s+(\d{1,2})\b(?!\s*(?:st|nd|rd|th)\b)(?![/.\-:]\d)(?!\s+(?:" + MONTH + r")\b)")
+WORKDAY_END = re.compile(r"\b(?:eod|cob|eob|close of (?:business|play)|end of (?:the )?(?:business |work )?day)\b")
+DAY_PART = re.compile(r"\b(" + _alternation(DAY_PARTS) + r")\b")
+EVENING_CONTEXT = re.compile(r"\b(?:tonight|evening|night)\b")
+
+# Dates
+ISO_DATE = re.compile(r"\b(\d{4})-(\d{1,2})-(\d{1,2})(?:[t ](\d{1,2}):(\d{2}))?")
+NUMERIC_DATE = re.compile(r"\b(\d{1,2})/(\d{1,2})(?:/(\d{4}|\d{2}))?\b")
+MONTH_DAY = re.compile(r"\b(" + MONTH + r")\.?\s+(\d{1,2})(?:st|nd|rd|th)?\b(?:,?\s+(\d{4}))?")
+DAY_MONTH = re.compile(r"\b(\d{1,2})(?:st|nd|rd|th)?\s+(?:of\s+)?(" + MONTH + r")\b\.?(?:,?\s+(\d{4}))?")
+ORDINAL_DAY = re.compile(r"\b(\d{1,2})(?:st|nd|rd|th)\b")
+OFFSET = re.compile(r"\b(?:in|within)\s+(?:the\s+next\s+)?(?:a\s+(?=couple|few))?(" + AMOUNT + r")\s+(" + UNIT + r")s?\b"
+                    r"|\b(?:a\s+(?=couple|few))?(" + AMOUNT + r")\s+(" + UNIT + r")s?\s+from\s+now\b")
+HALF_HOUR = re.compile(r"\b(?:in|within)\s+(?:half an|a half|half a?n?)\s+hour\b")
+WEEKDAY_NAME = re.compile(r"\b(?:(this|next|coming)\s+)?(" + WEEKDAY + r")\b")
+# Relative day words: (pattern, function of the reference date)
+RELATIVE_DATES = [
+    (re.compile(r"\bday after tomorrow\b"), lambda d: d + timedelta(days=2)),
+    (re.compile(r"\b(?:tomorrow|tmrw|tmr|tomorow)\b"), lambda d: d + timedelta(days=1)),
+    (re.compile(r"\b(?:today|tonight|this (?:morning|afternoon|evening))\b"), lambda d: d),
+    (re.compile(r"\bearly next week\b"), lambda d: d + timedelta(days=7 - d.weekday())),
+    (re.compile(r"\bnext weekend\b"), lambda d: d + timedelta(days=13 - d.weekday())),
+    (re.compile(r"\bnext week\b"), lambda d: d + timedelta(days=11 - d.weekday())),
+    (re.compile(r"\b(?:this |the )?weekend\b"), lambda d: d + timedelta(days=6 - d.weekday())),
+    (re.compile(r"\b(?:eow|end of (?:the )?week|this week|later this week)\b"), lambda d: _end_of_week(d)),
+    (re.compile(r"\b(?:end of )?next month\b"), lambda d: _end_of_month(_add_months(d, 1))),
+    (re.compile(r"\b(?:eom|end of (?:the )?month|this month|later this month)\b"), lambda d: _end_of_month(d)),
+    (re.compile(r"\b(?:eoy|end of (?:the )?year|this year)\b"), lambda d: date(d.year, 12, 31)),
+]
+
+
+def _end_of_week(day: date) -> date:
+    """Friday of this week; on a weekend, Sunday"""
+    return day + timedelta(days=4 - day.weekday() if day.weekday() <= 4 else 6 - day.weekday())
+
+
+def _end_of_month(day: date) -> date:
+    return day.replace(day=calendar.monthrange(day.year, day.month)[1])
+
+
+def _add_months(day: date, months: int) -> date:
+    month = day.month - 1 + months
+    year = day.year + month // 12
+    month = month % 12 + 1
+    return date(year, month, min(day.day, calendar.monthrange(year, month)[1]))
+
+
+def _safe_date(year: int, month: int, day: int) -> Optional[date]:
+    try:
+        return date(year, month, day)
+    except ValueError:
+        return None
+
+
+def _calendar_date(today: date, month: int, day: int, year: Optional[str]) -> Optional[date]:
+    """A month/day with an optional year; without one, the next such date on or after today"""
+    if year:
+        return _safe_date(int(year) + (2000 if len(year) == 2 else 0), month, day)
+    found = _safe_date(today.year, month, day)
+    if found is not None and found < today:
+        found = _safe_date(today.year + 1, month, day)
+    return found
+
+
+def _amount(word: str) -> int:
+    return int(word) if word.isdigit() else NUMBER_WORDS[word]
+
+
+def _clock(hour: int, minute: int, meridiem: Optional[str], evening: bool) -> Optional[time]:
+    if meridiem == "p" and hour < 12:
+        hour += 12
+    elif meridiem == "a" and hour == 12:
+        hour = 0
+    elif meridiem is None and 1 <= hour <= 11 and (evening or hour <= 7):
+        # "at 5" is 5pm, and "tonight at 8" is 8pm; "tomorrow at 8" stays 8am
+        hour += 12
+    if hour > 23 or minute > 59:
+        return None
+    return time(hour, minute)
+
+
+def _time_of_day(text: str) -> Optional[time]:
+    evening = bool(EVENING_CONTEXT.search(text))
+    match = MERIDIEM_TIME.search(text)
+    if match:
+        return _clock(int(match.group(1)), int(match.group(2) or 0), match.group(3), evening)
+    match = COLON_TIME.search(text)
+    if match:
+        return _clock(int(match.group(1)), int(match.group(2)), None, evening)
+    match = AT_TIME.search(text)
+    if match:
+        return _clock(int(match.group(1)), 0, None, evening)
+    if WORKDAY_END.search(text):
+        return END_OF_WORKDAY
+    match = DAY_PART.search(text)
+    if match:
+        return DAY_PARTS[match.group(1)]
+    return None
+
+
+def _date(text: str, today: date) -> Tuple[Optional[date], Optional[time]]:
+    """The date a deadline names, plus a time of day when the date carries one (ISO datetimes)"""
+    match = ISO_DATE.search(text)
+    if match:
+        year, month, day, hour, minute = match.groups()
+        found = _safe_date(int(year), int(month), int(day))
+        clock = time(int(hour), int(minute)) if hour and int(hour) < 24 and int(minute) < 60 else None
+        return found, clock
+    match = MONTH_DAY.search(text)
+    if match:
+        return _calendar_date(today, MONTHS[match.group(1)], int(match.group(2)), match.group(3)), None
+    match = DAY_MONTH.search(text)
+    if match:
+        return _calendar_date(today, MONTHS[match.group(2)], int(match.group(1)), match.group(3)), None
+    match = NUMERIC_DATE.search(text)
+    if match:
+        # US order, as the clients format dates: month/day
+        return _calendar_date(today, int(match.group(1)), int(match.group(2)), match.group(3)), None
+    for pattern, resolve in RELATIVE_DATES:
+        if pattern.search(text):
+            return resolve(today), None
+    match = WEEKDAY_NAME.search(text)
+    if match:
+        modifier, weekday = match.group(1), WEEKDAYS[match.group(2)]
+        if modifier == "next":
+            # The named day of next week
+            return today + timedelta(days=7 - today.weekday() + weekday), None
+        return today + timedelta(days=(weekday - today.weekday()) % 7), None
+    match = ORDINAL_DAY.search(text)
+    if match:
+        day = int(match.group(1))
+        found = _safe_date(today.year, today.month, day)
+        if found is None or found < today:
+            next_month = _add_months(today.replace(day=1), 1)
+            found = _safe_date(next_month.year, next_month.month, day)
+        return found, None
+    return None, None
+
+
+def parse_deadline(text: Optional[str], reference: datetime) -> Optional[datetime]:
+    """
+    Resolve a free-text deadline ("end of week", "tomorrow at 8", "Dec 3rd",
+    "in 2 hours") against `reference`, an aware datetime in the user's
+    timezone. Returns an aware datetime in that timezone, or None for vague or
+    unrecognized deadlines ("soon", "asap").
+    """
+    if not text:
+        return None
+    text = " ".join(text.lower().split())
+
+    if HALF_HOUR.search(text):
+        return reference + timedelta(minutes=30)
+    match = OFFSET.search(text)
+    if match:
+        amount = _amount(match.group(1) or match.group(3))
+        unit = UNITS.get(match.group(2) or match.group(4))
+        if unit in ("minutes", "hours"):
+            return reference + timedelta(**{unit: amount})
+        day = _add_months(reference.date(), amount) if unit == "months" else reference.date() + timedelta(**{unit: amount})
+        return datetime.combine(day, _time_of_day(text) or END_OF_DAY, tzinfo=reference.tzinfo)
+
+    day, clock = _date(text, reference.date())
+    clock = clock or _time_of_day(text)
+    if day is None:
+        if clock is None:
+            return None
+        # A time alone is the next such time
+        day = reference.date()
+        if datetime.combine(day, clock, tzinfo=reference.tzinfo) < reference:
+            day += timedelta(days=1)
+    return datetime.combine(day, clock or END_OF_DAY, tzinfo=reference.tzinfo)
+
+
+class DeadlineResolver:
+    """
+    Turns the extracted deadline text into the `due_date` timestamp.
+
+    Relative deadlines are resolved against the screenshot's timestamp (when
+    the promise was made), in the user's timezone. Clients send their IANA
+    timezone with uploads; it is remembered per user, so text uploads and
+    backfills that don't carry one still resolve in local time. Without any,
+    the timestamp's own UTC offset or DEFAULT_TIMEZONE is used.
+    """
+    def __init__(self):
+        self.default_timezone = self.zone(os.getenv("DEFAULT_TIMEZONE", "UTC")) or timezone.utc
+
+    @staticmethod
+    def zone(name: Optional[str]) -> Optional[tzinfo]:
+        if not name:
+            return None
+        try:
+            return ZoneInfo(name)
+        except (ZoneInfoNotFoundError, ValueError):
+            return None
+
+    def remember_timezone(self, user_id: str, name: Optional[str]):
+        """Keep the timezone a client sent; unknown names are ignored"""
+        if not name:
+            return
+        if self.zone(name) is None:
+            logger.warning(f"Deadlines - User {user_id} - Ignoring unknown timezone {name!r}")
+            return
+        if shared_store.get(TIMEZONE_NAMESPACE, user_id) != name:
+            shared_store.set(TIMEZONE_NAMESPACE, user_id, name, ttl_seconds=TIMEZONE_TTL_SECONDS)
+
+    def reference_time(self, user_id: str, timestamp: Optional[str]) -> datetime:
+        """The moment a promise was made, in the user's local time"""
+        remembered = self.zone(shared_store.get(TIMEZONE_NAMESPACE, user_id))
+        moment = None
+        if timestamp:
+            try:
+                moment = datetime.fromisoformat(timestamp)
+            except ValueError:
+                logger.debug(f"Deadlines - User {user_id} - Unparseable screenshot timestamp {timestamp!r}")
+        if moment is None:
+            moment = datetime.now(timezone.utc)
+        elif moment.tzinfo is None:
+            moment = moment.replace(tzinfo=remembered or self.default_timezone)
+        if remembered is not None:
+            return moment.astimezone(remembered)
+        # A timestamp with a non-UTC offset was taken in local time
+        if moment.utcoffset() != timedelta(0):
+            return moment
+        return moment.astimezone(self.default_timezone)
+
+    def due_date(self, user_id: str, deadline: Optional[str], timestamp: Optional[str], record: bool = True) -> Optional[str]:
+        """
+        ISO 8601 UTC timestamp for the due_date column, or None when the deadline can't be resolved.
+        Lookups that don't save a row pass record=False to stay out of the stats.
+        """
+        if not deadline:
+            return None
+        due = parse_deadline(deadline, self.reference_time(user_id, timestamp))
+        if record:
+            shared_store.incr(STATS_NAMESPACE, "resolved" if due else "unresolved")
+        if due is None:
+            logger.debug(f"Deadlines - User {user_id} - Could not resolve deadline {deadline!r}")
+            return None
+        return due.astimezone(timezone.utc).isoformat()
+
+    def stats(self) -> Dict[str, Any]:
+        counters = shared_store.items(STATS_NAMESPACE)
+        resolved = counters.get("resolved", 0)
+        total = resolved + counters.get("unresolved", 0)
+        return {
+            "default_timezone": str(self.default_timezone),
+            "resolved": resolved,
+            "unresolved": counters.get("unresolved", 0),
+            "resolved_ratio": (resolved / total) if total else 0.0,
+            "users_with_timezone": shared_store.count(TIMEZONE_NAMESPACE),
+        }
+
+
+# Global instance
+deadline_resolver = DeadlineResolver()
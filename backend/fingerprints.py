@@ -0,0 +1,29 @@
+import re
+import hashlib
+from datetime import datetime, timezone
+from typing import Optional
+
+# Must stay in sync with public.promise_fingerprint in migrations/add_promise_fingerprint.sql
+NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+
+def normalize(text: Optional[str]) -> str:
+    """Lowercase, with every run of non-alphanumerics collapsed to one space"""
+    return NON_ALNUM.sub(" ", (text or "").lower()).strip()
+
+
+def day_bucket(due_date: Optional[str], created_at: Optional[str] = None) -> str:
+    """
+    UTC day (YYYY-MM-DD) of the resolved due date, else of creation (today when
+    not given), so the same promise made again on a later day is a new promise
+    """
+    moment = due_date or created_at
+    if not moment:
+        return datetime.now(timezone.utc).date().isoformat()
+    return datetime.fromisoformat(moment).astimezone(timezone.utc).date().isoformat()
+
+
+def promise_fingerprint(content: Optional[str], person: Optional[str], due_date: Optional[str], created_at: Optional[str] = None) -> str:
+    """Fingerprint of an open promise for the (owner_id, fingerprint) unique index"""
+    key = f"{normalize(content)}|{normalize(person) or 'myself'}|{day_bucket(due_date, created_at)}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
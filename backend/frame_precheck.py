@@ -0,0 +1,136 @@
+import os
+import re
+import time
+import logging
+from typing import Any, Dict, List, Optional
+
+from app_context import AppContextDecision, app_context_policy, app_key
+from shared_store import shared_store
+
+logger = logging.getLogger(__name__)
+
+STATE_NAMESPACE = "frame_precheck"
+STATS_NAMESPACE = "frame_precheck_stats"
+STATE_TTL_SECONDS = 24 * 3600
+HASH_RE = re.compile(r"^[0-9a-f]{16,128}$")
+
+# Dropped state only means the next frame is extracted
+shared_store.allow_eviction(STATE_NAMESPACE)
+
+
+def valid_hash(phash: str) -> bool:
+    return bool(HASH_RE.match(phash or ""))
+
+
+def hamming(a: str, b: str) -> int:
+    """Bit distance between two equal-length hex hashes"""
+    return (int(a, 16) ^ int(b, 16)).bit_count()
+
+
+class PrecheckDecision:
+    """Answer to a frame pre-check: "upload", or "skip" with the result of the matching earlier frame"""
+    def __init__(self, action: str, reason: str, cached_result: Optional[Dict[str, Any]] = None):
+        self.action = action
+        self.reason = reason
+        self.cached_result = cached_result
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"action": self.action, "reason": self.reason, "cached_result": self.cached_result}
+
+
+class FramePrecheck:
+    """
+    Lets clients ask whether a frame is worth uploading before sending it.
+
+    The client sends a perceptual hash of the frame (a dHash, hex encoded) and
+    the frontmost app. The frame is skipped when its hash is within
+    PRECHECK_MAX_DISTANCE bits of one of the user's recent frames that was
+    extracted in the last PRECHECK_MAX_AGE_SECONDS, or is being uploaded now,
+    or when the app context policy would skip it. Otherwise the hash is marked
+    pending and the client uploads the frame with the hash attached, so the
+    extraction endpoint can store the result against it.
+    """
+    def __init__(self):
+        self.max_distance = int(os.getenv("PRECHECK_MAX_DISTANCE", "3"))
+        self.max_age_seconds = float(os.getenv("PRECHECK_MAX_AGE_SECONDS", "300"))
+        # An upload that never arrives stops blocking similar frames after this long
+        self.pending_seconds = float(os.getenv("PRECHECK_PENDING_SECONDS", "60"))
+        self.history = int(os.getenv("PRECHECK_HISTORY", "8"))
+
+    def _live(self, entries: Optional[List[Dict[str, Any]]], now: float) -> List[Dict[str, Any]]:
+        return [
+            entry for entry in (entries or [])
+            if now - entry["at"] < (self.pending_seconds if entry["result"] is None else self.max_age_seconds)
+        ]
+
+    def check(
+        self,
+        user_id: str,
+        phash: str,
+        app_name: Optional[str] = None,
+        bundle_id: Optional[str] = None,
+        frame_bytes: int = 0,
+    ) -> PrecheckDecision:
+        now = time.time()
+        entries = self._live(shared_store.get(STATE_NAMESPACE, user_id), now)
+        match = next(
+            (entry for entry in entries if len(entry["hash"]) == len(phash) and hamming(entry["hash"], phash) <= self.max_distance),
+            None,
+        )
+        if match is not None:
+            decision = PrecheckDecision("skip", "in_flight" if match["result"] is None else "duplicate", match["result"])
+        else:
+            app_decision = app_context_policy.decide(user_id, app_name, bundle_id)
+            decision = PrecheckDecision("upload" if app_decision.run else "skip", app_decision.reason)
+
+        if decision.action == "upload":
+            def apply(current: Optional[List[Dict[str, Any]]]):
+                updated = self._live(current, now) + [{"hash": phash, "at": now, "result": None}]
+                return updated[-self.history:], None
+            shared_store.update(STATE_NAMESPACE, user_id, apply, ttl_seconds=STATE_TTL_SECONDS)
+        else:
+            shared_store.incr(STATS_NAMESPACE, "bytes_avoided", frame_bytes)
+        shared_store.incr(STATS_NAMESPACE, f"{decision.action}:{decision.reason}")
+        logger.info(f"Frame precheck - User {user_id} - {decision.action} ({decision.reason})")
+        return decision
+
+    def app_decision(self, user_id: str, phash: Optional[str], app_name: Optional[str], bundle_id: Optional[str]) -> AppContextDecision:
+        """App context decision for an upload; frames the pre-check already let through aren't decided twice"""
+        if phash and any(entry["hash"] == phash and entry["result"] is None for entry in shared_store.get(STATE_NAMESPACE, user_id) or []):
+            return AppContextDecision(True, "prechecked", app_key(app_name, bundle_id))
+        return app_context_policy.decide(user_id, app_name, bundle_id)
+
+    def record_result(self, user_id: str, phash: Optional[str], promises_found: int, resolved_count: int):
+        """Attach an extraction's outcome to the pre-checked hash, so similar frames are skipped"""
+        if not phash:
+            return
+        now = time.time()
+
+        def apply(current: Optional[List[Dict[str, Any]]]):
+            entries = self._live(current, now)
+            for entry in entries:
+                if entry["hash"] == phash:
+                    entry["at"] = now
+                    entry["result"] = {"promises_found": promises_found, "resolved_count": resolved_count, "extracted_at": now}
+                    break
+            return entries, None
+
+        shared_store.update(STATE_NAMESPACE, user_id, apply, ttl_seconds=STATE_TTL_SECONDS)
+
+    def stats(self) -> Dict[str, Any]:
+        counters = shared_store.items(STATS_NAMESPACE)
+        uploads = sum(n for key, n in counters.items() if key.startswith("upload:"))
+        skips = sum(n for key, n in counters.items() if key.startswith("skip:"))
+        total = uploads + skips
+        return {
+            "prechecks": total,
+            "uploads_requested": uploads,
+            "uploads_avoided": skips,
+            "avoided_ratio": (skips / total) if total else 0.0,
+            "bytes_avoided": counters.get("bytes_avoided", 0),
+            "decisions": {key: n for key, n in counters.items() if ":" in key},
+        }
+
+
+# Global instance
+frame_precheck = FramePrecheck()
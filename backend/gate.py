@@ -0,0 +1,120 @@
+import os
+import asyncio
+import logging
+from typing import Any, Dict, Optional, Tuple
+
+import baml_py
+from baml_client.types import FrameVerdict, NoPromisesFoundResponse, PromiseListResponse
+
+import llm
+from multiframe import multiframe_batcher
+from shared_store import shared_store
+
+logger = logging.getLogger(__name__)
+
+GATE_MODES = ("off", "shadow", "on")
+STATS_NAMESPACE = "extraction_gate_stats"
+# A gate call that fails is counted under this verdict and never skips a frame
+ERROR_VERDICT = "ERROR"
+
+
+def has_promises(output: Any) -> bool:
+    return isinstance(output, PromiseListResponse) and bool(output.promises)
+
+
+def cascade_metrics(counts: Dict[Tuple[str, bool], int]) -> Dict[str, Any]:
+    """
+    Precision/recall of the gate, from frame counts keyed by (verdict, extraction found promises).
+    A frame passes the gate unless the verdict is NO; the full extraction is the ground truth.
+    """
+    total = sum(counts.values())
+    positives = sum(n for (_, found), n in counts.items() if found)
+    passed = sum(n for (verdict, _), n in counts.items() if verdict != FrameVerdict.NO.value)
+    true_passes = sum(n for (verdict, found), n in counts.items() if found and verdict != FrameVerdict.NO.value)
+    return {
+        "frames": total,
+        "frames_with_promises": positives,
+        "skipped": total - passed,
+        "skip_rate": (total - passed) / total if total else 0.0,
+        "missed_frames_with_promises": positives - true_passes,
+        "recall": true_passes / positives if positives else 1.0,
+        "precision": true_passes / passed if passed else 0.0,
+    }
+
+
+class ExtractionGate:
+    """
+    First stage of a two-stage extraction cascade. GateFrame, a short prompt on
+    the small Scout model, answers YES/NO/UNCERTAIN for "a commitment from the
+    user is visible", and the full ExtractPromises call only runs when it
+    doesn't answer NO.
+
+    off:    every frame goes straight to ExtractPromises
+    shadow: the gate runs concurrently with ExtractPromises and its verdicts are
+            counted against the extraction result, but nothing is skipped
+    on:     frames the gate answers NO for skip ExtractPromises
+    """
+    def __init__(self):
+        self.mode = os.getenv("EXTRACTION_GATE_MODE", "off").lower()
+        if self.mode not in GATE_MODES:
+            logger.warning(f"Unknown EXTRACTION_GATE_MODE {self.mode!r}, using 'off'")
+            self.mode = "off"
+
+    async def _verdict(self, image: baml_py.Image, image_tokens: int) -> str:
+        try:
+            verdict = await llm.acall("GateFrame", image, image_tokens=image_tokens)
+        except Exception as gate_error:
+            logger.error(f"Extraction gate - GateFrame failed, extracting anyway: {gate_error}")
+            return ERROR_VERDICT
+        return verdict.value if isinstance(verdict, FrameVerdict) else str(verdict)
+
+    def _record(self, verdict: str, found: Optional[bool]):
+        # found is None when the frame was skipped and there is no ground truth
+        outcome = "skipped" if found is None else ("promises" if found else "none")
+        shared_store.incr(STATS_NAMESPACE, f"{self.mode}:{verdict}:{outcome}")
+
+    async def _extract_promises(self, user_id: str, image: baml_py.Image, image_tokens: int, captured_at: Optional[str]) -> Any:
+        if multiframe_batcher.enabled:
+            return await multiframe_batcher.extract(user_id, image, image_tokens=image_tokens, captured_at=captured_at)
+        return await llm.acall("ExtractPromises", image, image_tokens=image_tokens)
+
+    async def extract(self, user_id: str, image: baml_py.Image, image_tokens: int = 0, captured_at: Optional[str] = None) -> Any:
+        """ExtractPromises output for the frame, or NoPromisesFoundResponse when the gate skips it"""
+        if self.mode == "off":
+            return await self._extract_promises(user_id, image, image_tokens, captured_at)
+
+        if self.mode == "shadow":
+            verdict, output = await asyncio.gather(
+                self._verdict(image, image_tokens),
+                self._extract_promises(user_id, image, image_tokens, captured_at),
+            )
+            self._record(verdict, has_promises(output))
+            return output
+
+        verdict = await self._verdict(image, image_tokens)
+        if verdict == FrameVerdict.NO.value:
+            self._record(verdict, None)
+            logger.info(f"Extraction gate - User {user_id} - Skipping ExtractPromises")
+            return NoPromisesFoundResponse(reason="Extraction gate: no commitment visible")
+        output = await self._extract_promises(user_id, image, image_tokens, captured_at)
+        self._record(verdict, has_promises(output))
+        return output
+
+    def stats(self) -> Dict[str, Any]:
+        """Verdict counts per mode, and the gate's precision/recall measured in shadow mode"""
+        counters = shared_store.items(STATS_NAMESPACE)
+        shadow = {}
+        for key, count in counters.items():
+            mode, verdict, outcome = key.split(":", 2)
+            if mode == "shadow":
+                shadow[(verdict, outcome == "promises")] = count
+        return {
+            "mode": self.mode,
+            "verdicts": counters,
+            # Frames skipped in "on" mode have no ground truth, so recall is only measured in shadow mode
+            "shadow": cascade_metrics(shadow),
+        }
+
+
+# Global instance
+extraction_gate = ExtractionGate()
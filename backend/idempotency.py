@@ -0,0 +1,128 @@
+import os
+import time
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from fastapi import HTTPException
+
+from shared_store import shared_store
+
+logger = logging.getLogger(__name__)
+
+NAMESPACE = "idempotency"
+STATS_NAMESPACE = "idempotency_stats"
+PENDING = "pending"
+DONE = "done"
+
+# Retained responses are a cache: dropping one only costs a re-run of the request
+shared_store.allow_eviction(NAMESPACE)
+
+
+class IdempotencyCache:
+    """
+    Makes extraction requests idempotent on (user, screenshot_id).
+
+    The first request for a key runs the pipeline; its response is kept for
+    IDEMPOTENCY_TTL_SECONDS and returned to any retry. A retry that arrives
+    while the first request is still running waits for its response: in the
+    same worker it awaits the running pipeline directly, from another worker it
+    polls the shared store. A request that fails releases the key, so a retry
+    runs the pipeline again.
+    """
+    def __init__(self):
+        self.ttl_seconds = float(os.getenv("IDEMPOTENCY_TTL_SECONDS", "900"))
+        # A pending marker left by a crashed worker stops blocking retries after this long
+        self.pending_seconds = float(os.getenv("IDEMPOTENCY_PENDING_SECONDS", "120"))
+        self.poll_seconds = 0.25
+        self._running: Dict[Tuple[str, str], asyncio.Future] = {}
+
+    def _claim(self, key: str) -> Optional[Dict[str, Any]]:
+        """Mark the key pending unless it already has an entry; return the existing entry, if any"""
+        def apply(entry: Optional[Dict[str, Any]]):
+            if entry is not None:
+                return entry, entry
+            return {"state": PENDING, "started_at": time.time()}, None
+        return shared_store.update(NAMESPACE, key, apply, ttl_seconds=self.pending_seconds)
+
+    async def _wait_for(self, key: str) -> Dict[str, Any]:
+        deadline = time.monotonic() + self.pending_seconds
+        while time.monotonic() < deadline:
+            await asyncio.sleep(self.poll_seconds)
+            entry = shared_store.get(NAMESPACE, key)
+            if entry is None:
+                break
+            if entry["state"] == DONE:
+                return entry["response"]
+        raise HTTPException(status_code=409, detail="The original request for this screenshot_id did not complete; retry it")
+
+    async def run(self, user_id: str, screenshot_id: Optional[str], compute: Callable[[], Awaitable[Any]], response_type: Any) -> Any:
+        """Run `compute` once per (user, screenshot_id) and hand its response to duplicates"""
+        if not screenshot_id:
+            return await compute()
+
+        local_key = (user_id, screenshot_id)
+        running = self._running.get(local_key)
+        if running is not None:
+            shared_store.incr(STATS_NAMESPACE, "attached")
+            logger.info(f"Idempotency - User {user_id} - Attaching to running request for screenshot {screenshot_id}")
+            return response_type(**(await asyncio.shield(running)))
+
+        key = f"{user_id}:{screenshot_id}"
+        existing = self._claim(key)
+        if existing is not None:
+            if existing["state"] == DONE:
+                shared_store.incr(STATS_NAMESPACE, "replayed")
+                logger.info(f"Idempotency - User {user_id} - Replaying stored response for screenshot {screenshot_id}")
+                return response_type(**existing["response"])
+            shared_store.incr(STATS_NAMESPACE, "attached")
+            logger.info(f"Idempotency - User {user_id} - Waiting for another worker's request for screenshot {screenshot_id}")
+            return response_type(**(await self._wait_for(key)))
+
+        future = asyncio.get_running_loop().create_future()
+        self._running[local_key] = future
+        try:
+            response = await compute()
+            stored = response.model_dump(mode="json")
+            shared_store.set(NAMESPACE, key, {"state": DONE, "response": stored}, ttl_seconds=self.ttl_seconds)
+            future.set_result(stored)
+            shared_store.incr(STATS_NAMESPACE, "executed")
+            return response
+        except BaseException as error:
+            shared_store.delete(NAMESPACE, key)
+            future.set_exception(error if isinstance(error, Exception) else HTTPException(
+                status_code=409, detail="The original request for this screenshot_id was cancelled; retry it"))
+            # Mark the exception retrieved so an unattached future doesn't log a warning
+            future.exception()
+            raise
+        finally:
+            self._running.pop(local_key, None)
+
+    def lookup(self, user_id: str, screenshot_id: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Stored response for a completed request, if any"""
+        if not screenshot_id:
+            return None
+        entry = shared_store.get(NAMESPACE, f"{user_id}:{screenshot_id}")
+        if entry is None or entry["state"] != DONE:
+            return None
+        shared_store.incr(STATS_NAMESPACE, "replayed")
+        return entry["response"]
+
+    def store(self, user_id: str, screenshot_id: Optional[str], response: Any):
+        """Keep a response computed outside run() (e.g. one frame of a batch) for later retries"""
+        if screenshot_id:
+            shared_store.set(NAMESPACE, f"{user_id}:{screenshot_id}", {"state": DONE, "response": response.model_dump(mode="json")}, ttl_seconds=self.ttl_seconds)
+            shared_store.incr(STATS_NAMESPACE, "executed")
+
+    def stats(self) -> Dict[str, Any]:
+        counters = shared_store.items(STATS_NAMESPACE)
+        return {
+            "executed": counters.get("executed", 0),
+            "replayed": counters.get("replayed", 0),
+            "attached": counters.get("attached", 0),
+            "retained_responses": shared_store.count(NAMESPACE),
+        }
+
+
+# Global instance
+idempotency_cache = IdempotencyCache()
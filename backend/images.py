@@ -0,0 +1,40 @@
+import math
+import struct
+from typing import Optional, Tuple
+
+# Llama 4 vision tiles images into 336px squares of 144 tokens each, plus a global thumbnail tile
+_TILE_SIZE = 336
+_TOKENS_PER_TILE = 144
+_MAX_TILES = 16
+
+
+def image_dimensions(image_bytes: bytes) -> Optional[Tuple[int, int]]:
+    """Read (width, height) from a PNG or JPEG header without decoding the image"""
+    if image_bytes[:8] == b"\x89PNG\r\n\x1a\n" and len(image_bytes) >= 24:
+        width, height = struct.unpack(">II", image_bytes[16:24])
+        return width, height
+
+    if image_bytes[:2] == b"\xff\xd8":
+        i = 2
+        while i + 9 < len(image_bytes):
+            if image_bytes[i] != 0xFF:
+                i += 1
+                continue
+            marker = image_bytes[i + 1]
+            # Start-of-frame markers carry the dimensions
+            if marker in (0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF):
+                height, width = struct.unpack(">HH", image_bytes[i + 5:i + 9])
+                return width, height
+            segment_length = struct.unpack(">H", image_bytes[i + 2:i + 4])[0]
+            i += 2 + segment_length
+    return None
+
+
+def estimate_image_tokens(image_bytes: bytes) -> int:
+    """Estimate how many prompt tokens the provider will charge for an image"""
+    dimensions = image_dimensions(image_bytes)
+    if not dimensions:
+        return 0
+    width, height = dimensions
+    tiles = min(_MAX_TILES, math.ceil(width / _TILE_SIZE) * math.ceil(height / _TILE_SIZE))
+    return (tiles + 1) * _TOKENS_PER_TILE
@@ -0,0 +1,65 @@
+import time
+import logging
+from typing import Any
+from baml_client import b
+import baml_py
+
+from metrics import timed_stage, record_llm_tokens
+from cassette import cassette
+from server_timing import in_threadpool
+
+logger = logging.getLogger(__name__)
+
+
+def _record_usage(function_name: str, collector: baml_py.Collector, image_tokens: int):
+    try:
+        usage = collector.last.usage if collector.last else None
+    except Exception as usage_error:
+        logger.debug(f"No BAML usage for {function_name}: {usage_error}")
+        return
+    if usage is None:
+        return
+    record_llm_tokens(function_name, "prompt", usage.input_tokens or 0)
+    record_llm_tokens(function_name, "completion", usage.output_tokens or 0)
+    record_llm_tokens(function_name, "image", image_tokens)
+    record_llm_tokens(function_name, "cached", _cached_tokens(collector))
+
+
+def _cached_tokens(collector: baml_py.Collector) -> int:
+    """Prompt tokens the provider served from its prefix cache, when its usage block reports them"""
+    try:
+        call = collector.last.selected_call
+        response = call.http_response if call else None
+        if response is None:
+            return 0
+        usage = response.body.json().get("usage") or {}
+    except Exception:
+        return 0
+    # OpenAI-compatible APIs report prompt_tokens_details.cached_tokens; Anthropic reports cache_read_input_tokens
+    details = usage.get("prompt_tokens_details") or {}
+    return int(details.get("cached_tokens") or usage.get("cache_read_input_tokens") or 0)
+
+
+def call(function_name: str, *args: Any, image_tokens: int = 0) -> Any:
+    """
+    Call a BAML function by name, timing it and recording token usage.
+    All BAML calls in the backend go through here.
+    """
+    if cassette.replaying:
+        with timed_stage(f"baml.{function_name}"):
+            return cassette.replay(function_name, args)
+
+    collector = baml_py.Collector(name=function_name)
+    function = getattr(b, function_name)
+    start = time.perf_counter()
+    with timed_stage(f"baml.{function_name}"):
+        result = function(*args, baml_options={"collector": collector})
+    _record_usage(function_name, collector, image_tokens)
+    if cassette.recording:
+        cassette.record(function_name, args, result, time.perf_counter() - start)
+    return result
+
+
+async def acall(function_name: str, *args: Any, image_tokens: int = 0) -> Any:
+    """Like call(), but run in the threadpool so concurrent calls don't block the event loop"""
+    return await in_threadpool(call, function_name, *args, image_tokens=image_tokens)
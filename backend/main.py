@@ -1,14 +1,28 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException, Depends, status, Form
+# Imported first so the startup breakdown covers every other import
+from startup import startup_timer
+from fastapi import FastAPI, File, UploadFile, HTTPException, Depends, status, Form, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 import os
+import asyncio
 import base64
+import hashlib
 import json
 import logging
-from typing import Optional, Union, Dict, Any
+import time
+from typing import Optional, Union, Dict, Any, List
 from dotenv import load_dotenv
-from baml_client import b
 import baml_py
+from baml_client.types import (
+    Promise as BAMLPromise,
+    ExistingPromise,
+    PromiseListResponse as BAMLPromiseListResponse,
+    NoPromisesFoundResponse,
+    ShouldSaveNewPromiseEnum,
+    ResolvedPromise,
+)
 from supabase import Client
 
 # Import our authentication modules
@@ -21,9 +35,37 @@ from auth import (
     require_admin
 )
 from supabase_config import supabase_config
+from resolution_policy import resolution_policy
+from metrics import timed_stage, observe_stage, record_promises, render_latest, REQUEST_DURATION, STAGE_ERRORS, STARTUP_PHASE, FIRST_EXTRACTION
+from images import estimate_image_tokens
+import llm
+import server_timing
+from server_timing import in_threadpool
+from profiler import profile_registry
+from memory_budget import memory_budget, IN_FLIGHT_COPIES
+from retrieval import promise_retriever
+from transcripts import transcript_store
+from resolution_check import resolution_checker
+from gate import extraction_gate
+from app_context import app_context_policy
+from frame_precheck import frame_precheck, valid_hash
+from capture_pacing import capture_pacer
+from idempotency import idempotency_cache
+from multiframe import multiframe_batcher
+from write_behind import write_behind_log, INSERT as WRITE_INSERT, RESOLVE as WRITE_RESOLVE
+from fingerprints import promise_fingerprint
+from deadlines import deadline_resolver
+from reminders import reminder_scheduler
+from change_feed import change_feed
+from row_codec import decode_json, decode_row
+from batch import BatchFrame, plan_batch, MAX_BATCH_FRAMES, BATCH_CONCURRENCY
 
 # Load environment variables
 load_dotenv()
+startup_timer.mark("imports")
+
+WARMUP_ON_START = os.getenv("WARMUP_ON_START", "true").lower() == "true"
+MAX_TRANSCRIPT_CHARS = int(os.getenv("MAX_TRANSCRIPT_CHARS", "200000"))
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -42,8 +84,389 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
 
+PROFILER_INTERVAL_SECONDS = float(os.getenv("PROFILER_INTERVAL_MS", "5")) / 1000
+# Requests that count toward the capture pacer's load; long-polls and SSE streams hold a connection, not work
+EXTRACTION_PATHS = frozenset({
+    "/extract_promises_file",
+    "/extract_promises_base64",
+    "/extract_promises_file_auth",
+    "/extract_promises_text_auth",
+    "/extract_promises_batch_auth",
+})
+
+@app.middleware("http")
+async def instrument_request(request: Request, call_next):
+    start = time.perf_counter()
+    timings = server_timing.start_request()
+
+    # Profiling is armed explicitly by an admin; when nothing is armed this is a single attribute check
+    profiler = None
+    if profile_registry.armed and profile_registry.take(request.url.path):
+        profiler = profile_registry.begin(PROFILER_INTERVAL_SECONDS)
+
+    extraction = request.url.path in EXTRACTION_PATHS
+    if extraction:
+        capture_pacer.requests_in_flight += 1
+    try:
+        response = await call_next(request)
+    finally:
+        if extraction:
+            capture_pacer.requests_in_flight -= 1
+        if profiler:
+            profile = profile_registry.finish(profiler, f"{request.method} {request.url.path}")
+            logger.info(f"Captured profile {profile['id']} for {profile['label']} ({profile['samples']} samples)")
+
+    elapsed = time.perf_counter() - start
+    # Use the route template rather than the raw path to keep label cardinality bounded
+    route = request.scope.get("route")
+    path = getattr(route, "path", "unmatched")
+    REQUEST_DURATION.labels(request.method, path, str(response.status_code)).observe(elapsed)
+    response.headers["Server-Timing"] = server_timing.header_value(timings, elapsed)
+    return response
+
+def _warm_up_supabase():
+    """Build the Supabase clients and open a pooled connection before the first capture needs it"""
+    start = time.perf_counter()
+    supabase_config.get_client()
+    admin_client = supabase_config.admin_client
+    if admin_client:
+        admin_client.table("promises").select("id").limit(1).execute()
+    return time.perf_counter() - start
+
+async def _warm_up():
+    try:
+        seconds = await run_in_threadpool(_warm_up_supabase)
+        startup_timer.record("warmup.supabase", seconds)
+        STARTUP_PHASE.labels("warmup.supabase").set(seconds)
+        logger.info(f"Startup - Supabase warm-up took {seconds * 1000:.0f}ms")
+    except Exception as warmup_error:
+        # Warm-up is best effort; the first request will build the clients itself
+        logger.warning(f"Startup - warm-up failed: {warmup_error}")
+
+@app.on_event("startup")
+async def on_startup():
+    startup_timer.mark("server_start")
+    for phase in startup_timer.report()["phases"]:
+        STARTUP_PHASE.labels(phase["phase"]).set(phase["seconds"])
+    startup_timer.log_breakdown()
+    if WARMUP_ON_START:
+        # Runs after the socket is bound, so it overlaps with the first request instead of delaying it
+        asyncio.create_task(_warm_up())
+    write_behind_log.start(lambda: supabase_config.admin_client)
+    reminder_scheduler.start(lambda: supabase_config.admin_client)
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await write_behind_log.stop()
+    await reminder_scheduler.stop()
+
+async def reserve_image_memory(file: UploadFile) -> int:
+    """Reserve memory for every copy of an uploaded image before it is read and decoded"""
+    size = file.size
+    if size is None:
+        # Size unknown (no Content-Length on the part): measure via the spooled file
+        file.file.seek(0, os.SEEK_END)
+        size = file.file.tell()
+        file.file.seek(0)
+    return await memory_budget.acquire(int(size * IN_FLIGHT_COPIES))
+
+def existing_promises_for_prompt(rows: List[Dict[str, Any]]) -> List[ExistingPromise]:
+    """
+    Convert promise rows to the compact form used in comparison prompts.
+    Sorted by creation, so the same rows always render the same. Only the
+    resolution check over a user's full open set repeats its list between
+    calls; dedup candidates are picked per promise, so their list differs.
+    """
+    existing_promises = []
+    for existing in sorted(rows, key=lambda row: (str(row.get("created_at") or ""), str(row.get("id") or ""))):
+        # Original promise details; rows from fetch_existing_promises are already decoded
+        extraction_data = decode_json(existing.get("extraction_data"), {})
+        existing_promises.append(ExistingPromise(
+            content=existing["content"],
+            to_whom=extraction_data.get("to_whom"),
+            deadline=extraction_data.get("deadline"),
+        ))
+    return existing_promises
+
+def promise_query(promise: BAMLPromise) -> str:
+    """Retrieval query text for an extracted promise"""
+    return " ".join(filter(None, [promise.content, promise.to_whom, promise.platform]))
+
+def fetch_existing_promises(admin_client: Client, user_id: str) -> List[Dict[str, Any]]:
+    """All promise rows of a user; empty if the query fails"""
+    try:
+        with timed_stage("supabase.select_promises"):
+            existing_promises_response = admin_client.table("promises").select("*").eq("owner_id", user_id).execute()
+        # jsonb columns are decoded once here, for every later use of the rows
+        existing_promises_raw = [decode_row(row) for row in existing_promises_response.data or []]
+        logger.debug("existing_promises_raw %s", existing_promises_raw)
+    except Exception as db_error:
+        logger.error(f"Error fetching existing promises: {db_error}")
+        # Continue with empty list if database fetch fails
+        existing_promises_raw = []
+    if write_behind_log.enabled:
+        # Promises and resolutions still in the write-behind log count as written
+        existing_promises_raw = write_behind_log.overlay(user_id, existing_promises_raw)
+    return existing_promises_raw
+
+def filter_new_promises(user_id: str, promises: List[BAMLPromise], existing_promises_raw: List[Dict[str, Any]], screenshot_timestamp: Optional[str] = None) -> List[BAMLPromise]:
+    """Keep the extracted promises that ShouldSaveNewPromise says aren't duplicates of existing ones"""
+    if not promises:
+        return []
+    try:
+        # Use BAML to evaluate each promise individually
+        logger.info(f"User {user_id} - Checking {len(promises)} new promises against {len(existing_promises_raw)} existing promises")
+        
+        new_promises_to_save = []
+        possibly_save_promises = []
+        definitely_not_save_promises = []
+        # Resolved promises have no fingerprint in the database; the overlay of pending resolutions may still carry one
+        existing_fingerprints = {row.get("fingerprint") for row in existing_promises_raw if row.get("fingerprint") and not row.get("resolved")}
+        
+        for promise in promises:
+            # An exact (normalized) match of an open promise needs no LLM check; the insert would be ignored anyway
+            due_date = deadline_resolver.due_date(user_id, promise.deadline, screenshot_timestamp, record=False)
+            if promise_fingerprint(promise.content, promise.to_whom, due_date) in existing_fingerprints:
+                definitely_not_save_promises.append(promise)
+                logger.info(f"User {user_id} - Fingerprint match, not saving: {promise.content}")
+                continue
+            try:
+                # Resolved promises stay candidates: one still visible on screen must not be saved again
+                candidates = promise_retriever.select(user_id, existing_promises_raw, promise_query(promise), open_only=False)
+                should_save_result = llm.call("ShouldSaveNewPromise", existing_promises_for_prompt(candidates), promise)
+                
+                if should_save_result == ShouldSaveNewPromiseEnum.DEFINITELY_SAVE:
+                    new_promises_to_save.append(promise)
+                    logger.info(f"User {user_id} - DEFINITELY_SAVE: {promise.content}")
+                elif should_save_result == ShouldSaveNewPromiseEnum.POSSIBLY_SAVE:
+                    possibly_save_promises.append(promise)
+                    logger.info(f"User {user_id} - POSSIBLY_SAVE: {promise.content}")
+                else:  # DEFINITELY_NOT_SAVE
+                    definitely_not_save_promises.append(promise)
+                    logger.info(f"User {user_id} - DEFINITELY_NOT_SAVE: {promise.content}")
+                    
+            except Exception as eval_error:
+                logger.error(f"User {user_id} - Error evaluating promise '{promise.content}': {eval_error}")
+                # On error, don't save to be safe
+                continue
+        
+        logger.info(f"User {user_id} - Results: {len(new_promises_to_save)} to save, {len(possibly_save_promises)} possibly save, {len(definitely_not_save_promises)} not save")
+        
+        # Add POSSIBLY_SAVE promises to the save list (they represent updates/clarifications)
+        new_promises_to_save.extend(possibly_save_promises)
+        logger.info(f"User {user_id} - Total promises to save after including possibly_save: {len(new_promises_to_save)}")
+        return new_promises_to_save
+        
+    except Exception as filter_error:
+        logger.error(f"Error filtering promises: {filter_error}")
+        # Fall back to saving all promises if filtering fails
+        return promises
+
+def promise_row(user_id: str, promise: BAMLPromise, screenshot_id: Optional[str], screenshot_timestamp: Optional[str]) -> Dict[str, Any]:
+    """Row inserted into the promises table for an extracted promise"""
+    person = promise.to_whom if promise.to_whom else "myself"
+    # The deadline text resolved to a timestamp (None when it's vague); the text stays in extraction_data
+    due_date = deadline_resolver.due_date(user_id, promise.deadline, screenshot_timestamp)
+    return {
+        "content": promise.content,
+        "owner_id": user_id,
+        "extracted_from_screenshot": True,
+        "screenshot_id": screenshot_id,
+        "screenshot_timestamp": screenshot_timestamp,
+        # jsonb columns take the objects themselves
+        "extraction_data": {
+            "to_whom": promise.to_whom,
+            "deadline": promise.deadline,
+            "platform": promise.platform,
+            "raw_promise": promise.content
+        },
+        "action": promise.action.model_dump(mode="json") if getattr(promise, 'action', None) else None,
+        # Store as separate columns for easier querying
+        "person": person,
+        "due_date": due_date,
+        "platform": promise.platform,
+        # Unique per owner among open promises: a duplicate insert is ignored by the database
+        "fingerprint": promise_fingerprint(promise.content, person, due_date)
+    }
+
+def insert_promise_rows(admin_client: Client, user_id: str, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Insert promise rows in one query, skipping any whose fingerprint the owner already has; returns the saved rows"""
+    logger.debug("Promise rows being sent to Supabase: %s", rows)
+    with timed_stage("supabase.insert_promise"):
+        response = admin_client.table("promises").upsert(rows, on_conflict="owner_id,fingerprint", ignore_duplicates=True).execute()
+    saved = response.data or []
+    record_promises("saved", len(saved))
+    reminder_scheduler.track(saved)
+    if saved:
+        change_feed.notify(user_id)
+    if len(saved) < len(rows):
+        record_promises("duplicate", len(rows) - len(saved))
+        logger.info(f"User {user_id} - {len(rows) - len(saved)} promises already saved (fingerprint match), skipped")
+    return saved
+
+def resolve_promise_rows(admin_client: Client, user_id: str, resolutions: List[Dict[str, Any]]) -> int:
+    """Mark the user's open promises with the given contents resolved; returns how many rows were updated"""
+    resolved_count = 0
+    for resolution in resolutions:
+        # Simply find the promise by content - trust the LLM's decision completely.
+        # resolve_promise merges the resolution into metadata server-side, in one round trip
+        with timed_stage("supabase.resolve_promise"):
+            update_response = admin_client.rpc("resolve_promise", {
+                "p_owner_id": user_id,
+                "p_content": resolution["content"],
+                "p_screenshot_id": resolution["screenshot_id"],
+                "p_screenshot_time": resolution["screenshot_timestamp"],
+                "p_reason": resolution["resolution_reasoning"],
+                "p_evidence": resolution["resolution_evidence"],
+            }).execute()
+        
+        if update_response.data:
+            resolved_count += len(update_response.data)
+            reminder_scheduler.forget(update_response.data)
+            change_feed.notify(user_id)
+        else:
+            logger.warning(f"User {user_id} - No matching unresolved promise found for: {resolution['content']}")
+    record_promises("resolved", resolved_count)
+    return resolved_count
+
+write_behind_log.register(WRITE_INSERT, insert_promise_rows)
+write_behind_log.register(WRITE_RESOLVE, resolve_promise_rows)
+
+def save_promises(admin_client: Client, user_id: str, promises: List[BAMLPromise], screenshot_id: Optional[str], screenshot_timestamp: Optional[str]) -> List[Dict[str, Any]]:
+    """Insert new promises, or log them for the write-behind flusher; returns the saved (or logged) rows"""
+    rows = [promise_row(user_id, promise, screenshot_id, screenshot_timestamp) for promise in promises]
+    if write_behind_log.enabled:
+        for row in rows:
+            write_behind_log.append(user_id, WRITE_INSERT, row)
+        return rows
+    
+    saved_promises = []
+    for row in rows:
+        try:
+            saved_promises.extend(insert_promise_rows(admin_client, user_id, [row]))
+        except Exception as save_error:
+            # Continue even if individual promise save fails
+            logger.error(f"User {user_id} - Failed to save promise '{row['content']}': {save_error}")
+    return saved_promises
+
+def mark_promises_resolved(admin_client: Client, user_id: str, resolved_promises: List[ResolvedPromise], screenshot_id: Optional[str], screenshot_timestamp: Optional[str]) -> int:
+    """
+    Mark the promises the model found resolved; returns how many rows were updated.
+    With write-behind the resolutions are logged instead, and all of them are counted.
+    """
+    if not resolved_promises:
+        logger.info(f"User {user_id} - No promises resolved")
+        return 0
+    logger.info(f"User {user_id} - Found {len(resolved_promises)} resolved promises")
+    
+    resolved_promises_count = 0
+    # Update each resolved promise in the database - trust the LLM completely
+    for resolved_promise in resolved_promises:
+        logger.info(f"User {user_id} - LLM says this promise is resolved: '{resolved_promise.original_promise.content}'")
+        resolution = {
+            "content": resolved_promise.original_promise.content,
+            "resolution_evidence": resolved_promise.resolution_evidence,
+            "resolution_reasoning": resolved_promise.resolution_reasoning,
+            "screenshot_id": screenshot_id,
+            "screenshot_timestamp": screenshot_timestamp,
+        }
+        try:
+            if write_behind_log.enabled:
+                write_behind_log.append(user_id, WRITE_RESOLVE, resolution)
+                updated = 1
+            else:
+                updated = resolve_promise_rows(admin_client, user_id, [resolution])
+            if updated:
+                resolved_promises_count += updated
+                logger.info(f"User {user_id} - ✅ Marked promise as resolved: {resolved_promise.original_promise.content}")
+                logger.info(f"User {user_id} - Resolution reason: {resolved_promise.resolution_reasoning}")
+        except Exception as resolve_error:
+            logger.error(f"User {user_id} - Error updating resolved promise: {resolve_error}")
+            continue
+    return resolved_promises_count
+
+async def check_frame_resolutions(
+    admin_client: Client,
+    user_id: str,
+    existing_promises_raw: List[Dict[str, Any]],
+    promises: List[Any],
+    frame_digest: str,
+    baml_image: baml_py.Image,
+    image_tokens: int,
+    screenshot_id: Optional[str],
+    screenshot_timestamp: Optional[str],
+):
+    """Check a frame for resolved promises when the resolution policy allows it; returns (resolved, count marked, decision)"""
+    open_promise_count = sum(1 for row in existing_promises_raw if not row.get("resolved"))
+    resolved_promises_count = 0
+    resolved_promises = []
+    resolution_decision = resolution_policy.decide(user_id, frame_digest, open_promise_count, len(promises))
+    if open_promise_count and resolution_decision.run:
+        try:
+            # Only open promises can be resolved; large sets are checked in shards, not cut down by retrieval
+            candidates = resolution_checker.candidates(user_id, existing_promises_raw)
+            logger.info(f"User {user_id} - Checking for resolved promises against {len(candidates)} of {open_promise_count} open promises")
+            
+            # Large candidate sets are split into concurrent shards and merged
+            resolved_promises = await resolution_checker.check(user_id, existing_promises_for_prompt(candidates), image=baml_image, image_tokens=image_tokens)
+            resolved_promises_count = await in_threadpool(mark_promises_resolved, admin_client, user_id, resolved_promises, screenshot_id, screenshot_timestamp)
+            resolution_policy.record_outcome(user_id, resolved_promises_count)
+        except Exception as resolve_check_error:
+            logger.error(f"User {user_id} - Error checking for resolved promises: {resolve_check_error}")
+    return resolved_promises, resolved_promises_count, resolution_decision
+
+def resolved_promises_info(resolved_promises: List[ResolvedPromise]) -> List[Dict[str, Any]]:
+    """Resolved promises as returned to clients"""
+    return [{
+        "content": resolved_promise.original_promise.content,
+        "to_whom": resolved_promise.original_promise.to_whom,
+        "deadline": resolved_promise.original_promise.deadline,
+        "resolution_reasoning": resolved_promise.resolution_reasoning,
+        "resolution_evidence": resolved_promise.resolution_evidence
+    } for resolved_promise in resolved_promises]
+
+def format_promises_for_notification(promises: List[BAMLPromise]) -> List[Dict[str, Any]]:
+    """Format new promises for client notifications, with a plain fallback if formatting fails"""
+    formatted_promises = []
+    for p in promises:
+        try:
+            # Format the promise for notification using BAML
+            formatted = llm.call("FormatPromiseForNotification", p)
+            formatted_promises.append({
+                "content": p.content,
+                "to_whom": p.to_whom,
+                "deadline": p.deadline,
+                "platform": p.platform,
+                "person": p.to_whom if p.to_whom else "myself",
+                "due_date": p.deadline,
+                "action": p.action.model_dump() if getattr(p, 'action', None) else None,
+                "formatted": {
+                    "title": formatted.title,
+                    "body": formatted.body,
+                    "details": formatted.details
+                }
+            })
+        except Exception as format_error:
+            # Fallback if formatting fails
+            formatted_promises.append({
+                "content": p.content,
+                "to_whom": p.to_whom,
+                "deadline": p.deadline,
+                "platform": p.platform,
+                "person": p.to_whom if p.to_whom else "myself",
+                "due_date": p.deadline,
+                "action": p.action.model_dump() if getattr(p, 'action', None) else None,
+                "formatted": {
+                    "title": p.content[:50],
+                    "body": p.content[:150],
+                    "details": f"To: {p.to_whom or 'myself'} • Due: {p.deadline or 'No deadline'} • Via: {p.platform or 'Unknown'}"
+                }
+            })
+    return formatted_promises
+
 # Pydantic models
 class HealthResponse(BaseModel):
     status: str
@@ -67,10 +490,28 @@ class BasicPromiseResponse(BaseModel):
 class ImageBase64Request(BaseModel):
     image_data: str  # base64 encoded image
 
+class TextExtractionRequest(BaseModel):
+    text: str  # on-screen text of one window, e.g. from the accessibility API
+    window_id: Optional[str] = None  # stable id of the window; app_name + window_title are used if missing
+    app_name: Optional[str] = None
+    window_title: Optional[str] = None
+    bundle_id: Optional[str] = None
+    screenshot_id: Optional[str] = None
+    screenshot_timestamp: Optional[str] = None
+    timezone: Optional[str] = None  # IANA name, e.g. "America/Los_Angeles", for resolving relative deadlines
+
+class FramePrecheckRequest(BaseModel):
+    phash: str  # hex perceptual hash (dHash) of the frame
+    app_name: Optional[str] = None
+    bundle_id: Optional[str] = None
+    window_title: Optional[str] = None
+    frame_bytes: int = 0  # size of the frame the client would upload, for bandwidth accounting
+
 class PromiseListResponse(BaseModel):
     promises: list
     resolved_promises: Optional[list] = []
     resolved_count: Optional[int] = 0
+    next_capture_delay_ms: Optional[int] = None  # recommended wait before the client's next capture
 
 # Authentication models
 class UserResponse(BaseModel):
@@ -94,6 +535,13 @@ class PromiseCreateAuth(BaseModel):
 async def root():
     return {"message": "Promise Keeper API is running!"}
 
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Prometheus metrics"""
+    memory_budget.update_gauges()
+    payload, content_type = render_latest()
+    return Response(content=payload, media_type=content_type)
+
 @app.get("/health", response_model=HealthResponse)
 async def health_check():
     return HealthResponse(
@@ -104,19 +552,25 @@ async def health_check():
 @app.post('/extract_promises_file', response_model=PromiseListResponse)
 async def extract_promises_from_file(file: UploadFile = File(...)):
     """Extract promises from an uploaded image file"""
+    reservation = 0
     try:
+        reservation = await reserve_image_memory(file)
+        
         # Read the uploaded file
-        image_bytes = await file.read()
+        with timed_stage("upload_read"):
+            image_bytes = await file.read()
         
         # Convert bytes to base64 and create baml_py.Image
-        image_base64 = base64.b64encode(image_bytes).decode('utf-8')
-        
-        # Get media type from file content type, default to image/png
-        media_type = file.content_type or "image/png"
-        baml_image = baml_py.Image.from_base64(media_type, image_base64)
+        with timed_stage("decode"):
+            image_base64 = base64.b64encode(image_bytes).decode('utf-8')
+            
+            # Get media type from file content type, default to image/png
+            media_type = file.content_type or "image/png"
+            baml_image = baml_py.Image.from_base64(media_type, image_base64)
         
         # Extract promises using BAML
-        promises = b.ExtractPromises(baml_image)
+        promises = llm.call("ExtractPromises", baml_image, image_tokens=estimate_image_tokens(image_bytes))
+        record_promises("extracted", len(getattr(promises, "promises", [])))
         
         # Log reasoning information
         if promises.reason_for_no_promises:
@@ -135,13 +589,21 @@ async def extract_promises_from_file(file: UploadFile = File(...)):
             }
             for p in promises.promises
         ])
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing image: {str(e)}")
+    finally:
+        memory_budget.release(reservation)
 
 @app.post('/extract_promises_base64', response_model=PromiseListResponse)
 async def extract_promises_from_base64(request: ImageBase64Request):
     """Extract promises from a base64 encoded image"""
+    reservation = 0
     try:
+        # The base64 string is already in memory; reserve for it plus the BAML image copy
+        reservation = await memory_budget.acquire(len(request.image_data) * 2)
+        
         # Get base64 image data
         image_data = request.image_data
         
@@ -157,10 +619,12 @@ async def extract_promises_from_base64(request: ImageBase64Request):
                     media_type = header.split(':')[1].split(';')[0]
         
         # Create baml_py.Image from base64
-        baml_image = baml_py.Image.from_base64(media_type, image_data)
+        with timed_stage("decode"):
+            baml_image = baml_py.Image.from_base64(media_type, image_data)
         
         # Extract promises using BAML
-        promises = b.ExtractPromises(baml_image)
+        promises = llm.call("ExtractPromises", baml_image)
+        record_promises("extracted", len(getattr(promises, "promises", [])))
         
         # Log reasoning information
         if promises.reason_for_no_promises:
@@ -185,26 +649,36 @@ async def extract_promises_from_base64(request: ImageBase64Request):
             }
             for p in final_promises
         ])
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing image: {str(e)}")
+    finally:
+        memory_budget.release(reservation)
 
 # Legacy endpoint for backward compatibility (with basic response)
 @app.post('/map_request_to_promise', response_model=BasicPromiseResponse)
 async def map_request_to_promise(file: UploadFile = File(...)):
     """Legacy endpoint - extract first promise from uploaded image"""
+    reservation = 0
     try:
+        reservation = await reserve_image_memory(file)
+        
         # Read the uploaded file
-        image_bytes = await file.read()
+        with timed_stage("upload_read"):
+            image_bytes = await file.read()
         
         # Convert bytes to base64 and create baml_py.Image
-        image_base64 = base64.b64encode(image_bytes).decode('utf-8')
-        
-        # Get media type from file content type, default to image/png
-        media_type = file.content_type or "image/png"
-        baml_image = baml_py.Image.from_base64(media_type, image_base64)
+        with timed_stage("decode"):
+            image_base64 = base64.b64encode(image_bytes).decode('utf-8')
+            
+            # Get media type from file content type, default to image/png
+            media_type = file.content_type or "image/png"
+            baml_image = baml_py.Image.from_base64(media_type, image_base64)
         
         # Extract promises using BAML
-        promises = b.ExtractPromises(baml_image)
+        promises = llm.call("ExtractPromises", baml_image, image_tokens=estimate_image_tokens(image_bytes))
+        record_promises("extracted", len(getattr(promises, "promises", [])))
         
         # Log reasoning information
         if promises.reason_for_no_promises:
@@ -216,8 +690,12 @@ async def map_request_to_promise(file: UploadFile = File(...)):
             return BasicPromiseResponse(promise=promises.promises[0].content)
         else:
             return BasicPromiseResponse(promise="No promises found in the image")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing image: {str(e)}")
+    finally:
+        memory_budget.release(reservation)
 
 # Authentication and protected routes
 @app.get("/auth/me", response_model=UserResponse)
@@ -238,40 +716,81 @@ async def test_auth(current_user: Dict[str, Any] = Depends(get_current_user)):
         email=current_user.get("email", "")
     )
 
-# Enhanced promise extraction with user association
-@app.post('/extract_promises_file_auth', response_model=PromiseListResponse)
-async def extract_promises_from_file_authenticated(
-    file: UploadFile = File(...),
-    screenshot_id: Optional[str] = Form(None),
-    screenshot_timestamp: Optional[str] = Form(None),
-    current_user: Dict[str, Any] = Depends(get_current_user),
-    admin_client: Client = Depends(get_supabase_admin_client)
+@app.post('/precheck_frame_auth')
+async def precheck_frame(
+    request: FramePrecheckRequest,
+    current_user: Dict[str, Any] = Depends(get_current_user)
 ):
-    """Extract promises from an uploaded image file and optionally save to database"""
+    """Tell the client whether to upload a frame, from its perceptual hash and app, before it sends the image"""
+    phash = request.phash.lower()
+    if not valid_hash(phash):
+        raise HTTPException(status_code=400, detail="phash must be 16 to 128 hex characters")
+    user_id = current_user.get("user_id", current_user.get("sub", ""))
+    decision = frame_precheck.check(user_id, phash, request.app_name, request.bundle_id, request.frame_bytes)
+    result = decision.to_dict()
+    # An uploaded frame gets its delay from the extraction response instead
+    if decision.action == "skip":
+        result["next_capture_delay_ms"] = capture_pacer.observe(user_id, phash)
+    return result
+
+async def run_file_extraction(
+    file: UploadFile,
+    screenshot_id: Optional[str],
+    screenshot_timestamp: Optional[str],
+    app_name: Optional[str],
+    window_title: Optional[str],
+    bundle_id: Optional[str],
+    phash: Optional[str],
+    current_user: Dict[str, Any],
+    admin_client: Client
+) -> PromiseListResponse:
+    """Image extraction pipeline: extract, dedup and save promises, then check for resolved ones"""
+    pipeline_start = time.perf_counter()
+    reservation = 0
     try:
+        user_id = current_user.get("user_id", current_user.get("sub", ""))
+        
+        logger.debug(f"Auth endpoint - User {user_id} - Frame from app={app_name!r} bundle={bundle_id!r} window={window_title!r}")
+        
+        # Frames from apps that never yield promises for this user are skipped before the upload is read
+        app_decision = frame_precheck.app_decision(user_id, phash, app_name, bundle_id)
+        if not app_decision.run:
+            return PromiseListResponse(promises=[], next_capture_delay_ms=capture_pacer.observe(user_id, phash))
+        
+        reservation = await reserve_image_memory(file)
+        
         # Read the uploaded file
-        image_bytes = await file.read()
+        with timed_stage("upload_read"):
+            image_bytes = await file.read()
         
         # Convert bytes to base64 and create baml_py.Image
-        image_base64 = base64.b64encode(image_bytes).decode('utf-8')
-        
-        # Get media type from file content type, default to image/png
-        media_type = file.content_type or "image/png"
-        baml_image = baml_py.Image.from_base64(media_type, image_base64)
+        with timed_stage("decode"):
+            frame_digest = hashlib.sha256(image_bytes).hexdigest()
+            image_base64 = base64.b64encode(image_bytes).decode('utf-8')
+            
+            # Get media type from file content type, default to image/png
+            media_type = file.content_type or "image/png"
+            baml_image = baml_py.Image.from_base64(media_type, image_base64)
+        image_tokens = estimate_image_tokens(image_bytes)
         
-        # Extract promises using BAML
-        from baml_client.types import PromiseListResponse as BAMLPromiseListResponse, NoPromisesFoundResponse
+        # Only the BAML image copy is needed from here on; hand the rest of the reservation back
+        del image_bytes, image_base64
+        transient_bytes = int(reservation * (1 - (4 / 3) / IN_FLIGHT_COPIES))
+        memory_budget.release(transient_bytes)
+        reservation -= transient_bytes
         
-        rawPromiseOutput = b.ExtractPromises(baml_image)
+        # Extract promises using BAML, behind the cheap GateFrame check when the gate is on
+        rawPromiseOutput = await extraction_gate.extract(user_id, baml_image, image_tokens=image_tokens, captured_at=screenshot_timestamp)
+        record_promises("extracted", len(getattr(rawPromiseOutput, "promises", [])))
+        app_context_policy.record_outcome(user_id, app_decision, bool(getattr(rawPromiseOutput, "promises", None)))
 
-        print('rawPromiseOutput', rawPromiseOutput.model_dump_json())
-        
-        user_id = current_user.get("user_id", current_user.get("sub", ""))
+        logger.debug("rawPromiseOutput %s", rawPromiseOutput)
         
         # Handle both response types
         if isinstance(rawPromiseOutput, NoPromisesFoundResponse):
             logger.info(f"Auth endpoint - User {user_id} - No promises found. Reason: {rawPromiseOutput.reason}")
-            return PromiseListResponse(promises=[])
+            frame_precheck.record_result(user_id, phash, 0, 0)
+            return PromiseListResponse(promises=[], next_capture_delay_ms=capture_pacer.observe(user_id, phash or frame_digest))
         
         # Handle PromiseListResponse
         if isinstance(rawPromiseOutput, BAMLPromiseListResponse):
@@ -296,254 +815,449 @@ async def extract_promises_from_file_authenticated(
 
         promises.promises = final_promises
         
-        # Initialize existing_promises_baml outside the if block
-        existing_promises_baml = []
-        
         # Always fetch existing promises for this user (for both new promise checking and resolved promise checking)
-        try:
-            existing_promises_response = admin_client.table("promises").select("*").eq("owner_id", user_id).execute()
-            existing_promises_raw = existing_promises_response.data or []
+        # Database and LLM steps run in the threadpool, so other requests' waiters keep running meanwhile
+        existing_promises_raw = await in_threadpool(fetch_existing_promises, admin_client, user_id)
+        
+        # If we found promises, check against existing ones in the database, then save only the new ones
+        new_promises_to_save = await in_threadpool(filter_new_promises, user_id, promises.promises, existing_promises_raw, screenshot_timestamp)
+        await in_threadpool(save_promises, admin_client, user_id, new_promises_to_save, screenshot_id, screenshot_timestamp)
+        
+        # Check for resolved promises using the same image, unless the policy says this frame can't resolve anything
+        resolved_promises, resolved_promises_count, resolution_decision = await check_frame_resolutions(
+            admin_client, user_id, existing_promises_raw, promises.promises, frame_digest,
+            baml_image, image_tokens, screenshot_id, screenshot_timestamp,
+        )
+        
+        logger.info(f"Auth endpoint - User {user_id} - Summary: {len(new_promises_to_save)} new promises saved, {resolved_promises_count} promises marked as resolved, resolution check {'ran' if resolution_decision.run else 'skipped'} ({resolution_decision.reason})")
+        
+        if startup_timer.mark_first_extraction():
+            FIRST_EXTRACTION.set(startup_timer.first_extraction_seconds)
+        frame_precheck.record_result(user_id, phash, len(new_promises_to_save), resolved_promises_count)
+        
+        return PromiseListResponse(
+            promises=await in_threadpool(format_promises_for_notification, new_promises_to_save),
+            resolved_promises=resolved_promises_info(resolved_promises) if resolved_promises_count > 0 else [],
+            resolved_count=resolved_promises_count,
+            next_capture_delay_ms=capture_pacer.observe(user_id, phash or frame_digest, len(promises.promises))
+        )
+    except HTTPException:
+        STAGE_ERRORS.labels("total").inc()
+        raise
+    except Exception as e:
+        STAGE_ERRORS.labels("total").inc()
+        raise HTTPException(status_code=500, detail=f"Error processing image: {str(e)}")
+    finally:
+        memory_budget.release(reservation)
+        observe_stage("total", time.perf_counter() - pipeline_start)
 
-            print('existing_promises_raw', existing_promises_raw)
-            
-            # Convert existing promises to BAML Promise format
-            from baml_client.types import Promise as BAMLPromise
-            for existing in existing_promises_raw:
-                # Parse extraction_data to get original promise details
-                extraction_data = json.loads(existing.get("extraction_data", "{}"))
-                
-                # Parse action column (JSON string/object) into BAML Action
-                action_raw = existing.get("action")
-                baml_action_obj = None
-                if action_raw:
-                    try:
-                        if isinstance(action_raw, str):
-                            action_dict = json.loads(action_raw)
-                        else:
-                            action_dict = action_raw
-                        from baml_client.types import Action as BAMLAction
-                        baml_action_obj = BAMLAction(**action_dict)
-                    except Exception:
-                        baml_action_obj = None
-                
-                existing_promises_baml.append(BAMLPromise(
-                    content=existing["content"],
-                    reasoning=None,  # Don't need reasoning for existing promises
-                    to_whom=extraction_data.get("to_whom"),
-                    deadline=extraction_data.get("deadline"),
-                    action=baml_action_obj,
-                    how_sure=True
-                ))
-        except Exception as db_error:
-            logger.error(f"Error fetching existing promises: {db_error}")
-            # Continue with empty list if database fetch fails
-            existing_promises_baml = []
-        
-        # If we found promises, check against existing ones in the database
-        new_promises_to_save = []
-        if promises.promises:
-            try:
-                # Use BAML to evaluate each promise individually
-                logger.info(f"Auth endpoint - User {user_id} - Checking {len(promises.promises)} new promises against {len(existing_promises_baml)} existing promises")
-                
-                from baml_client.types import ShouldSaveNewPromiseEnum
-                
-                new_promises_to_save = []
-                possibly_save_promises = []
-                definitely_not_save_promises = []
-                
-                for promise in promises.promises:
-                    try:
-                        should_save_result = b.ShouldSaveNewPromise(existing_promises_baml, promise)
-                        
-                        if should_save_result == ShouldSaveNewPromiseEnum.DEFINITELY_SAVE:
-                            new_promises_to_save.append(promise)
-                            logger.info(f"Auth endpoint - User {user_id} - DEFINITELY_SAVE: {promise.content}")
-                        elif should_save_result == ShouldSaveNewPromiseEnum.POSSIBLY_SAVE:
-                            possibly_save_promises.append(promise)
-                            logger.info(f"Auth endpoint - User {user_id} - POSSIBLY_SAVE: {promise.content}")
-                        else:  # DEFINITELY_NOT_SAVE
-                            definitely_not_save_promises.append(promise)
-                            logger.info(f"Auth endpoint - User {user_id} - DEFINITELY_NOT_SAVE: {promise.content}")
-                            
-                    except Exception as eval_error:
-                        logger.error(f"Auth endpoint - User {user_id} - Error evaluating promise '{promise.content}': {eval_error}")
-                        # On error, don't save to be safe
-                        continue
-                
-                logger.info(f"Auth endpoint - User {user_id} - Results: {len(new_promises_to_save)} to save, {len(possibly_save_promises)} possibly save, {len(definitely_not_save_promises)} not save")
-                
-                # Add POSSIBLY_SAVE promises to the save list (they represent updates/clarifications)
-                new_promises_to_save.extend(possibly_save_promises)
-                logger.info(f"Auth endpoint - User {user_id} - Total promises to save after including possibly_save: {len(new_promises_to_save)}")
-                
-            except Exception as filter_error:
-                logger.error(f"Error filtering promises: {filter_error}")
-                # Fall back to saving all promises if filtering fails
-                new_promises_to_save = promises.promises
+async def run_text_extraction(
+    request: TextExtractionRequest,
+    current_user: Dict[str, Any],
+    admin_client: Client
+) -> PromiseListResponse:
+    """Text extraction pipeline, sending only the lines that are new for this window"""
+    pipeline_start = time.perf_counter()
+    try:
+        if len(request.text) > MAX_TRANSCRIPT_CHARS:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"Text too long ({len(request.text)} characters, limit is {MAX_TRANSCRIPT_CHARS})",
+            )
+        user_id = current_user.get("user_id", current_user.get("sub", ""))
+        app_decision = app_context_policy.decide(user_id, request.app_name, request.bundle_id)
+        if not app_decision.run:
+            return PromiseListResponse(promises=[], next_capture_delay_ms=capture_pacer.observe(user_id))
+        window_key = request.window_id or f"{request.app_name or ''}\x1f{request.window_title or ''}"
         
-        # Save only the new promises to database
-        saved_promises = []
+        with timed_stage("transcript_diff"):
+            diff = transcript_store.diff(user_id, window_key, request.text)
+        if not diff.new_lines:
+            logger.info(f"Text endpoint - User {user_id} - No new lines, skipping")
+            return PromiseListResponse(promises=[], next_capture_delay_ms=capture_pacer.observe(user_id, diff.digest))
+        transcript = (diff.context_text, diff.new_text)
         
-        for promise in new_promises_to_save:
-            try:
-                # Debug: Let's see what we're working with
-                print(f"Promise object: {promise}")
-                print(f"Promise action: {promise.action}")
-                print(f"Promise reasoning: {promise.reasoning}")
-
-                promise_data = {
-                    "content": promise.content,
-                    "owner_id": user_id,
-                    "extracted_from_screenshot": True,
-                    "screenshot_id": screenshot_id,
-                    "screenshot_timestamp": screenshot_timestamp,
-                    "extraction_data": json.dumps({
-                        "to_whom": promise.to_whom,
-                        "deadline": promise.deadline,
-                        "platform": promise.platform,
-                        "raw_promise": promise.content
-                    }),
-                    "action": json.dumps(promise.action.model_dump()) if getattr(promise, 'action', None) else None,
-                    # Store as separate columns for easier querying
-                    "person": promise.to_whom if promise.to_whom else "myself",
-                    "due_date": promise.deadline,  # This will be stored as text, frontend can parse
-                    "platform": promise.platform
-                }
-                
-                print(f"Final promise_data being sent to Supabase: {json.dumps(promise_data, indent=2)}")
-                
-                response = admin_client.table("promises").insert(promise_data).execute()
-                if response.data:
-                    saved_promises.append(response.data[0])
-            except Exception as save_error:
-                # Continue even if individual promise save fails
-                print(f"Failed to save promise: {save_error}")
-        
-        # Check for resolved promises using the same image
+        raw_output = await llm.acall("ExtractPromisesFromText", request.app_name, *transcript)
+        extracted = raw_output.promises if isinstance(raw_output, BAMLPromiseListResponse) else []
+        record_promises("extracted", len(extracted))
+        app_context_policy.record_outcome(user_id, app_decision, bool(extracted))
+        if isinstance(raw_output, NoPromisesFoundResponse):
+            logger.info(f"Text endpoint - User {user_id} - No promises found. Reason: {raw_output.reason}")
+        promises = [p for p in extracted if p.how_sure]
+        
+        existing_promises_raw = await in_threadpool(fetch_existing_promises, admin_client, user_id)
+        open_promise_count = sum(1 for row in existing_promises_raw if not row.get("resolved"))
+        
+        new_promises_to_save = await in_threadpool(filter_new_promises, user_id, promises, existing_promises_raw, request.screenshot_timestamp)
+        await in_threadpool(save_promises, admin_client, user_id, new_promises_to_save, request.screenshot_id, request.screenshot_timestamp)
+        
+        # Text is cheap to check, so resolution runs even when nothing new was promised (the policy still gates it)
         resolved_promises_count = 0
-        if existing_promises_baml:
+        resolved_promises = []
+        resolution_decision = resolution_policy.decide(user_id, diff.digest, open_promise_count, len(promises))
+        if open_promise_count and resolution_decision.run:
             try:
-                from baml_client.types import ResolvedPromisesResponse, NoPromisesResolvedResponse
-                
-                logger.info(f"Auth endpoint - User {user_id} - Checking for resolved promises against {len(existing_promises_baml)} existing promises")
-                
-                resolved_check_result = b.CheckResolvedPromises(baml_image, existing_promises_baml)
-                
-                if isinstance(resolved_check_result, ResolvedPromisesResponse):
-                    logger.info(f"Auth endpoint - User {user_id} - Found {len(resolved_check_result.resolved_promises)} resolved promises")
-                    
-                    # Update each resolved promise in the database - trust the LLM completely
-                    for resolved_promise in resolved_check_result.resolved_promises:
-                        try:
-                            logger.info(f"Auth endpoint - User {user_id} - LLM says this promise is resolved: '{resolved_promise.original_promise.content}'")
-                            
-                            # Simply find the promise by content - trust the LLM's decision completely
-                            # First, get the existing promise to preserve metadata
-                            existing_promise_response = admin_client.table("promises").select("metadata").eq("owner_id", user_id).eq("content", resolved_promise.original_promise.content).eq("resolved", False).execute()
-                            
-                            existing_metadata = {}
-                            if existing_promise_response.data and existing_promise_response.data[0].get("metadata"):
-                                try:
-                                    existing_metadata = json.loads(existing_promise_response.data[0]["metadata"])
-                                except json.JSONDecodeError:
-                                    existing_metadata = {}
-                            
-                            # Merge resolution info with existing metadata
-                            updated_metadata = {**existing_metadata}
-                            updated_metadata["resolution_evidence"] = resolved_promise.resolution_evidence
-                            updated_metadata["resolution_reasoning"] = resolved_promise.resolution_reasoning
-                            
-                            update_response = admin_client.table("promises").update({
-                                "resolved": True,
-                                "resolved_screenshot_id": screenshot_id,
-                                "resolved_screenshot_time": screenshot_timestamp,
-                                "resolved_reason": resolved_promise.resolution_reasoning,
-                                "updated_at": "now()",
-                                "metadata": json.dumps(updated_metadata) if updated_metadata else None
-                            }).eq("owner_id", user_id).eq("content", resolved_promise.original_promise.content).eq("resolved", False).execute()
-                            
-                            if update_response.data:
-                                resolved_promises_count += len(update_response.data)
-                                logger.info(f"Auth endpoint - User {user_id} - ✅ Marked promise as resolved: {resolved_promise.original_promise.content}")
-                                logger.info(f"Auth endpoint - User {user_id} - Resolution reason: {resolved_promise.resolution_reasoning}")
-                            else:
-                                logger.warning(f"Auth endpoint - User {user_id} - No matching unresolved promise found for: {resolved_promise.original_promise.content}")
-                                
-                        except Exception as resolve_error:
-                            logger.error(f"Auth endpoint - User {user_id} - Error updating resolved promise: {resolve_error}")
-                            continue
-                
-                elif isinstance(resolved_check_result, NoPromisesResolvedResponse):
-                    logger.info(f"Auth endpoint - User {user_id} - No promises resolved. Reason: {resolved_check_result.reason}")
-                    
+                candidates = resolution_checker.candidates(user_id, existing_promises_raw)
+                resolved_promises = await resolution_checker.check(user_id, existing_promises_for_prompt(candidates), transcript=transcript)
+                resolved_promises_count = await in_threadpool(mark_promises_resolved, admin_client, user_id, resolved_promises, request.screenshot_id, request.screenshot_timestamp)
+                resolution_policy.record_outcome(user_id, resolved_promises_count)
             except Exception as resolve_check_error:
-                logger.error(f"Auth endpoint - User {user_id} - Error checking for resolved promises: {resolve_check_error}")
-        
-        logger.info(f"Auth endpoint - User {user_id} - Summary: {len(new_promises_to_save)} new promises saved, {resolved_promises_count} promises marked as resolved")
+                logger.error(f"Text endpoint - User {user_id} - Error checking for resolved promises: {resolve_check_error}")
         
-        # Prepare resolved promises info for response
-        resolved_promises_info = []
-        if existing_promises_baml and resolved_promises_count > 0:
-            try:
-                if isinstance(resolved_check_result, ResolvedPromisesResponse):
-                    for resolved_promise in resolved_check_result.resolved_promises:
-                        resolved_promises_info.append({
-                            "content": resolved_promise.original_promise.content,
-                            "to_whom": resolved_promise.original_promise.to_whom,
-                            "deadline": resolved_promise.original_promise.deadline,
-                            "resolution_reasoning": resolved_promise.resolution_reasoning,
-                            "resolution_evidence": resolved_promise.resolution_evidence
-                        })
-            except Exception as resolved_info_error:
-                logger.error(f"Error preparing resolved promises info: {resolved_info_error}")
-        
-        # Format promises for notifications
-        formatted_promises = []
-        for p in new_promises_to_save:
-            try:
-                # Format the promise for notification using BAML
-                formatted = b.FormatPromiseForNotification(p)
-                formatted_promises.append({
-                    "content": p.content,
-                    "to_whom": p.to_whom,
-                    "deadline": p.deadline,
-                    "platform": p.platform,
-                    "person": p.to_whom if p.to_whom else "myself",
-                    "due_date": p.deadline,
-                    "action": p.action.model_dump() if getattr(p, 'action', None) else None,
-                    "formatted": {
-                        "title": formatted.title,
-                        "body": formatted.body,
-                        "details": formatted.details
-                    }
-                })
-            except Exception as format_error:
-                # Fallback if formatting fails
-                formatted_promises.append({
-                    "content": p.content,
-                    "to_whom": p.to_whom,
-                    "deadline": p.deadline,
-                    "platform": p.platform,
-                    "person": p.to_whom if p.to_whom else "myself",
-                    "due_date": p.deadline,
-                    "action": p.action.model_dump() if getattr(p, 'action', None) else None,
-                    "formatted": {
-                        "title": p.content[:50],
-                        "body": p.content[:150],
-                        "details": f"To: {p.to_whom or 'myself'} • Due: {p.deadline or 'No deadline'} • Via: {p.platform or 'Unknown'}"
-                    }
-                })
+        logger.info(f"Text endpoint - User {user_id} - Summary: {len(diff.new_lines)} new lines, {len(new_promises_to_save)} new promises saved, {resolved_promises_count} promises marked as resolved")
         
         return PromiseListResponse(
-            promises=formatted_promises,
-            resolved_promises=resolved_promises_info,
-            resolved_count=resolved_promises_count
+            promises=await in_threadpool(format_promises_for_notification, new_promises_to_save),
+            resolved_promises=resolved_promises_info(resolved_promises) if resolved_promises_count > 0 else [],
+            resolved_count=resolved_promises_count,
+            next_capture_delay_ms=capture_pacer.observe(user_id, diff.digest, len(promises))
         )
+    except HTTPException:
+        STAGE_ERRORS.labels("total").inc()
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error processing image: {str(e)}")
+        STAGE_ERRORS.labels("total").inc()
+        raise HTTPException(status_code=500, detail=f"Error processing text: {str(e)}")
+    finally:
+        observe_stage("total", time.perf_counter() - pipeline_start)
+
+# Enhanced promise extraction with user association
+@app.post('/extract_promises_file_auth', response_model=PromiseListResponse)
+async def extract_promises_from_file_authenticated(
+    file: UploadFile = File(...),
+    screenshot_id: Optional[str] = Form(None),
+    screenshot_timestamp: Optional[str] = Form(None),
+    app_name: Optional[str] = Form(None),
+    window_title: Optional[str] = Form(None),
+    bundle_id: Optional[str] = Form(None),
+    phash: Optional[str] = Form(None),
+    timezone: Optional[str] = Form(None),
+    current_user: Dict[str, Any] = Depends(get_current_user),
+    admin_client: Client = Depends(get_supabase_admin_client)
+):
+    """Extract promises from an uploaded image file and optionally save to database. Retries with the same screenshot_id get the first response."""
+    user_id = current_user.get("user_id", current_user.get("sub", ""))
+    deadline_resolver.remember_timezone(user_id, timezone)
+    return await idempotency_cache.run(
+        user_id,
+        screenshot_id,
+        lambda: run_file_extraction(file, screenshot_id, screenshot_timestamp, app_name, window_title, bundle_id, phash, current_user, admin_client),
+        PromiseListResponse,
+    )
+
+@app.post('/extract_promises_text_auth', response_model=PromiseListResponse)
+async def extract_promises_from_text_authenticated(
+    request: TextExtractionRequest,
+    current_user: Dict[str, Any] = Depends(get_current_user),
+    admin_client: Client = Depends(get_supabase_admin_client)
+):
+    """Extract promises from on-screen text. Retries with the same screenshot_id get the first response."""
+    user_id = current_user.get("user_id", current_user.get("sub", ""))
+    deadline_resolver.remember_timezone(user_id, request.timezone)
+    return await idempotency_cache.run(
+        user_id,
+        request.screenshot_id,
+        lambda: run_text_extraction(request, current_user, admin_client),
+        PromiseListResponse,
+    )
+
+async def extract_batch_frame(user_id: str, frame: BatchFrame, semaphore: asyncio.Semaphore) -> Dict[str, Any]:
+    """Concurrent half of the batch pipeline: read the frame and run extraction"""
+    # The permit is released only after the frame is committed, which bounds the frames (and images) in flight
+    await semaphore.acquire()
+    reservation = 0
+    try:
+        app_decision = app_context_policy.decide(user_id, frame.app_name, frame.bundle_id)
+        if not app_decision.run:
+            return {"status": "skipped", "reason": app_decision.reason}
+        reservation = await reserve_image_memory(frame.file)
+        with timed_stage("upload_read"):
+            image_bytes = await frame.file.read()
+        with timed_stage("decode"):
+            baml_image = baml_py.Image.from_base64(frame.file.content_type or "image/png", base64.b64encode(image_bytes).decode('utf-8'))
+        image_tokens = estimate_image_tokens(image_bytes)
+        del image_bytes
+        output = await extraction_gate.extract(user_id, baml_image, image_tokens=image_tokens, captured_at=frame.screenshot_timestamp)
+        record_promises("extracted", len(getattr(output, "promises", [])))
+        app_context_policy.record_outcome(user_id, app_decision, bool(getattr(output, "promises", None)))
+        return {"status": "extracted", "output": output, "image": baml_image, "image_tokens": image_tokens, "reservation": reservation}
+    except BaseException:
+        memory_budget.release(reservation)
+        raise
+
+async def commit_batch_frame(admin_client: Client, user_id: str, frame: BatchFrame, extracted: Dict[str, Any], existing_promises_raw: List[Dict[str, Any]]) -> PromiseListResponse:
+    """Ordered half of the batch pipeline: dedup and save promises, then check for resolved ones"""
+    output = extracted["output"]
+    # As in run_file_extraction: a frame with nothing on it is not checked for resolutions either
+    if isinstance(output, NoPromisesFoundResponse):
+        logger.info(f"Batch endpoint - User {user_id} - Frame {frame.index} - No promises found. Reason: {output.reason}")
+        return PromiseListResponse(promises=[])
+    promises = [p for p in output.promises if p.how_sure] if isinstance(output, BAMLPromiseListResponse) else []
+    new_promises_to_save = await run_in_threadpool(filter_new_promises, user_id, promises, existing_promises_raw, frame.screenshot_timestamp)
+    await run_in_threadpool(save_promises, admin_client, user_id, new_promises_to_save, frame.screenshot_id, frame.screenshot_timestamp)
+    resolved_promises, resolved_promises_count, _ = await check_frame_resolutions(
+        admin_client, user_id, existing_promises_raw, promises, frame.digest,
+        extracted["image"], extracted["image_tokens"], frame.screenshot_id, frame.screenshot_timestamp,
+    )
+    return PromiseListResponse(
+        promises=await run_in_threadpool(format_promises_for_notification, new_promises_to_save),
+        resolved_promises=resolved_promises_info(resolved_promises) if resolved_promises_count > 0 else [],
+        resolved_count=resolved_promises_count
+    )
+
+async def stream_batch_results(user_id: str, frames: List[BatchFrame], admin_client: Client):
+    """
+    Yield one NDJSON line per frame, in capture order, then a summary line.
+    Extraction runs for up to BATCH_CONCURRENCY frames at once; saving and
+    resolution checks run one frame at a time in order, so a promise made in an
+    earlier frame can be resolved by a later one.
+    """
+    batch_start = time.perf_counter()
+    summary = {"frames": len(frames), "processed": 0, "duplicates": 0, "replayed": 0, "skipped": 0, "errors": 0, "promises_saved": 0, "promises_resolved": 0}
+    for frame in frames:
+        await run_in_threadpool(frame.compute_digest)
+    ordered = plan_batch(frames)
+
+    # The user's promises are fetched once, and again only after a frame changed them
+    existing_promises_raw = await run_in_threadpool(fetch_existing_promises, admin_client, user_id)
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+    replays: Dict[int, Dict[str, Any]] = {}
+    tasks: Dict[int, asyncio.Task] = {}
+    for frame in ordered:
+        if frame.duplicate_of is not None:
+            continue
+        stored = idempotency_cache.lookup(user_id, frame.screenshot_id)
+        if stored is not None:
+            replays[frame.index] = stored
+        else:
+            tasks[frame.index] = asyncio.create_task(extract_batch_frame(user_id, frame, semaphore))
+
+    consumed = set()
+    try:
+        for frame in ordered:
+            line = frame.summary()
+            if frame.duplicate_of is not None:
+                line.update(status="duplicate", duplicate_of=frame.duplicate_of)
+                summary["duplicates"] += 1
+            elif frame.index in replays:
+                line.update(status="replayed", result=replays[frame.index])
+                summary["replayed"] += 1
+            else:
+                consumed.add(frame.index)
+                reservation = 0
+                try:
+                    extracted = await tasks[frame.index]
+                    if extracted["status"] == "skipped":
+                        line.update(status="skipped", reason=extracted["reason"])
+                        summary["skipped"] += 1
+                    else:
+                        reservation = extracted["reservation"]
+                        response = await commit_batch_frame(admin_client, user_id, frame, extracted, existing_promises_raw)
+                        idempotency_cache.store(user_id, frame.screenshot_id, response)
+                        line.update(status="ok", result=response.model_dump(mode="json"))
+                        summary["processed"] += 1
+                        summary["promises_saved"] += len(response.promises)
+                        summary["promises_resolved"] += response.resolved_count or 0
+                        if response.promises or response.resolved_count:
+                            existing_promises_raw = await run_in_threadpool(fetch_existing_promises, admin_client, user_id)
+                except Exception as frame_error:
+                    STAGE_ERRORS.labels("batch_frame").inc()
+                    logger.error(f"Batch endpoint - User {user_id} - Frame {frame.index} failed: {frame_error}")
+                    line.update(status="error", detail=getattr(frame_error, "detail", None) or str(frame_error))
+                    summary["errors"] += 1
+                finally:
+                    memory_budget.release(reservation)
+                    semaphore.release()
+            yield json.dumps(line) + "\n"
+
+        summary["seconds"] = round(time.perf_counter() - batch_start, 3)
+        logger.info(f"Batch endpoint - User {user_id} - Summary: {summary}")
+        yield json.dumps({"summary": summary}) + "\n"
+    finally:
+        # The client went away mid-stream: stop pending extractions and free finished ones
+        for index, task in tasks.items():
+            if index in consumed:
+                continue
+            if task.done() and not task.cancelled() and task.exception() is None:
+                memory_budget.release(task.result().get("reservation", 0))
+            else:
+                task.cancel()
+
+@app.post('/extract_promises_batch_auth')
+async def extract_promises_batch_authenticated(
+    files: List[UploadFile] = File(...),
+    frames: Optional[str] = Form(None),
+    timezone: Optional[str] = Form(None),
+    current_user: Dict[str, Any] = Depends(get_current_user),
+    admin_client: Client = Depends(get_supabase_admin_client)
+):
+    """
+    Extract promises from a backlog of frames in one request. `frames` is an optional JSON array with
+    one object per file (screenshot_id, screenshot_timestamp, phash, app_name, bundle_id); `timezone` is the
+    client's IANA timezone.
+    Results stream back as NDJSON, one line per frame in capture order, then a summary line.
+    """
+    if len(files) > MAX_BATCH_FRAMES:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Too many frames ({len(files)}, limit is {MAX_BATCH_FRAMES})",
+        )
+    try:
+        metadata = json.loads(frames) if frames else [{} for _ in files]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="frames must be a JSON array")
+    if not isinstance(metadata, list) or len(metadata) != len(files) or not all(isinstance(m, dict) for m in metadata):
+        raise HTTPException(status_code=400, detail="frames must be a JSON array with one object per file")
+    
+    user_id = current_user.get("user_id", current_user.get("sub", ""))
+    deadline_resolver.remember_timezone(user_id, timezone)
+    batch_frames = [BatchFrame(index, file, meta) for index, (file, meta) in enumerate(zip(files, metadata))]
+    return StreamingResponse(stream_batch_results(user_id, batch_frames, admin_client), media_type="application/x-ndjson")
+
+@app.get("/promises/changes")
+async def get_promise_changes(
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    wait: float = 0,
+    current_user: Dict[str, Any] = Depends(get_current_user),
+    admin_client: Client = Depends(get_supabase_admin_client)
+):
+    """
+    The user's promises inserted, updated or resolved after `cursor`, oldest change first. Start without a
+    cursor, then pass back the returned one; while `has_more`, ask again right away. Each row replaces the
+    client's copy; NULL columns are left out. With `wait` (seconds), an empty page long-polls for changes.
+    """
+    user_id = current_user.get("user_id", current_user.get("sub", ""))
+    return await change_feed.changes(admin_client, user_id, cursor, limit, wait)
+
+@app.get("/reminders")
+async def get_reminders(after: Optional[int] = None, current_user: Dict[str, Any] = Depends(get_current_user)):
+    """The user's reminder events (due, overdue) after the `after` cursor; pass back the returned cursor"""
+    user_id = current_user.get("user_id", current_user.get("sub", ""))
+    events, cursor = reminder_scheduler.channel.since(user_id, after or 0)
+    return {"events": events, "cursor": cursor}
+
+@app.get("/reminders/stream")
+async def stream_reminders(request: Request, after: Optional[int] = None, current_user: Dict[str, Any] = Depends(get_current_user)):
+    """Server-sent events for the user's reminders, resuming after `after` or the Last-Event-ID header"""
+    user_id = current_user.get("user_id", current_user.get("sub", ""))
+    last_event_id = request.headers.get("last-event-id")
+    if last_event_id and last_event_id.isdigit():
+        after = int(last_event_id)
+    return StreamingResponse(
+        reminder_scheduler.stream(user_id, after, request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/admin/change_feed")
+async def get_change_feed_stats(current_user: Dict[str, Any] = Depends(require_admin)):
+    """Change feed pages served, rows per page and long-poll waits"""
+    return change_feed.stats()
+
+@app.get("/admin/reminders")
+async def get_reminder_stats(current_user: Dict[str, Any] = Depends(require_admin)):
+    """Reminder scheduler owner, promises scheduled, events emitted and delay"""
+    return reminder_scheduler.stats()
+
+@app.get("/admin/idempotency")
+async def get_idempotency_stats(current_user: Dict[str, Any] = Depends(require_admin)):
+    """Extraction requests executed, replayed from a stored response, or attached to a running one"""
+    return idempotency_cache.stats()
+
+@app.get("/admin/write_behind")
+async def get_write_behind_stats(current_user: Dict[str, Any] = Depends(require_admin)):
+    """Write-behind log backlog, lag, and entries flushed, retried or given up on"""
+    return await run_in_threadpool(write_behind_log.stats)
+
+@app.get("/admin/deadlines")
+async def get_deadline_stats(current_user: Dict[str, Any] = Depends(require_admin)):
+    """Deadlines resolved to a due_date, and ones left NULL as too vague"""
+    return deadline_resolver.stats()
+
+@app.get("/admin/multiframe")
+async def get_multiframe_stats(current_user: Dict[str, Any] = Depends(require_admin)):
+    """Frames extracted through multi-frame windows, and the ExtractPromises calls that saved"""
+    return multiframe_batcher.stats()
+
+@app.get("/admin/resolution_policy")
+async def get_resolution_policy_stats(current_user: Dict[str, Any] = Depends(require_admin)):
+    """Report how many CheckResolvedPromises calls the resolution policy has avoided, and the current shard size"""
+    return {**resolution_policy.stats(), "sharding": resolution_checker.stats()}
+
+@app.get("/admin/extraction_gate")
+async def get_extraction_gate_stats(current_user: Dict[str, Any] = Depends(require_admin)):
+    """Extraction gate verdicts, and its precision/recall against full extraction in shadow mode"""
+    return extraction_gate.stats()
+
+@app.get("/admin/app_context")
+async def get_app_context_stats(
+    user_id: Optional[str] = None,
+    current_user: Dict[str, Any] = Depends(require_admin)
+):
+    """Frames skipped by app context; with user_id, that user's per-app extraction yield"""
+    stats = app_context_policy.stats()
+    if user_id:
+        stats["apps"] = app_context_policy.user_stats(user_id)
+    return stats
+
+@app.get("/admin/frame_precheck")
+async def get_frame_precheck_stats(current_user: Dict[str, Any] = Depends(require_admin)):
+    """Uploads requested and avoided by the frame pre-check, and bytes saved"""
+    return frame_precheck.stats()
+
+@app.get("/admin/memory")
+async def get_memory_stats(current_user: Dict[str, Any] = Depends(require_admin)):
+    """Memory budget usage, per-cache sizes and process RSS"""
+    return memory_budget.stats()
+
+@app.get("/admin/startup")
+async def get_startup_breakdown(current_user: Dict[str, Any] = Depends(require_admin)):
+    """Startup-time breakdown and time to first successful extraction"""
+    return startup_timer.report()
+
+@app.post("/admin/profile/arm")
+async def arm_request_profiler(
+    path: str = "/extract_promises_file_auth",
+    count: int = 1,
+    current_user: Dict[str, Any] = Depends(require_admin)
+):
+    """Profile the next `count` requests to `path`; fetch results from /admin/profile/results"""
+    profile_registry.arm(path, count)
+    return {"armed": path, "count": count}
+
+@app.post("/admin/profile/window", response_class=PlainTextResponse)
+async def profile_time_window(
+    seconds: float = 10.0,
+    current_user: Dict[str, Any] = Depends(require_admin)
+):
+    """Sample every thread for a time window and return collapsed stacks (flamegraph.pl / speedscope input)"""
+    if seconds <= 0 or seconds > 120:
+        raise HTTPException(status_code=400, detail="seconds must be between 0 and 120")
+    profiler = profile_registry.begin(PROFILER_INTERVAL_SECONDS)
+    if not profiler:
+        raise HTTPException(status_code=409, detail="A profiler is already running")
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        profile = profile_registry.finish(profiler, f"window {seconds}s")
+    return PlainTextResponse(profile["collapsed"], headers={"X-Profile-Id": profile["id"]})
+
+@app.get("/admin/profile/results")
+async def list_profiles(current_user: Dict[str, Any] = Depends(require_admin)):
+    """List captured profiles"""
+    return profile_registry.list()
+
+@app.get("/admin/profile/results/{profile_id}", response_class=PlainTextResponse)
+async def get_profile(profile_id: str, current_user: Dict[str, Any] = Depends(require_admin)):
+    """Return a captured profile as collapsed stacks"""
+    profile = profile_registry.get(profile_id)
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse(profile["collapsed"])
+
+startup_timer.mark("app_setup")
 
 if __name__ == "__main__":
-    import uvicorn
-    port = int(os.getenv("PORT", 8000))
-    uvicorn.run(app, host="0.0.0.0", port=port) 
\ No newline at end of file
+    import serve
+    serve.main() 
\ No newline at end of file
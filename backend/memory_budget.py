@@ -0,0 +1,233 @@
+import os
+import time
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from fastapi import HTTPException, status
+
+from metrics import record_cache, MEMORY_RSS, MEMORY_BUDGET
+from shared_store import MemoryStore, shared_store, worker_count
+
+logger = logging.getLogger(__name__)
+
+# Copies of a screenshot alive while it is decoded: raw bytes, base64 string, BAML image
+IN_FLIGHT_COPIES = 1 + 4 / 3 + 4 / 3
+
+
+def current_rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class MemoryBudgetExceeded(HTTPException):
+    """Raised when an image can't be admitted within the wait timeout"""
+    def __init__(self, retry_after: int):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server is busy processing other images, retry shortly",
+            headers={"Retry-After": str(retry_after)},
+        )
+
+
+class MemoryBudget:
+    """
+    Global byte budget shared by in-flight images and caches (BudgetedLRU
+    instances, and the cache namespaces of a process-local shared store).
+
+    Requests reserve their payload before decoding. When a reservation doesn't
+    fit, registered caches are shrunk first; if in-flight images alone fill the
+    budget the request waits for a release, and is rejected with 503 on timeout.
+    MEMORY_BUDGET_MB is per machine and is split evenly between workers.
+    """
+    def __init__(self):
+        self.limit_bytes = int(float(os.getenv("MEMORY_BUDGET_MB", "96")) * 1024 * 1024 / worker_count())
+        self.wait_seconds = float(os.getenv("MEMORY_BUDGET_WAIT_SECONDS", "10"))
+        self.in_flight_bytes = 0
+        self.rejected = 0
+        self._caches: List[Any] = []
+        self._waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+        self._lock = threading.Lock()
+
+    def register_cache(self, cache: Any):
+        """`cache` needs name, nbytes, __len__ and shrink(target_bytes) -> freed bytes"""
+        with self._lock:
+            self._caches.append(cache)
+
+    @property
+    def cache_bytes(self) -> int:
+        return sum(cache.nbytes for cache in self._caches)
+
+    @property
+    def used_bytes(self) -> int:
+        return self.in_flight_bytes + self.cache_bytes
+
+    def headroom(self, extra: int = 0) -> int:
+        return self.limit_bytes - self.used_bytes - extra
+
+    def shrink_caches(self, needed_bytes: int) -> int:
+        """Evict cache entries until `needed_bytes` are freed or caches are empty"""
+        freed = 0
+        for cache in sorted(self._caches, key=lambda c: c.nbytes, reverse=True):
+            if freed >= needed_bytes:
+                break
+            freed += cache.shrink(needed_bytes - freed)
+        if freed:
+            logger.info(f"Memory budget - shrank caches by {freed} bytes")
+        return freed
+
+    def _try_reserve(self, nbytes: int) -> bool:
+        with self._lock:
+            if self.in_flight_bytes + nbytes > self.limit_bytes:
+                return False
+            self.in_flight_bytes += nbytes
+        overflow = -self.headroom()
+        if overflow > 0:
+            self.shrink_caches(overflow)
+        self.update_gauges()
+        return True
+
+    async def acquire(self, nbytes: int) -> int:
+        """Reserve `nbytes` for an in-flight image; returns the amount to pass to release()"""
+        if nbytes > self.limit_bytes:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"Image too large to process ({nbytes} bytes needed, budget is {self.limit_bytes})",
+            )
+        deadline = time.monotonic() + self.wait_seconds
+        while not self._try_reserve(nbytes):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self.rejected += 1
+                logger.warning(f"Memory budget - rejected {nbytes} byte reservation, {self.in_flight_bytes} in flight")
+                raise MemoryBudgetExceeded(retry_after=max(1, int(self.wait_seconds)))
+            loop = asyncio.get_running_loop()
+            waiter = loop.create_future()
+            with self._lock:
+                self._waiters.append((loop, waiter))
+            try:
+                await asyncio.wait_for(waiter, timeout=remaining)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                with self._lock:
+                    if (loop, waiter) in self._waiters:
+                        self._waiters.remove((loop, waiter))
+        return nbytes
+
+    def release(self, nbytes: int):
+        if not nbytes:
+            return
+        with self._lock:
+            self.in_flight_bytes = max(0, self.in_flight_bytes - nbytes)
+            waiters, self._waiters = self._waiters, []
+        self.update_gauges()
+        # Wake everyone; each waiter re-checks and re-queues if it still doesn't fit
+        for loop, waiter in waiters:
+            loop.call_soon_threadsafe(lambda w=waiter: w.done() or w.set_result(None))
+
+    def update_gauges(self):
+        # Set explicitly rather than via set_function, which multiprocess metrics don't support
+        MEMORY_BUDGET.labels("in_flight").set(self.in_flight_bytes)
+        MEMORY_BUDGET.labels("caches").set(self.cache_bytes)
+        MEMORY_RSS.set(current_rss_bytes())
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit_bytes": self.limit_bytes,
+            "in_flight_bytes": self.in_flight_bytes,
+            "cache_bytes": self.cache_bytes,
+            "rss_bytes": current_rss_bytes(),
+            "rejected": self.rejected,
+            "caches": {cache.name: {"entries": len(cache), "bytes": cache.nbytes} for cache in self._caches},
+        }
+
+
+class BudgetedLRU:
+    """
+    LRU cache whose entries carry a byte size and count against the global
+    memory budget. Evicted by the budget under pressure, by its own entry/TTL
+    limits otherwise.
+    """
+    def __init__(self, name: str, budget: MemoryBudget, max_entries: int = 1024, ttl_seconds: Optional[float] = None):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._budget = budget
+        self._entries: "OrderedDict[Any, Tuple[Any, int, float]]" = OrderedDict()
+        self._nbytes = 0
+        self._lock = threading.Lock()
+        budget.register_cache(self)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def nbytes(self) -> int:
+        return self._nbytes
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl_seconds is not None and time.monotonic() - entry[2] > self.ttl_seconds:
+                self._remove(key)
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+        record_cache(self.name, entry is not None)
+        return entry[0] if entry is not None else default
+
+    def put(self, key: Any, value: Any, nbytes: int):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, nbytes, time.monotonic())
+            self._nbytes += nbytes
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+        overflow = -self._budget.headroom()
+        if overflow > 0:
+            self.shrink(overflow)
+        self._budget.update_gauges()
+
+    def pop(self, key: Any, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            self._remove(key)
+            return entry[0]
+
+    def _remove(self, key: Any):
+        _, nbytes, _ = self._entries.pop(key)
+        self._nbytes -= nbytes
+
+    def shrink(self, target_bytes: int) -> int:
+        """Evict least recently used entries until `target_bytes` are freed"""
+        freed = 0
+        with self._lock:
+            while self._entries and freed < target_bytes:
+                key = next(iter(self._entries))
+                freed += self._entries[key][1]
+                self._remove(key)
+        return freed
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._nbytes = 0
+
+
+# Global instance
+memory_budget = MemoryBudget()
+
+if isinstance(shared_store, MemoryStore):
+    shared_store.use_budget(memory_budget)
+
+MEMORY_BUDGET.labels("limit").set(memory_budget.limit_bytes)
+memory_budget.update_gauges()
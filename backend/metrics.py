@@ -0,0 +1,151 @@
+import os
+import time
+from contextlib import contextmanager
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, CONTENT_TYPE_LATEST, generate_latest, multiprocess
+
+import server_timing
+
+# Buckets span fast local stages (ms) up to slow multi-call LLM chains (tens of seconds)
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 40.0, 80.0)
+
+STAGE_DURATION = Histogram(
+    "promise_keeper_stage_duration_seconds",
+    "Duration of each pipeline stage (upload read, decode, BAML functions, Supabase queries, total)",
+    ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+
+REQUEST_DURATION = Histogram(
+    "promise_keeper_http_request_duration_seconds",
+    "End-to-end HTTP request duration",
+    ["method", "path", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+
+STAGE_ERRORS = Counter(
+    "promise_keeper_stage_errors_total",
+    "Exceptions raised per pipeline stage",
+    ["stage"],
+)
+
+PROMISES = Counter(
+    "promise_keeper_promises_total",
+    "Promises flowing through the pipeline",
+    ["outcome"],  # extracted, saved, duplicate (ignored by the fingerprint index), resolved
+)
+
+CACHE_EVENTS = Counter(
+    "promise_keeper_cache_events_total",
+    "Cache lookups by cache and result",
+    ["cache", "result"],  # result: hit, miss
+)
+
+LLM_TOKENS = Counter(
+    "promise_keeper_llm_tokens_total",
+    "LLM token usage reported by the BAML collector",
+    ["function", "kind"],  # kind: prompt, completion, image (estimated share of prompt), cached (prefix-cache hits within prompt)
+)
+
+STARTUP_PHASE = Gauge(
+    "promise_keeper_startup_phase_seconds",
+    "Duration of each startup phase (interpreter, imports, app setup, server start, warm-up)",
+    ["phase"],
+    multiprocess_mode="liveall",
+)
+
+FIRST_EXTRACTION = Gauge(
+    "promise_keeper_time_to_first_extraction_seconds",
+    "Seconds from process start to the first successful authenticated extraction",
+    multiprocess_mode="liveall",
+)
+
+MEMORY_RSS = Gauge(
+    "promise_keeper_process_rss_bytes",
+    "Resident set size of this process",
+    multiprocess_mode="liveall",
+)
+
+MEMORY_BUDGET = Gauge(
+    "promise_keeper_memory_budget_bytes",
+    "Memory budget limit and current usage by in-flight images and caches",
+    ["kind"],  # limit, in_flight, caches
+    multiprocess_mode="livesum",
+)
+
+WRITE_BEHIND_FLUSHED = Counter(
+    "promise_keeper_write_behind_flushed_total",
+    "Write-behind log entries applied to Supabase",
+    ["op", "result"],  # op: insert, resolve; result: ok, retry, dead
+)
+
+WRITE_BEHIND_PENDING = Gauge(
+    "promise_keeper_write_behind_pending",
+    "Write-behind log entries not yet applied to Supabase",
+    multiprocess_mode="livemax",
+)
+
+WRITE_BEHIND_LAG = Gauge(
+    "promise_keeper_write_behind_lag_seconds",
+    "Age of the oldest write-behind log entry not yet applied to Supabase",
+    multiprocess_mode="livemax",
+)
+
+REMINDERS_EMITTED = Counter(
+    "promise_keeper_reminders_emitted_total",
+    "Reminder events emitted by the scheduler",
+    ["kind"],  # due, overdue
+)
+
+REMINDERS_SCHEDULED = Gauge(
+    "promise_keeper_reminders_scheduled",
+    "Open promises with a due date in the reminder scheduler's timing wheel",
+    multiprocess_mode="livemax",
+)
+
+REMINDERS_DELAY = Gauge(
+    "promise_keeper_reminders_delay_seconds",
+    "How late the last reminder event was emitted, relative to its scheduled time",
+    multiprocess_mode="livemax",
+)
+
+
+@contextmanager
+def timed_stage(stage: str):
+    """Time a pipeline stage and count it as an error if it raises"""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_ERRORS.labels(stage).inc()
+        raise
+    finally:
+        observe_stage(stage, time.perf_counter() - start)
+
+
+def observe_stage(stage: str, seconds: float):
+    STAGE_DURATION.labels(stage).observe(seconds)
+    server_timing.record(stage, seconds)
+
+
+def record_promises(outcome: str, count: int = 1):
+    if count:
+        PROMISES.labels(outcome).inc(count)
+
+
+def record_cache(cache: str, hit: bool):
+    CACHE_EVENTS.labels(cache, "hit" if hit else "miss").inc()
+
+
+def record_llm_tokens(function_name: str, kind: str, count: int):
+    if count:
+        LLM_TOKENS.labels(function_name, kind).inc(count)
+
+
+def render_latest():
+    """Return the Prometheus exposition payload and its content type"""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        # Multi-worker mode: aggregate the files every worker writes, whichever worker serves the scrape
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -0,0 +1,144 @@
+import os
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
+
+import baml_py
+from baml_client.types import NoPromisesFoundResponse, PromiseListResponse
+
+import llm
+from batch import parse_capture_time
+from shared_store import shared_store
+
+logger = logging.getLogger(__name__)
+
+STATS_NAMESPACE = "multiframe_stats"
+
+
+class FrameWindow:
+    """Frames of one user waiting to be extracted together"""
+    def __init__(self):
+        self.images: List[baml_py.Image] = []
+        self.captured_at: List[Optional[str]] = []
+        self.image_tokens = 0
+        self.futures: List[asyncio.Future] = []
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+
+class MultiFrameBatcher:
+    """
+    Extracts several consecutive frames of a user with one vision call.
+
+    The first frame of a user opens a window; frames arriving within
+    MULTIFRAME_WINDOW_MS join it, up to MULTIFRAME_MAX_IMAGES. The window is
+    then sent to ExtractPromisesMultiFrame, sorted by capture time (requests can
+    arrive out of order) and timestamped, and each waiting request gets the
+    promises reported for its own frame. A window
+    holding a single frame uses ExtractPromises as usual.
+
+    Windows are per worker, so frames of one user only share a call when they
+    reach the same worker. Live captures only share a window when the window is
+    longer than the capture interval.
+    """
+    def __init__(self):
+        self.enabled = os.getenv("MULTIFRAME_ENABLED", "false").lower() == "true"
+        self.window_ms = float(os.getenv("MULTIFRAME_WINDOW_MS", "6000"))
+        self.max_images = max(1, int(os.getenv("MULTIFRAME_MAX_IMAGES", "4")))
+        self._windows: Dict[str, FrameWindow] = {}
+        # Keep running flushes referenced so they aren't garbage collected
+        self._flushes = set()
+
+    async def extract(self, user_id: str, image: baml_py.Image, image_tokens: int = 0, captured_at: Optional[str] = None) -> Any:
+        """ExtractPromises-shaped output for this frame, once its window has been extracted"""
+        loop = asyncio.get_running_loop()
+        window = self._windows.get(user_id)
+        if window is None:
+            window = FrameWindow()
+            self._windows[user_id] = window
+            window.timer = loop.call_later(self.window_ms / 1000, self._close, user_id, window)
+
+        future = loop.create_future()
+        window.images.append(image)
+        window.captured_at.append(captured_at)
+        window.image_tokens += image_tokens
+        window.futures.append(future)
+        if len(window.images) >= self.max_images:
+            self._close(user_id, window)
+        return await future
+
+    def _close(self, user_id: str, window: FrameWindow):
+        if self._windows.get(user_id) is not window:
+            return
+        del self._windows[user_id]
+        window.timer.cancel()
+        flush = asyncio.get_running_loop().create_task(self._flush(user_id, window))
+        self._flushes.add(flush)
+        flush.add_done_callback(self._flushes.discard)
+
+    async def _flush(self, user_id: str, window: FrameWindow):
+        frame_count = len(window.images)
+        try:
+            if frame_count == 1:
+                outputs = [await llm.acall("ExtractPromises", window.images[0], image_tokens=window.image_tokens)]
+            else:
+                order = self._capture_order(window.captured_at)
+                frame_promises = await llm.acall(
+                    "ExtractPromisesMultiFrame",
+                    [window.images[i] for i in order],
+                    [window.captured_at[i] or "unknown" for i in order],
+                    image_tokens=window.image_tokens,
+                )
+                # The model numbers frames in the order it was shown them; map back to arrival order
+                outputs = [None] * frame_count
+                for position, output in zip(order, self._split(frame_promises, frame_count)):
+                    outputs[position] = output
+        except Exception as error:
+            logger.error(f"Multi-frame - User {user_id} - Extraction of {frame_count} frames failed: {error}")
+            for future in window.futures:
+                if not future.done():
+                    future.set_exception(error)
+            return
+
+        shared_store.incr(STATS_NAMESPACE, "calls")
+        shared_store.incr(STATS_NAMESPACE, "frames", frame_count)
+        logger.info(f"Multi-frame - User {user_id} - Extracted {frame_count} frames in one call")
+        for future, output in zip(window.futures, outputs):
+            # A request that was cancelled while waiting no longer wants its result
+            if not future.done():
+                future.set_result(output)
+
+    @staticmethod
+    def _capture_order(captured_at: List[Optional[str]]) -> List[int]:
+        """Arrival indexes sorted by capture time; frames without a usable timestamp keep arrival order, last"""
+        times = [parse_capture_time(timestamp) for timestamp in captured_at]
+        return sorted(range(len(times)), key=lambda i: (times[i] is None, times[i] or 0.0, i))
+
+    @staticmethod
+    def _split(frame_promises: Any, frame_count: int) -> List[Any]:
+        """Per-frame outputs from the FramePromises list; out-of-range indexes go to the nearest frame"""
+        per_frame: List[list] = [[] for _ in range(frame_count)]
+        for entry in frame_promises or []:
+            per_frame[min(max(entry.frame, 0), frame_count - 1)].extend(entry.promises)
+        return [
+            PromiseListResponse(promises=promises) if promises
+            else NoPromisesFoundResponse(reason="No new promises in this frame of the multi-frame window")
+            for promises in per_frame
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        counters = shared_store.items(STATS_NAMESPACE)
+        calls = counters.get("calls", 0)
+        frames = counters.get("frames", 0)
+        return {
+            "enabled": self.enabled,
+            "window_ms": self.window_ms,
+            "max_images": self.max_images,
+            "calls": calls,
+            "frames": frames,
+            "frames_per_call": (frames / calls) if calls else 0.0,
+            "calls_saved": frames - calls,
+        }
+
+
+# Global instance
+multiframe_batcher = MultiFrameBatcher()
@@ -0,0 +1,120 @@
+import sys
+import time
+import uuid
+import threading
+from collections import deque
+from typing import Dict, Optional, List, Any
+
+# Samples deeper than this are truncated at the root end
+_MAX_STACK_DEPTH = 128
+
+
+class SamplingProfiler:
+    """
+    Wall-clock sampling profiler built on sys._current_frames().
+    Produces collapsed stacks ("frame;frame;frame count"), the input format
+    of flamegraph.pl and speedscope. Costs nothing while not running.
+    """
+    def __init__(self, interval_seconds: float = 0.005):
+        self.interval_seconds = interval_seconds
+        self.samples: Dict[str, int] = {}
+        self.sample_count = 0
+        self.started_at: Optional[float] = None
+        self.duration_seconds = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.is_set():
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < _MAX_STACK_DEPTH:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                key = ";".join(reversed(stack))
+                self.samples[key] = self.samples.get(key, 0) + 1
+            self.sample_count += 1
+            self._stop.wait(self.interval_seconds)
+
+    def start(self):
+        self.started_at = time.time()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        self.duration_seconds = time.time() - (self.started_at or time.time())
+
+    def collapsed(self) -> str:
+        return "\n".join(f"{stack} {count}" for stack, count in sorted(self.samples.items()))
+
+
+class ProfileRegistry:
+    """Tracks armed per-request profiling and keeps the most recent profiles"""
+    def __init__(self, max_profiles: int = 20):
+        self._lock = threading.Lock()
+        # Only one profiler runs at a time so samples are attributable
+        self._active = threading.Lock()
+        self._arms: Dict[str, int] = {}
+        self._profiles: deque = deque(maxlen=max_profiles)
+
+    @property
+    def armed(self) -> bool:
+        return bool(self._arms)
+
+    def arm(self, path: str, count: int):
+        with self._lock:
+            self._arms[path] = self._arms.get(path, 0) + count
+
+    def take(self, path: str) -> bool:
+        """Consume an arm for this path, if one is pending and no profiler is running"""
+        with self._lock:
+            if not self._arms.get(path) or self._active.locked():
+                return False
+            self._arms[path] -= 1
+            if not self._arms[path]:
+                del self._arms[path]
+            return True
+
+    def begin(self, interval_seconds: float) -> Optional[SamplingProfiler]:
+        if not self._active.acquire(blocking=False):
+            return None
+        profiler = SamplingProfiler(interval_seconds)
+        profiler.start()
+        return profiler
+
+    def finish(self, profiler: SamplingProfiler, label: str) -> Dict[str, Any]:
+        profiler.stop()
+        self._active.release()
+        profile = {
+            "id": uuid.uuid4().hex[:12],
+            "label": label,
+            "started_at": profiler.started_at,
+            "duration_seconds": profiler.duration_seconds,
+            "samples": profiler.sample_count,
+            "collapsed": profiler.collapsed(),
+        }
+        with self._lock:
+            self._profiles.append(profile)
+        return profile
+
+    def list(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [{k: v for k, v in p.items() if k != "collapsed"} for p in self._profiles]
+
+    def get(self, profile_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            for profile in self._profiles:
+                if profile["id"] == profile_id:
+                    return profile
+        return None
+
+
+# Global instance
+profile_registry = ProfileRegistry()
@@ -0,0 +1,440 @@
+import os
+import json
+import math
+import time
+import heapq
+import socket
+import asyncio
+import logging
+import itertools
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+
+from metrics import observe_stage, REMINDERS_DELAY, REMINDERS_EMITTED, REMINDERS_SCHEDULED
+from shared_store import SQLiteStore, on_persistent_storage, shared_store
+
+logger = logging.getLogger(__name__)
+
+DUE = "due"
+OVERDUE = "overdue"
+LOCK_NAMESPACE = "reminders"
+OUTBOX_NAMESPACE = "reminder_outbox"
+EVENTS_NAMESPACE = "reminder_events"
+SENT_NAMESPACE = "reminder_sent"
+STATS_NAMESPACE = "reminder_stats"
+# Changes no scheduler picked up within an hour are dropped; the next load reads them from the database
+OUTBOX_TTL_SECONDS = 3600
+# A user's reminder event log is kept for a week after the last event
+EVENT_LOG_TTL_SECONDS = 7 * 24 * 3600
+
+
+class TimingWheel:
+    """
+    Hierarchical timing wheel of keys scheduled at wall-clock times.
+
+    Time is counted in ticks of `tick_seconds`. Level 0 has 2**slot_bits slots
+    of one tick; each level above has as many slots, each spanning a whole
+    lower wheel. A key lives at the lowest level whose current window contains
+    its tick, and moves down a level when the clock enters its slot (cascade),
+    so schedule and cancel are O(1) and advancing costs O(1) per tick plus O(1)
+    per key fired. Keys beyond the top level's window wait in a heap.
+
+    Slots hold (tick, key) pairs; `deadlines` is the live schedule, so a
+    cancelled or rescheduled key's old pair is skipped when its slot comes up.
+    """
+    def __init__(self, now: float, tick_seconds: float = 1.0, slot_bits: int = 6, levels: int = 4):
+        self.tick_seconds = tick_seconds
+        self.slot_bits = slot_bits
+        self.levels = levels
+        self.mask = (1 << slot_bits) - 1
+        self.now_tick = int(now // tick_seconds)
+        self.deadlines: Dict[Hashable, int] = {}
+        self._wheels: List[List[List[Tuple[int, Hashable]]]] = [[[] for _ in range(self.mask + 1)] for _ in range(levels)]
+        self._overflow: List[Tuple[int, Hashable]] = []
+        self._expired: List[Tuple[int, Hashable]] = []
+
+    def __len__(self) -> int:
+        return len(self.deadlines)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.deadlines
+
+    def _place(self, tick: int, key: Hashable):
+        if tick <= self.now_tick:
+            self._expired.append((tick, key))
+            return
+        # The level is that of the highest digit (slot_bits wide) where tick and now differ
+        level = ((tick ^ self.now_tick).bit_length() - 1) // self.slot_bits
+        if level < self.levels:
+            self._wheels[level][(tick >> (self.slot_bits * level)) & self.mask].append((tick, key))
+        else:
+            heapq.heappush(self._overflow, (tick, key))
+
+    def schedule(self, key: Hashable, when: float):
+        """Fire `key` at `when` (seconds since the epoch), replacing any earlier schedule of it"""
+        tick = math.ceil(when / self.tick_seconds)
+        if self.deadlines.get(key) == tick:
+            return
+        self.deadlines[key] = tick
+        self._place(tick, key)
+
+    def cancel(self, key: Hashable) -> bool:
+        return self.deadlines.pop(key, None) is not None
+
+    def when(self, key: Hashable) -> Optional[float]:
+        tick = self.deadlines.get(key)
+        return None if tick is None else tick * self.tick_seconds
+
+    def _cascade(self, level: int, slot: int):
+        entries = self._wheels[level][slot]
+        self._wheels[level][slot] = []
+        for tick, key in entries:
+            if self.deadlines.get(key) == tick:
+                self._place(tick, key)
+
+    def _fire(self, entries: List[Tuple[int, Hashable]], fired: List[Tuple[Hashable, float]]):
+        for tick, key in entries:
+            if self.deadlines.get(key) == tick:
+                del self.deadlines[key]
+                fired.append((key, tick * self.tick_seconds))
+
+    def advance(self, now: float) -> List[Tuple[Hashable, float]]:
+        """Move the clock to `now`; returns the (key, scheduled time) pairs that came due, in order"""
+        target = int(now // self.tick_seconds)
+        fired: List[Tuple[Hashable, float]] = []
+        if not self.deadlines:
+            self.now_tick = max(self.now_tick, target)
+            self._expired = []
+            return fired
+        top_shift = self.slot_bits * self.levels
+        while self.now_tick < target:
+            self.now_tick += 1
+            tick = self.now_tick
+            if tick & ((1 << top_shift) - 1) == 0:
+                # <=: pairs left from windows skipped while the wheel was empty are stale and dropped
+                while self._overflow and self._overflow[0][0] >> top_shift <= tick >> top_shift:
+                    overflow_tick, key = heapq.heappop(self._overflow)
+                    if self.deadlines.get(key) == overflow_tick:
+                        self._place(overflow_tick, key)
+            # Higher levels first, so their keys reach level 0 before its slot for this tick fires
+            for level in range(self.levels - 1, 0, -1):
+                if tick & ((1 << (self.slot_bits * level)) - 1) == 0:
+                    self._cascade(level, (tick >> (self.slot_bits * level)) & self.mask)
+            slot = tick & self.mask
+            entries, self._wheels[0][slot] = self._wheels[0][slot], []
+            if self._expired:
+                entries, self._expired = self._expired + entries, []
+            self._fire(entries, fired)
+        if self._expired:
+            entries, self._expired = self._expired, []
+            self._fire(entries, fired)
+        return fired
+
+
+def iso(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat()
+
+
+class ChannelSink:
+    """
+    Subscription channel: a bounded per-user log of events in the reminder state
+    store, numbered by `seq`. GET /reminders and GET /reminders/stream read it, from any worker.
+    """
+    name = "channel"
+
+    def __init__(self, size: int, store: Any):
+        self.size = size
+        self.store = store
+        # A dropped log resets its seq, which since() answers with a replay
+        store.allow_eviction(EVENTS_NAMESPACE)
+
+    def emit(self, event: Dict[str, Any]):
+        def append(log: Optional[Dict[str, Any]]):
+            log = log or {"seq": 0, "events": []}
+            seq = log["seq"] + 1
+            return {"seq": seq, "events": (log["events"] + [{**event, "seq": seq}])[-self.size:]}, None
+        self.store.update(EVENTS_NAMESPACE, event["owner_id"], append, ttl_seconds=EVENT_LOG_TTL_SECONDS)
+
+    def since(self, user_id: str, after: Optional[int]) -> Tuple[List[Dict[str, Any]], int]:
+        """The user's events after cursor `after`, and the new cursor. Without a cursor, no backlog is returned"""
+        log = self.store.get(EVENTS_NAMESPACE, user_id) or {"seq": 0, "events": []}
+        if after is None:
+            return [], log["seq"]
+        if after > log["seq"]:
+            # The log was reset (it expired, or the state store isn't durable): replay what it holds
+            after = 0
+        return [event for event in log["events"] if event["seq"] > after], log["seq"]
+
+
+class FileSink:
+    """Local stand-in for a push provider: appends each event to an NDJSON file"""
+    name = "file"
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def emit(self, event: Dict[str, Any]):
+        with open(self.path, "a") as sink:
+            sink.write(json.dumps(event) + "\n")
+
+
+class ReminderScheduler:
+    """
+    Emits "due" and "overdue" events for open promises with a due_date, so
+    clients don't each load and scan every promise to decide when to notify.
+
+    One worker at a time (a shared-store lock, as for the write-behind flusher)
+    runs the scheduler. It loads open promises due after REMINDER_LOOKBACK_SECONDS
+    ago into a TimingWheel, then keeps it current from the extraction pipeline:
+    saved promises are tracked and resolved ones forgotten, through a shared-store
+    outbox so any worker's pipeline reaches the scheduler. Every tick it advances
+    the wheel and, after re-checking that the promises are still open (clients
+    resolve promises directly in Supabase), emits:
+    - "due" REMINDER_LEAD_SECONDS before the due date;
+    - "overdue" at the due date.
+    Each event is emitted once per promise and due date. The sent markers and the
+    channel log are kept in a SQLite file on the mounted volume
+    (REMINDER_STATE_PATH), so that also holds across restarts and scale-to-zero.
+    Without a volume they fall back to the shared store and are lost on restart:
+    the next load re-emits "overdue" for promises in the lookback window, and
+    the channel log starts over at seq 0.
+    """
+    def __init__(self):
+        self.enabled = os.getenv("REMINDERS_ENABLED", "false").lower() == "true"
+        self.tick_seconds = float(os.getenv("REMINDER_TICK_MS", "1000")) / 1000
+        self.lead_seconds = float(os.getenv("REMINDER_LEAD_SECONDS", "3600"))
+        self.lookback_seconds = float(os.getenv("REMINDER_LOOKBACK_SECONDS", str(7 * 24 * 3600)))
+        self.load_batch_size = int(os.getenv("REMINDER_LOAD_BATCH_SIZE", "1000"))
+        self.stream_poll_seconds = float(os.getenv("REMINDER_STREAM_POLL_MS", "1000")) / 1000
+        self.state_path = os.getenv("REMINDER_STATE_PATH", "/data/promise_keeper_reminders.db")
+        self.durable = self.enabled and on_persistent_storage(self.state_path)
+        if self.enabled and not self.durable:
+            logger.warning(f"Reminders - {self.state_path} is not on a mounted volume; sent reminders and event logs "
+                           "are kept in the shared store and re-delivered after a restart")
+        # Sent markers and channel logs
+        self.state = SQLiteStore(self.state_path) if self.durable else shared_store
+        self.channel = ChannelSink(int(os.getenv("REMINDER_EVENT_LOG_SIZE", "100")), self.state)
+        self.sinks: List[Any] = []
+        for name in os.getenv("REMINDER_SINKS", "channel,file").split(","):
+            name = name.strip()
+            if name == "channel":
+                self.sinks.append(self.channel)
+            elif name == "file":
+                self.sinks.append(FileSink(os.getenv("REMINDER_SINK_PATH", "/tmp/promise_keeper_reminders.ndjson")))
+            elif name:
+                logger.warning(f"Reminders - Unknown sink {name!r} in REMINDER_SINKS")
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self.client_factory: Callable[[], Any] = lambda: None
+        self.wheel: Optional[TimingWheel] = None
+        # Promise id -> (owner_id, content, person, due timestamp)
+        self.promises: Dict[Any, Tuple[str, str, Optional[str], float]] = {}
+        self._outbox_seq = itertools.count()
+        self._last_delay = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    # Pipeline hooks: called by the worker that saved or resolved the promises
+
+    def _publish(self, change: Dict[str, Any]):
+        key = f"{time.time_ns():020d}:{self.owner}:{next(self._outbox_seq)}"
+        shared_store.set(OUTBOX_NAMESPACE, key, change, ttl_seconds=OUTBOX_TTL_SECONDS)
+
+    def track(self, rows: List[Dict[str, Any]]):
+        """Schedule saved promise rows that have a due date"""
+        if not self.enabled:
+            return
+        for row in rows:
+            if row.get("id") is not None and row.get("due_date") and not row.get("resolved"):
+                self._publish({"op": "track", "id": row["id"], "owner_id": row["owner_id"], "content": row.get("content"),
+                               "person": row.get("person"), "due_date": row["due_date"]})
+
+    def forget(self, rows: List[Dict[str, Any]]):
+        """Unschedule resolved promise rows"""
+        if not self.enabled:
+            return
+        for row in rows:
+            if row.get("id") is not None:
+                self._publish({"op": "forget", "id": row["id"]})
+
+    # Scheduler, run by the lock holder
+
+    def _schedule(self, promise_id: Any, owner_id: str, content: str, person: Optional[str], due_date: Any):
+        try:
+            due = datetime.fromisoformat(due_date).timestamp() if isinstance(due_date, str) else float(due_date)
+        except ValueError:
+            logger.warning(f"Reminders - Promise {promise_id} - Unparseable due_date {due_date!r}")
+            return
+        self.promises[promise_id] = (owner_id, content, person, due)
+        self.wheel.schedule(promise_id, due - self.lead_seconds if self.lead_seconds > 0 else due)
+
+    def _unschedule(self, promise_id: Any):
+        self.promises.pop(promise_id, None)
+        self.wheel.cancel(promise_id)
+
+    def load(self, client: Any) -> int:
+        """Fill a new wheel with the open promises due from the lookback window on, in id order"""
+        start = time.perf_counter()
+        now = time.time()
+        self.wheel = TimingWheel(now, self.tick_seconds)
+        self.promises = {}
+        cutoff = iso(now - self.lookback_seconds)
+        last_id = 0
+        while True:
+            rows = (
+                client.table("promises")
+                .select("id, owner_id, content, person, due_date")
+                .eq("resolved", False)
+                .gte("due_date", cutoff)
+                .gt("id", last_id)
+                .order("id")
+                .limit(self.load_batch_size)
+                .execute()
+            ).data or []
+            for row in rows:
+                self._schedule(row["id"], row["owner_id"], row.get("content"), row.get("person"), row["due_date"])
+            if len(rows) < self.load_batch_size:
+                break
+            last_id = rows[-1]["id"]
+        observe_stage("reminders.load", time.perf_counter() - start)
+        REMINDERS_SCHEDULED.set(len(self.wheel))
+        logger.info(f"Reminders - Loaded {len(self.wheel)} promises with due dates in {time.perf_counter() - start:.2f}s")
+        return len(self.wheel)
+
+    def _drain_outbox(self) -> int:
+        changes = shared_store.items(OUTBOX_NAMESPACE)
+        for key in sorted(changes):
+            change = changes[key]
+            if change["op"] == "track":
+                self._schedule(change["id"], change["owner_id"], change["content"], change.get("person"), change["due_date"])
+            else:
+                self._unschedule(change["id"])
+            shared_store.delete(OUTBOX_NAMESPACE, key)
+        return len(changes)
+
+    def _open_ids(self, client: Any, ids: List[Any]) -> set:
+        """The ids among `ids` still unresolved in the database; all of them if the check fails"""
+        open_ids = set()
+        try:
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                rows = client.table("promises").select("id").in_("id", chunk).eq("resolved", False).execute().data or []
+                open_ids.update(row["id"] for row in rows)
+        except Exception as check_error:
+            logger.warning(f"Reminders - Could not re-check {len(ids)} promises, emitting anyway: {check_error}")
+            return set(ids)
+        return open_ids
+
+    def _emit(self, kind: str, promise_id: Any, info: Tuple[str, str, Optional[str], float]):
+        owner_id, content, person, due = info
+        # Once per promise, kind and due date, whichever worker holds the lock
+        if not self.state.add(SENT_NAMESPACE, f"{promise_id}:{kind}:{due:.0f}", True, ttl_seconds=self.lookback_seconds + self.lead_seconds):
+            return
+        event = {"type": kind, "promise_id": promise_id, "owner_id": owner_id, "content": content, "person": person,
+                 "due_date": iso(due), "emitted_at": iso(time.time())}
+        for sink in self.sinks:
+            try:
+                sink.emit(event)
+            except Exception as sink_error:
+                logger.error(f"Reminders - Sink {sink.name} failed for promise {promise_id}: {sink_error}")
+        REMINDERS_EMITTED.labels(kind).inc()
+        shared_store.incr(STATS_NAMESPACE, f"emitted:{kind}")
+
+    def tick(self, client: Any) -> int:
+        """Apply pipeline changes, advance the wheel and emit what came due; returns the events emitted"""
+        self._drain_outbox()
+        now = time.time()
+        fired = self.wheel.advance(now)
+        if fired:
+            start = time.perf_counter()
+            open_ids = self._open_ids(client, [promise_id for promise_id, _ in fired])
+            emitted = 0
+            for promise_id, scheduled in fired:
+                info = self.promises.get(promise_id)
+                if info is None:
+                    continue
+                if promise_id not in open_ids:
+                    self.promises.pop(promise_id)
+                    continue
+                if now < info[3]:
+                    self._emit(DUE, promise_id, info)
+                    self.wheel.schedule(promise_id, info[3])
+                else:
+                    self._emit(OVERDUE, promise_id, info)
+                    self.promises.pop(promise_id)
+                emitted += 1
+                self._last_delay = now - scheduled
+            REMINDERS_DELAY.set(self._last_delay)
+            observe_stage("reminders.tick", time.perf_counter() - start)
+        REMINDERS_SCHEDULED.set(len(self.wheel))
+        return len(fired)
+
+    def _lead(self) -> bool:
+        def apply(holder: Optional[str]):
+            if holder is None or holder == self.owner:
+                return self.owner, True
+            return holder, False
+        return shared_store.update(LOCK_NAMESPACE, "scheduler", apply, ttl_seconds=max(5.0, 10 * self.tick_seconds))
+
+    async def _run(self):
+        while True:
+            try:
+                if self._lead():
+                    if self.wheel is None:
+                        await run_in_threadpool(self.load, self.client_factory())
+                    await run_in_threadpool(self.tick, self.client_factory())
+                elif self.wheel is not None:
+                    # Another worker took over: its wheel is loaded from the database
+                    self.wheel = None
+                    self.promises = {}
+            except Exception as tick_error:
+                logger.error(f"Reminders - Tick failed: {tick_error}")
+            await asyncio.sleep(self.tick_seconds)
+
+    def start(self, client_factory: Callable[[], Any]):
+        if not self.enabled or self._task is not None:
+            return
+        self.client_factory = client_factory
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        self._task = None
+        shared_store.update(LOCK_NAMESPACE, "scheduler", lambda holder: (None if holder == self.owner else holder, None))
+
+    async def stream(self, user_id: str, after: Optional[int], is_disconnected: Callable[[], Awaitable[bool]]) -> AsyncIterator[str]:
+        """Server-sent events for the user's reminders after cursor `after`, with a keepalive comment every 15s"""
+        _, cursor = self.channel.since(user_id, None)
+        cursor = cursor if after is None else after
+        last_sent = time.monotonic()
+        yield "retry: 5000\n\n"
+        while not await is_disconnected():
+            events, latest = self.channel.since(user_id, cursor)
+            for event in events:
+                yield f"id: {event['seq']}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
+                last_sent = time.monotonic()
+            cursor = latest
+            if time.monotonic() - last_sent >= 15:
+                yield ": keepalive\n\n"
+                last_sent = time.monotonic()
+            await asyncio.sleep(self.stream_poll_seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        counters = shared_store.items(STATS_NAMESPACE)
+        return {
+            "enabled": self.enabled,
+            "durable_state": self.durable,
+            "scheduler": shared_store.get(LOCK_NAMESPACE, "scheduler"),
+            "scheduled": len(self.wheel) if self.wheel is not None else None,
+            "pending_changes": shared_store.count(OUTBOX_NAMESPACE),
+            "emitted": {key.split(":", 1)[1]: n for key, n in counters.items() if key.startswith("emitted:")},
+            "last_delay_seconds": round(self._last_delay, 3),
+            "lead_seconds": self.lead_seconds,
+            "sinks": [sink.name for sink in self.sinks],
+        }
+
+
+# Global instance
+reminder_scheduler = ReminderScheduler()
@@ -0,0 +1,156 @@
+import os
+import time
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+import baml_py
+from baml_client.types import ExistingPromise, ResolvedPromise, ResolvedPromisesResponse
+
+import llm
+from metrics import STAGE_ERRORS
+from retrieval import tokenize
+from shared_store import shared_store
+
+logger = logging.getLogger(__name__)
+
+SHARD_NAMESPACE = "resolution_shards"
+WINDOW_NAMESPACE = "resolution_window"
+# A user's window position is forgotten after a week without checks
+WINDOW_TTL_SECONDS = 7 * 24 * 3600
+
+
+def _promise_key(content: Optional[str]) -> str:
+    return " ".join(tokenize(content or ""))
+
+
+class ShardedResolutionChecker:
+    """
+    Runs CheckResolvedPromises over a large open-promise set as concurrent
+    shards of bounded size, then merges the resolved promises.
+
+    The shard size adapts to observed latency (AIMD): it grows by a fixed step
+    while shards finish under the target latency and halves when one is slow or
+    fails. It is kept in the shared store so all workers converge on one value.
+    """
+    def __init__(self):
+        self.max_candidates = int(os.getenv("RESOLUTION_MAX_CANDIDATES", "256"))
+        self.initial_shard_size = int(os.getenv("RESOLUTION_SHARD_SIZE", "16"))
+        self.min_shard_size = int(os.getenv("RESOLUTION_SHARD_MIN", "4"))
+        self.max_shard_size = int(os.getenv("RESOLUTION_SHARD_MAX", "48"))
+        self.increase_step = int(os.getenv("RESOLUTION_SHARD_STEP", "2"))
+        self.target_seconds = float(os.getenv("RESOLUTION_SHARD_TARGET_SECONDS", "6"))
+        self.concurrency = int(os.getenv("RESOLUTION_SHARD_CONCURRENCY", "4"))
+
+    @property
+    def shard_size(self) -> int:
+        return int(shared_store.get(SHARD_NAMESPACE, "size", self.initial_shard_size))
+
+    def _adapt(self, seconds: Optional[float]):
+        """Additive increase on a fast shard, multiplicative decrease on a slow or failed one"""
+        def apply(size: Optional[int]):
+            size = size or self.initial_shard_size
+            if seconds is None or seconds > self.target_seconds:
+                size = max(self.min_shard_size, size // 2)
+            else:
+                size = min(self.max_shard_size, size + self.increase_step)
+            return size, size
+        return shared_store.update(SHARD_NAMESPACE, "size", apply)
+
+    def candidates(self, user_id: str, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Open promise rows to check, independent of what the frame extracted
+        (a frame that resolves something rarely promises anything new).
+        All of them up to RESOLUTION_MAX_CANDIDATES; beyond that a window
+        rotates over the open set, oldest first, so every open promise is
+        checked within a few frames.
+        """
+        open_rows = sorted(
+            (row for row in rows if not row.get("resolved")),
+            key=lambda row: (str(row.get("created_at") or ""), str(row.get("id") or "")),
+        )
+        if self.max_candidates <= 0 or len(open_rows) <= self.max_candidates:
+            return open_rows
+
+        def advance(offset: Optional[int]):
+            offset = (offset or 0) % len(open_rows)
+            return (offset + self.max_candidates) % len(open_rows), offset
+        start = shared_store.update(WINDOW_NAMESPACE, user_id, advance, ttl_seconds=WINDOW_TTL_SECONDS)
+        window = open_rows[start:start + self.max_candidates]
+        return window + open_rows[:self.max_candidates - len(window)]
+
+    def shards(self, promises: List[ExistingPromise]) -> List[List[ExistingPromise]]:
+        size = max(1, self.shard_size)
+        if len(promises) <= size:
+            return [promises] if promises else []
+        # Spread promises evenly rather than leaving a small last shard
+        count = -(-len(promises) // size)
+        per_shard = -(-len(promises) // count)
+        return [promises[i:i + per_shard] for i in range(0, len(promises), per_shard)]
+
+    async def _check_shard(self, semaphore: asyncio.Semaphore, shard: List[ExistingPromise], image: Optional[baml_py.Image], transcript: Optional[Tuple[str, str]], image_tokens: int) -> Any:
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                if transcript is not None:
+                    result = await llm.acall("CheckResolvedPromisesFromText", shard, *transcript)
+                else:
+                    result = await llm.acall("CheckResolvedPromises", image, shard, image_tokens=image_tokens)
+            except Exception as shard_error:
+                self._adapt(None)
+                STAGE_ERRORS.labels("resolution_shard").inc()
+                logger.error(f"Resolution check - shard of {len(shard)} failed: {shard_error}")
+                return None
+            self._adapt(time.perf_counter() - start)
+            return result
+
+    async def check(
+        self,
+        user_id: str,
+        promises: List[ExistingPromise],
+        image: Optional[baml_py.Image] = None,
+        transcript: Optional[Tuple[str, str]] = None,
+        image_tokens: int = 0,
+    ) -> List[ResolvedPromise]:
+        """
+        Resolved promises across all shards, one per candidate, with content matching the candidate exactly.
+        Checks against a screenshot, or against a (context, new_lines) transcript when given.
+        """
+        shards = self.shards(promises)
+        if len(shards) > 1:
+            logger.info(f"Resolution check - User {user_id} - {len(promises)} promises in {len(shards)} shards of <= {len(shards[0])}")
+        semaphore = asyncio.Semaphore(self.concurrency)
+        results = await asyncio.gather(*(self._check_shard(semaphore, shard, image, transcript, image_tokens) for shard in shards))
+
+        candidates: Dict[str, ExistingPromise] = {_promise_key(p.content): p for p in promises}
+        resolved: Dict[str, ResolvedPromise] = {}
+        for shard, result in zip(shards, results):
+            if not isinstance(result, ResolvedPromisesResponse):
+                if result is not None:
+                    logger.info(f"Resolution check - User {user_id} - No promises resolved in shard. Reason: {result.reason}")
+                continue
+            for resolved_promise in result.resolved_promises:
+                key = _promise_key(resolved_promise.original_promise.content)
+                candidate = candidates.get(key)
+                if candidate is None:
+                    logger.warning(f"Resolution check - User {user_id} - Ignoring resolution of unknown promise: {resolved_promise.original_promise.content}")
+                    continue
+                if key in resolved:
+                    continue
+                # The database update matches on content, so use the candidate's exact text
+                resolved_promise.original_promise = candidate
+                resolved[key] = resolved_promise
+        return list(resolved.values())
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "shard_size": self.shard_size,
+            "min_shard_size": self.min_shard_size,
+            "max_shard_size": self.max_shard_size,
+            "target_seconds": self.target_seconds,
+            "max_candidates": self.max_candidates,
+        }
+
+
+# Global instance
+resolution_checker = ShardedResolutionChecker()
@@ -0,0 +1,139 @@
+import os
+import time
+import math
+import random
+import logging
+from typing import Optional, Dict, Any
+
+from shared_store import shared_store
+
+logger = logging.getLogger(__name__)
+
+
+class ResolutionDecision:
+    """Outcome of a per-frame resolution check decision"""
+    def __init__(self, run: bool, reason: str):
+        self.run = run
+        self.reason = reason
+
+    def __repr__(self) -> str:
+        return f"ResolutionDecision(run={self.run}, reason={self.reason!r})"
+
+
+STATE_NAMESPACE = "resolution_policy"
+STATS_NAMESPACE = "resolution_policy_stats"
+# Per-user state is dropped after a day without frames
+STATE_TTL_SECONDS = 24 * 3600
+
+
+class ResolutionCheckPolicy:
+    """
+    Decides per frame whether CheckResolvedPromises should run.
+
+    The vision call is skipped when it cannot change anything (no open
+    promises, or a frame identical to the last one seen) and is otherwise
+    sampled, with a guaranteed check every N frames or T seconds.
+    Per-user state lives in the shared store so all workers agree.
+    """
+    def __init__(self):
+        self.enabled = os.getenv("RESOLUTION_POLICY_ENABLED", "true").lower() == "true"
+        self.base_sample_rate = float(os.getenv("RESOLUTION_CHECK_SAMPLE_RATE", "0.25"))
+        self.max_skipped_frames = int(os.getenv("RESOLUTION_CHECK_MAX_SKIPPED_FRAMES", "12"))
+        self.max_interval_seconds = float(os.getenv("RESOLUTION_CHECK_MAX_INTERVAL_SECONDS", "300"))
+        # Number of following frames that are always checked after a frame yielded promises
+        self.active_window_frames = int(os.getenv("RESOLUTION_CHECK_ACTIVE_WINDOW_FRAMES", "3"))
+
+    def _new_state(self) -> Dict[str, Any]:
+        return {
+            "last_frame_digest": None,
+            "last_checked_digest": None,
+            "last_check_time": 0.0,
+            "frames_since_check": 0,
+            "recent_extraction_hits": 0,
+            "sample_rate": self.base_sample_rate,
+        }
+
+    def _effective_rate(self, state: Dict[str, Any], open_count: int) -> float:
+        # More open promises means a random frame is more likely to resolve one
+        weight = 1.0 + math.log2(open_count) / 4 if open_count > 1 else 1.0
+        return min(1.0, state["sample_rate"] * weight)
+
+    def _evaluate(self, state: Dict[str, Any], frame_digest: str, open_count: int, extracted_count: int, now: float) -> ResolutionDecision:
+        if not self.enabled:
+            return ResolutionDecision(True, "policy_disabled")
+        if open_count == 0:
+            return ResolutionDecision(False, "no_open_promises")
+        if frame_digest == state["last_checked_digest"]:
+            return ResolutionDecision(False, "already_checked_frame")
+        if state["frames_since_check"] >= self.max_skipped_frames:
+            return ResolutionDecision(True, "periodic_frames")
+        if state["last_check_time"] and now - state["last_check_time"] >= self.max_interval_seconds:
+            return ResolutionDecision(True, "periodic_interval")
+        if frame_digest == state["last_frame_digest"]:
+            return ResolutionDecision(False, "unchanged_frame")
+        if extracted_count > 0 or state["recent_extraction_hits"] > 0:
+            return ResolutionDecision(True, "active_conversation")
+        if random.random() < self._effective_rate(state, open_count):
+            return ResolutionDecision(True, "sampled")
+        return ResolutionDecision(False, "not_sampled")
+
+    def decide(self, user_id: str, frame_digest: str, open_count: int, extracted_count: int) -> ResolutionDecision:
+        """Decide whether to run the resolution check for this frame and update per-user state"""
+        now = time.time()
+
+        def apply(state: Optional[Dict[str, Any]]):
+            state = state or self._new_state()
+            decision = self._evaluate(state, frame_digest, open_count, extracted_count, now)
+
+            state["last_frame_digest"] = frame_digest
+            if extracted_count > 0:
+                state["recent_extraction_hits"] = self.active_window_frames
+            elif state["recent_extraction_hits"] > 0:
+                state["recent_extraction_hits"] -= 1
+
+            if decision.run:
+                state["frames_since_check"] = 0
+                state["last_check_time"] = now
+                state["last_checked_digest"] = frame_digest
+            else:
+                state["frames_since_check"] += 1
+            return state, decision
+
+        decision = shared_store.update(STATE_NAMESPACE, user_id, apply, ttl_seconds=STATE_TTL_SECONDS)
+        shared_store.incr(STATS_NAMESPACE, "checks_run" if decision.run else "checks_avoided")
+        shared_store.incr(STATS_NAMESPACE, f"reason:{decision.reason}")
+
+        logger.info(f"Resolution policy - User {user_id} - run={decision.run} reason={decision.reason} open={open_count}")
+        return decision
+
+    def record_outcome(self, user_id: str, resolved_count: int):
+        """Adapt the user's sampling rate to how often checks actually resolve something"""
+        def apply(state: Optional[Dict[str, Any]]):
+            state = state or self._new_state()
+            if resolved_count > 0:
+                state["sample_rate"] = min(1.0, state["sample_rate"] * 2)
+            else:
+                # Decay back towards the base rate
+                state["sample_rate"] = max(self.base_sample_rate, state["sample_rate"] * 0.9)
+            return state, None
+
+        shared_store.update(STATE_NAMESPACE, user_id, apply, ttl_seconds=STATE_TTL_SECONDS)
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters for how many resolution checks ran and how many were avoided"""
+        counters = shared_store.items(STATS_NAMESPACE)
+        checks_run = counters.get("checks_run", 0)
+        checks_avoided = counters.get("checks_avoided", 0)
+        total = checks_run + checks_avoided
+        return {
+            "enabled": self.enabled,
+            "checks_run": checks_run,
+            "checks_avoided": checks_avoided,
+            "avoided_ratio": (checks_avoided / total) if total else 0.0,
+            "decisions": {k.split(":", 1)[1]: v for k, v in counters.items() if k.startswith("reason:")},
+            "tracked_users": shared_store.count(STATE_NAMESPACE),
+        }
+
+
+# Global instance
+resolution_policy = ResolutionCheckPolicy()
@@ -0,0 +1,151 @@
+import os
+import re
+import hashlib
+import logging
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from memory_budget import BudgetedLRU, memory_budget
+from metrics import timed_stage
+
+logger = logging.getLogger(__name__)
+
+# BM25 parameters (standard defaults)
+K1 = 1.2
+B = 0.75
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "i ill im ive me my we well our you your the a an and or to of for on in at by with "
+    "is are be will would can could should it its this that as so do just get got".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens without stopwords, with a plural 's' stripped"""
+    tokens = []
+    for token in TOKEN_RE.findall(text.lower().replace("'", "")):
+        if token in STOPWORDS:
+            continue
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+def row_text(row: Dict[str, Any]) -> str:
+    """Indexed text of a promise row: content, recipient and platform"""
+    return " ".join(str(row.get(field) or "") for field in ("content", "person", "platform"))
+
+
+class PromiseIndex:
+    """
+    BM25 index over one user's promise rows, stored as flat postings arrays
+    (term-sorted) so a query is scored with a handful of NumPy operations.
+    """
+    def __init__(self, rows: List[Dict[str, Any]]):
+        self.size = len(rows)
+        docs = [tokenize(row_text(row)) for row in rows]
+        self.vocab: Dict[str, int] = {}
+        term_ids: List[int] = []
+        doc_ids: List[int] = []
+        for doc_id, tokens in enumerate(docs):
+            for token in tokens:
+                term_ids.append(self.vocab.setdefault(token, len(self.vocab)))
+                doc_ids.append(doc_id)
+
+        n = max(self.size, 1)
+        pairs, tf = np.unique(np.asarray(term_ids, dtype=np.int64) * n + np.asarray(doc_ids, dtype=np.int64), return_counts=True)
+        terms = pairs // n
+        self.post_docs = (pairs % n).astype(np.int32)
+        self.post_tf = tf.astype(np.float32)
+        self.offsets = np.searchsorted(terms, np.arange(len(self.vocab) + 1)).astype(np.int64)
+
+        df = np.diff(self.offsets).astype(np.float32)
+        self.idf = np.log1p((self.size - df + 0.5) / (df + 0.5)).astype(np.float32)
+        doc_len = np.asarray([len(tokens) for tokens in docs], dtype=np.float32)
+        avg_len = float(doc_len.mean()) if self.size and doc_len.mean() > 0 else 1.0
+        self.norm = (K1 * (1 - B + B * doc_len / avg_len)).astype(np.float32)
+
+        # Ties (including all-zero scores) go to the most recently created promise
+        created = [str(row.get("created_at") or "") for row in rows]
+        self.recency = np.argsort(np.argsort(created, kind="stable"), kind="stable").astype(np.int32)
+
+    @property
+    def nbytes(self) -> int:
+        arrays = (self.post_docs, self.post_tf, self.offsets, self.idf, self.norm, self.recency)
+        # Vocabulary dict entries cost roughly 100 bytes each
+        return sum(a.nbytes for a in arrays) + 100 * len(self.vocab)
+
+    def scores(self, query: str) -> np.ndarray:
+        scores = np.zeros(self.size, dtype=np.float32)
+        term_ids = np.asarray(sorted({self.vocab[t] for t in tokenize(query) if t in self.vocab}), dtype=np.int64)
+        if not self.size or not len(term_ids):
+            return scores
+        starts, ends = self.offsets[term_ids], self.offsets[term_ids + 1]
+        lengths = ends - starts
+        # Positions of every posting of every query term, without a Python loop over postings
+        positions = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+        docs = self.post_docs[positions]
+        tf = self.post_tf[positions]
+        weights = np.repeat(self.idf[term_ids], lengths)
+        contributions = weights * tf * (K1 + 1) / (tf + self.norm[docs])
+        return np.bincount(docs, weights=contributions, minlength=self.size).astype(np.float32)
+
+    def top_k(self, query: str, k: int, mask: Optional[np.ndarray] = None) -> List[int]:
+        """Row positions of the k best matches for `query`, restricted to `mask` if given"""
+        candidates = np.arange(self.size) if mask is None else np.flatnonzero(mask)
+        if len(candidates) <= k:
+            return candidates.tolist()
+        scores = self.scores(query)[candidates]
+        # lexsort uses the last key as primary: score first, then recency
+        order = np.lexsort((-self.recency[candidates], -scores))
+        return candidates[order[:k]].tolist()
+
+
+def _signature(rows: List[Dict[str, Any]]) -> str:
+    digest = hashlib.sha1()
+    for row in rows:
+        digest.update(f"{row.get('id')}\x1f{row_text(row)}\x1e".encode())
+    return digest.hexdigest()
+
+
+class PromiseRetriever:
+    """
+    Picks the promises worth sending to a BAML call, so prompts stay bounded
+    as a user's promise history grows. Indexes are cached per user and rebuilt
+    when the user's rows change.
+    """
+    def __init__(self):
+        self.enabled = os.getenv("RETRIEVAL_ENABLED", "true").lower() == "true"
+        # benchmarks/bench_retrieval.py reaches recall >= 0.99 from k=12 on synthetic
+        # histories of up to 1000 promises; 16 leaves margin for noisier real paraphrases
+        self.top_k = int(os.getenv("RETRIEVAL_TOP_K", "16"))
+        self._indexes = BudgetedLRU("promise_index", memory_budget, max_entries=512)
+
+    def index_for(self, user_id: str, rows: List[Dict[str, Any]]) -> PromiseIndex:
+        signature = _signature(rows)
+        cached = self._indexes.get(user_id)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+        index = PromiseIndex(rows)
+        self._indexes.put(user_id, (signature, index), index.nbytes)
+        return index
+
+    def select(self, user_id: str, rows: List[Dict[str, Any]], query: str, open_only: bool = True, k: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Return the rows most relevant to `query` (all rows when there are no more than k)"""
+        k = k or self.top_k
+        eligible = [row for row in rows if not row.get("resolved")] if open_only else rows
+        if not self.enabled or len(eligible) <= k:
+            return eligible
+        with timed_stage("retrieval"):
+            index = self.index_for(user_id, rows)
+            mask = np.asarray([not row.get("resolved") for row in rows], dtype=bool) if open_only else None
+            selected = [rows[i] for i in index.top_k(query, k, mask)]
+        logger.info(f"Retrieval - User {user_id} - selected {len(selected)} of {len(eligible)} promises")
+        return selected
+
+
+# Global instance
+promise_retriever = PromiseRetriever()
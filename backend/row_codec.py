@@ -0,0 +1,29 @@
+import json
+import logging
+from typing import Any, Dict
+
+logger = logging.getLogger(__name__)
+
+# jsonb columns of the promises table
+JSONB_COLUMNS = ("extraction_data", "action", "metadata", "potential_actions")
+
+
+def decode_json(value: Any, default: Any = None) -> Any:
+    """
+    Value of a jsonb column. Rows written before migrations/jsonb_native_columns.sql
+    hold JSON strings inside the jsonb; those are parsed.
+    """
+    if value is None:
+        return default
+    if isinstance(value, str):
+        try:
+            return json.loads(value)
+        except ValueError:
+            logger.warning(f"Row codec - jsonb column holds a non-JSON string: {value[:80]!r}")
+            return default
+    return value
+
+
+def decode_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    """A promise row with its jsonb columns as Python objects"""
+    return {**row, **{column: decode_json(row[column]) for column in JSONB_COLUMNS if column in row}}
@@ -0,0 +1,35 @@
+"""
+Production entrypoint. Runs uvicorn with WEB_CONCURRENCY worker processes.
+
+With more than one worker, per-process state moves to the shared SQLite store
+(see shared_store.py) and Prometheus metrics are written to a directory that
+every worker shares, so /metrics reports the whole machine.
+"""
+import os
+import shutil
+import tempfile
+import uvicorn
+
+from shared_store import worker_count
+
+
+def main():
+    workers = worker_count()
+    if workers > 1 and not os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = os.path.join(tempfile.gettempdir(), "promise_keeper_metrics")
+    metrics_dir = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+    if metrics_dir:
+        # Files left by a previous run would be summed into this run's counters
+        shutil.rmtree(metrics_dir, ignore_errors=True)
+        os.makedirs(metrics_dir, exist_ok=True)
+
+    uvicorn.run(
+        "main:app",
+        host=os.getenv("HOST", "0.0.0.0"),
+        port=int(os.getenv("PORT", 8000)),
+        workers=workers,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+import contextvars
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+# Per-request stage durations; the middleware installs a fresh dict and timed_stage() fills it
+_request_timings: ContextVar[Optional[Dict[str, List[float]]]] = ContextVar("request_timings", default=None)
+
+
+def start_request() -> Dict[str, List[float]]:
+    timings: Dict[str, List[float]] = {}
+    _request_timings.set(timings)
+    return timings
+
+
+def record(stage: str, seconds: float):
+    """Attach a stage duration to the current request, if there is one"""
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.setdefault(stage, []).append(seconds)
+
+
+async def in_threadpool(fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """run_in_threadpool for blocking pipeline steps, with the request's context so their stages still get recorded"""
+    # anyio 3 doesn't carry contextvars into the worker thread
+    context = contextvars.copy_context()
+    return await run_in_threadpool(context.run, fn, *args, **kwargs)
+
+
+def header_value(timings: Dict[str, List[float]], total_seconds: float) -> str:
+    """Render timings as a Server-Timing header; repeated stages are summed with their count"""
+    entries = []
+    for stage, durations in timings.items():
+        entry = f"{stage};dur={sum(durations) * 1000:.1f}"
+        if len(durations) > 1:
+            entry += f';desc="x{len(durations)}"'
+        entries.append(entry)
+    entries.append(f"total;dur={total_seconds * 1000:.1f}")
+    return ", ".join(entries)
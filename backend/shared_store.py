@@ -0,0 +1,295 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# (new_value, result): update() stores new_value (None deletes) and returns result
+Updater = Callable[[Optional[Any]], Tuple[Optional[Any], Any]]
+
+
+class MemoryStore:
+    """
+    Process-local store, used when a single worker serves the app. Entries carry
+    an approximate size (their JSON length); namespaces marked with
+    allow_eviction() are caches, and count against the memory budget once
+    use_budget() is called, which evicts them least recently used first.
+    """
+    name = "shared_store"
+
+    def __init__(self):
+        self._data: "OrderedDict[Tuple[str, str], Tuple[Any, Optional[float], int]]" = OrderedDict()
+        self._nbytes = 0
+        self._evictable: Set[str] = set()
+        self._budget: Any = None
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    @property
+    def nbytes(self) -> int:
+        return self._nbytes
+
+    def allow_eviction(self, namespace: str):
+        """Mark `namespace` as a cache: its entries may be dropped under memory pressure"""
+        self._evictable.add(namespace)
+
+    def use_budget(self, budget: Any):
+        self._budget = budget
+        budget.register_cache(self)
+
+    def _live(self, namespace: str, key: str) -> Optional[Any]:
+        entry = self._data.get((namespace, key))
+        if entry is None:
+            return None
+        value, expires_at, _ = entry
+        if expires_at is not None and expires_at <= time.time():
+            self._remove((namespace, key))
+            return None
+        return value
+
+    def _remove(self, data_key: Tuple[str, str]):
+        entry = self._data.pop(data_key, None)
+        if entry is not None:
+            self._nbytes -= entry[2]
+
+    def _store(self, namespace: str, key: str, value: Any, expires_at: Optional[float], nbytes: int):
+        self._remove((namespace, key))
+        self._data[(namespace, key)] = (value, expires_at, nbytes)
+        self._nbytes += nbytes
+
+    def _check_budget(self, namespace: str):
+        if self._budget is None or namespace not in self._evictable:
+            return
+        overflow = -self._budget.headroom()
+        if overflow > 0:
+            self.shrink(overflow)
+
+    def get(self, namespace: str, key: str, default: Any = None) -> Any:
+        with self._lock:
+            value = self._live(namespace, key)
+            if value is not None:
+                self._data.move_to_end((namespace, key))
+        return default if value is None else value
+
+    def set(self, namespace: str, key: str, value: Any, ttl_seconds: Optional[float] = None):
+        with self._lock:
+            self._store(namespace, key, value, time.time() + ttl_seconds if ttl_seconds else None, _sizeof(value))
+            self._check_budget(namespace)
+
+    def add(self, namespace: str, key: str, value: Any, ttl_seconds: Optional[float] = None) -> bool:
+        """Set only if absent; returns True if this call stored the value"""
+        with self._lock:
+            if self._live(namespace, key) is not None:
+                return False
+            self.set(namespace, key, value, ttl_seconds)
+            return True
+
+    def delete(self, namespace: str, key: str):
+        with self._lock:
+            self._remove((namespace, key))
+
+    def incr(self, namespace: str, key: str, amount: int = 1, ttl_seconds: Optional[float] = None) -> int:
+        with self._lock:
+            value = (self._live(namespace, key) or 0) + amount
+            entry = self._data.get((namespace, key))
+            expires_at = entry[1] if entry and entry[1] else (time.time() + ttl_seconds if ttl_seconds else None)
+            self._store(namespace, key, value, expires_at, len(str(value)))
+            return value
+
+    def update(self, namespace: str, key: str, fn: Updater, ttl_seconds: Optional[float] = None) -> Any:
+        """Atomically read-modify-write one key"""
+        with self._lock:
+            new_value, result = fn(self._live(namespace, key))
+            if new_value is None:
+                self._remove((namespace, key))
+            else:
+                self.set(namespace, key, new_value, ttl_seconds)
+            return result
+
+    def items(self, namespace: str) -> Dict[str, Any]:
+        with self._lock:
+            keys = [k for (ns, k) in self._data if ns == namespace]
+            return {k: v for k in keys if (v := self._live(namespace, k)) is not None}
+
+    def count(self, namespace: str) -> int:
+        return len(self.items(namespace))
+
+    def shrink(self, target_bytes: int) -> int:
+        """Drop expired entries, then least recently used cache entries, until `target_bytes` are freed"""
+        freed = 0
+        with self._lock:
+            now = time.time()
+            for data_key in [k for k, entry in self._data.items() if entry[1] is not None and entry[1] <= now]:
+                freed += self._data[data_key][2]
+                self._remove(data_key)
+            for data_key in [k for k in self._data if k[0] in self._evictable]:
+                if freed >= target_bytes:
+                    break
+                freed += self._data[data_key][2]
+                self._remove(data_key)
+        return freed
+
+
+class SQLiteStore:
+    """
+    Store shared by all worker processes on the machine: one SQLite file in WAL
+    mode, so readers never block and writers serialize on short transactions.
+    Values are JSON.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._writes = 0
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS kv ("
+            " ns TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, expires_at REAL,"
+            " PRIMARY KEY (ns, key)) WITHOUT ROWID"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS kv_expires ON kv(expires_at) WHERE expires_at IS NOT NULL")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        # A connection inherited across fork must not be used by the child
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @staticmethod
+    def _expiry(ttl_seconds: Optional[float]) -> Optional[float]:
+        return time.time() + ttl_seconds if ttl_seconds else None
+
+    def _maybe_purge(self, conn: sqlite3.Connection):
+        self._writes += 1
+        if self._writes % 500 == 0:
+            conn.execute("DELETE FROM kv WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),))
+
+    def _read(self, conn: sqlite3.Connection, namespace: str, key: str) -> Optional[Any]:
+        row = conn.execute(
+            "SELECT value FROM kv WHERE ns = ? AND key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (namespace, key, time.time()),
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get(self, namespace: str, key: str, default: Any = None) -> Any:
+        value = self._read(self._conn(), namespace, key)
+        return default if value is None else value
+
+    def set(self, namespace: str, key: str, value: Any, ttl_seconds: Optional[float] = None):
+        conn = self._conn()
+        conn.execute(
+            "INSERT INTO kv (ns, key, value, expires_at) VALUES (?, ?, ?, ?)"
+            " ON CONFLICT (ns, key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at",
+            (namespace, key, json.dumps(value), self._expiry(ttl_seconds)),
+        )
+        self._maybe_purge(conn)
+
+    def add(self, namespace: str, key: str, value: Any, ttl_seconds: Optional[float] = None) -> bool:
+        conn = self._conn()
+        cursor = conn.execute(
+            "INSERT INTO kv (ns, key, value, expires_at) VALUES (?, ?, ?, ?)"
+            " ON CONFLICT (ns, key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at"
+            " WHERE kv.expires_at IS NOT NULL AND kv.expires_at <= ?",
+            (namespace, key, json.dumps(value), self._expiry(ttl_seconds), time.time()),
+        )
+        return cursor.rowcount > 0
+
+    def allow_eviction(self, namespace: str):
+        # On disk, outside the memory budget
+        pass
+
+    def delete(self, namespace: str, key: str):
+        self._conn().execute("DELETE FROM kv WHERE ns = ? AND key = ?", (namespace, key))
+
+    def incr(self, namespace: str, key: str, amount: int = 1, ttl_seconds: Optional[float] = None) -> int:
+        # As in MemoryStore: an expired counter starts over with a new expiry; a live one keeps its own
+        now = time.time()
+        row = self._conn().execute(
+            "INSERT INTO kv (ns, key, value, expires_at) VALUES (?, ?, ?, ?)"
+            " ON CONFLICT (ns, key) DO UPDATE SET"
+            "  value = CASE WHEN kv.expires_at IS NOT NULL AND kv.expires_at <= ? THEN excluded.value"
+            "   ELSE CAST(kv.value AS INTEGER) + ? END,"
+            "  expires_at = CASE WHEN kv.expires_at IS NOT NULL AND kv.expires_at <= ? THEN excluded.expires_at"
+            "   ELSE COALESCE(kv.expires_at, excluded.expires_at) END"
+            " RETURNING value",
+            (namespace, key, str(amount), self._expiry(ttl_seconds), now, amount, now),
+        ).fetchone()
+        return int(row[0])
+
+    def update(self, namespace: str, key: str, fn: Updater, ttl_seconds: Optional[float] = None) -> Any:
+        conn = self._conn()
+        # IMMEDIATE takes the write lock up front so concurrent workers can't interleave the read and write
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            new_value, result = fn(self._read(conn, namespace, key))
+            if new_value is None:
+                conn.execute("DELETE FROM kv WHERE ns = ? AND key = ?", (namespace, key))
+            else:
+                conn.execute(
+                    "INSERT INTO kv (ns, key, value, expires_at) VALUES (?, ?, ?, ?)"
+                    " ON CONFLICT (ns, key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at",
+                    (namespace, key, json.dumps(new_value), self._expiry(ttl_seconds)),
+                )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        self._maybe_purge(conn)
+        return result
+
+    def items(self, namespace: str) -> Dict[str, Any]:
+        rows = self._conn().execute(
+            "SELECT key, value FROM kv WHERE ns = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (namespace, time.time()),
+        ).fetchall()
+        return {key: json.loads(value) for key, value in rows}
+
+    def count(self, namespace: str) -> int:
+        return self._conn().execute(
+            "SELECT COUNT(*) FROM kv WHERE ns = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (namespace, time.time()),
+        ).fetchone()[0]
+
+
+def _sizeof(value: Any) -> int:
+    return len(value) if isinstance(value, str) else len(json.dumps(value, default=str))
+
+
+def on_persistent_storage(path: str) -> bool:
+    """Whether `path` is on a mounted volume, not the root filesystem (which a Fly machine loses when it stops)"""
+    directory = os.path.dirname(os.path.abspath(path))
+    while directory != os.path.dirname(directory):
+        if os.path.ismount(directory):
+            return True
+        directory = os.path.dirname(directory)
+    return False
+
+
+def worker_count() -> int:
+    return max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+
+
+def _create_store():
+    path = os.getenv("SHARED_STORE_PATH")
+    if not path and worker_count() > 1:
+        path = "/tmp/promise_keeper_shared.db"
+    if path:
+        logger.info(f"Shared store - SQLite at {path}")
+        return SQLiteStore(path)
+    return MemoryStore()
+
+
+# Global instance
+shared_store = _create_store()
@@ -0,0 +1,80 @@
+import os
+import time
+import logging
+import threading
+from typing import Dict, List, Optional, Any
+
+logger = logging.getLogger(__name__)
+
+
+def _process_age_seconds() -> Optional[float]:
+    """Seconds since the interpreter process started (Linux only), to include interpreter boot"""
+    try:
+        with open("/proc/self/stat") as f:
+            # The command name may contain spaces, so split after its closing parenthesis
+            fields = f.read().rsplit(")", 1)[1].split()
+        start_ticks = int(fields[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return max(0.0, uptime - start_ticks / os.sysconf("SC_CLK_TCK"))
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class StartupTimer:
+    """Breaks down time from process start to serving, and to the first successful extraction"""
+    def __init__(self):
+        self._origin = time.perf_counter()
+        age = _process_age_seconds()
+        # Shift the origin back so phases are measured from process start where we can tell
+        if age is not None:
+            self._origin -= age
+        self._last = self._origin
+        self._lock = threading.Lock()
+        self.phases: List[Dict[str, Any]] = []
+        if age is not None:
+            self.phases.append({"phase": "interpreter", "seconds": round(age, 4)})
+            self._last = time.perf_counter()
+        self.first_extraction_seconds: Optional[float] = None
+
+    def since_start(self) -> float:
+        return time.perf_counter() - self._origin
+
+    def mark(self, phase: str):
+        """Record the time since the previous mark as `phase`"""
+        now = time.perf_counter()
+        with self._lock:
+            self.phases.append({"phase": phase, "seconds": round(now - self._last, 4)})
+            self._last = now
+
+    def record(self, phase: str, seconds: float):
+        """Record a phase that ran concurrently (e.g. background warm-up)"""
+        with self._lock:
+            self.phases.append({"phase": phase, "seconds": round(seconds, 4)})
+
+    def mark_first_extraction(self) -> bool:
+        """Note the first successful extraction; returns True only the first time"""
+        if self.first_extraction_seconds is not None:
+            return False
+        with self._lock:
+            if self.first_extraction_seconds is not None:
+                return False
+            self.first_extraction_seconds = round(self.since_start(), 4)
+        logger.info(f"Startup - first successful extraction {self.first_extraction_seconds:.3f}s after process start")
+        return True
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "phases": list(self.phases),
+                "since_start_seconds": round(self.since_start(), 4),
+                "first_extraction_seconds": self.first_extraction_seconds,
+            }
+
+    def log_breakdown(self):
+        breakdown = ", ".join(f"{p['phase']}={p['seconds'] * 1000:.0f}ms" for p in self.phases)
+        logger.info(f"Startup - ready {self.since_start():.3f}s after process start ({breakdown})")
+
+
+# Global instance, created as early as possible so import time is measured
+startup_timer = StartupTimer()
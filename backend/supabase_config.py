@@ -1,4 +1,5 @@
 import os
+import threading
 from supabase import create_client, Client
 from typing import Optional
 import jwt
@@ -19,12 +20,26 @@ class SupabaseConfig:
         self.jwt_secret = os.getenv("JWT_SECRET", self.anon_key)  # Use anon key as fallback
         self.jwt_algorithm = os.getenv("JWT_ALGORITHM", "HS256")
         
-        # Create clients
-        self.client: Client = create_client(self.url, self.anon_key)
-        self.admin_client: Optional[Client] = None
-        
-        if self.service_role_key:
-            self.admin_client = create_client(self.url, self.service_role_key)
+        # Clients are created on first use so importing this module does no network setup
+        self._client: Optional[Client] = None
+        self._admin_client: Optional[Client] = None
+        self._lock = threading.Lock()
+    
+    @property
+    def client(self) -> Client:
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = create_client(self.url, self.anon_key)
+        return self._client
+    
+    @property
+    def admin_client(self) -> Optional[Client]:
+        if self._admin_client is None and self.service_role_key:
+            with self._lock:
+                if self._admin_client is None:
+                    self._admin_client = create_client(self.url, self.service_role_key)
+        return self._admin_client
     
     def get_client(self) -> Client:
         """Get the regular Supabase client"""
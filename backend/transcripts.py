@@ -0,0 +1,91 @@
+import os
+import difflib
+import hashlib
+import logging
+from typing import List, Optional
+
+from shared_store import shared_store
+
+logger = logging.getLogger(__name__)
+
+TRANSCRIPT_NAMESPACE = "transcripts"
+
+# A dropped transcript makes every line of its window's next frame new
+shared_store.allow_eviction(TRANSCRIPT_NAMESPACE)
+
+
+def normalize_line(line: str) -> str:
+    return " ".join(line.split())
+
+
+class TranscriptDiff:
+    """Lines of a window's text that weren't seen before, with the lines just above them"""
+    def __init__(self, new_lines: List[str], context_lines: List[str], total_lines: int):
+        self.new_lines = new_lines
+        self.context_lines = context_lines
+        self.total_lines = total_lines
+
+    @property
+    def new_text(self) -> str:
+        return "\n".join(self.new_lines)
+
+    @property
+    def context_text(self) -> str:
+        return "\n".join(self.context_lines)
+
+    @property
+    def digest(self) -> str:
+        return hashlib.sha256(self.new_text.encode()).hexdigest()
+
+
+class TranscriptStore:
+    """
+    Rolling per-user, per-window transcript of on-screen text.
+
+    Each call aligns the window's current text with the transcript seen so far
+    for that window (a line diff after whitespace normalization), so only newly
+    appeared lines plus a few lines of context are sent to the model. Alignment
+    is positional, so a repeated short message (a second "ok") is still new,
+    and lines that scroll back into view are not.
+    """
+    def __init__(self):
+        self.context_lines = int(os.getenv("TRANSCRIPT_CONTEXT_LINES", "5"))
+        self.max_lines = int(os.getenv("TRANSCRIPT_MAX_LINES", "400"))
+        # A window seen for the first time sends at most this many lines; the rest count as already seen
+        self.max_new_lines = int(os.getenv("TRANSCRIPT_MAX_NEW_LINES", "60"))
+        self.ttl_seconds = float(os.getenv("TRANSCRIPT_TTL_SECONDS", "3600"))
+
+    @staticmethod
+    def _key(user_id: str, window_key: str) -> str:
+        return f"{user_id}:{hashlib.sha1(window_key.encode()).hexdigest()[:16]}"
+
+    def diff(self, user_id: str, window_key: str, text: str) -> TranscriptDiff:
+        lines = [line for line in (normalize_line(raw) for raw in text.splitlines()) if line]
+
+        def apply(seen_lines: Optional[List[str]]):
+            seen = seen_lines or []
+            new_positions: List[int] = []
+            # Merge the current text into the transcript, keeping lines the window no longer shows
+            merged: List[str] = []
+            matcher = difflib.SequenceMatcher(None, seen, lines, autojunk=False)
+            for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+                if tag != "insert":
+                    merged.extend(seen[i1:i2])
+                if tag in ("insert", "replace"):
+                    merged.extend(lines[j1:j2])
+                    new_positions.extend(range(j1, j2))
+            if len(new_positions) > self.max_new_lines:
+                new_positions = new_positions[-self.max_new_lines:]
+            context: List[str] = []
+            if new_positions:
+                first = new_positions[0]
+                context = lines[max(0, first - self.context_lines):first]
+            return merged[-self.max_lines:], TranscriptDiff([lines[i] for i in new_positions], context, len(lines))
+
+        diff = shared_store.update(TRANSCRIPT_NAMESPACE, self._key(user_id, window_key), apply, ttl_seconds=self.ttl_seconds)
+        logger.info(f"Transcript - User {user_id} - {len(diff.new_lines)} new of {diff.total_lines} lines")
+        return diff
+
+
+# Global instance
+transcript_store = TranscriptStore()
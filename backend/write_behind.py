@@ -0,0 +1,255 @@
+import os
+import json
+import time
+import socket
+import sqlite3
+import asyncio
+import logging
+import threading
+from contextlib import suppress
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+from metrics import observe_stage, WRITE_BEHIND_FLUSHED, WRITE_BEHIND_LAG, WRITE_BEHIND_PENDING
+from shared_store import on_persistent_storage, shared_store
+
+logger = logging.getLogger(__name__)
+
+INSERT = "insert"
+RESOLVE = "resolve"
+LOCK_NAMESPACE = "write_behind"
+STATS_NAMESPACE = "write_behind_stats"
+
+# Applies one user's entries of one op to Supabase: (client, user_id, payloads) -> None, raising on failure
+Applier = Callable[[Any, str, List[Dict[str, Any]]], None]
+
+
+class WriteBehindLog:
+    """
+    Durable local log of promise writes, flushed to Supabase in the background.
+
+    With WRITE_BEHIND_ENABLED the pipeline appends new promises ("insert") and
+    resolutions ("resolve") to a SQLite log and responds without waiting for
+    Supabase. One worker at a time (a shared-store lock) flushes the log:
+    - a user's entries are applied in the order they were logged;
+    - consecutive inserts of a user go to Supabase as one bulk insert;
+    - a failed entry is retried with exponential backoff, and the user's later
+      entries wait behind it, while other users keep flushing;
+    - after WRITE_BEHIND_MAX_ATTEMPTS an entry is set aside as dead and reported.
+
+    Reads of a user's promises go through overlay(), so entries that are still in
+    the log are visible to dedup and resolution checks.
+
+    The log must outlive the machine: it stays disabled unless WRITE_BEHIND_PATH
+    is on a mounted volume (fly.toml mounts one at /data), or
+    WRITE_BEHIND_ALLOW_EPHEMERAL is set for local use.
+    """
+    def __init__(self):
+        self.enabled = os.getenv("WRITE_BEHIND_ENABLED", "false").lower() == "true"
+        self.path = os.getenv("WRITE_BEHIND_PATH", "/data/promise_keeper_writes.db")
+        allow_ephemeral = os.getenv("WRITE_BEHIND_ALLOW_EPHEMERAL", "false").lower() == "true"
+        if self.enabled and not allow_ephemeral and not on_persistent_storage(self.path):
+            logger.error(f"Write-behind - {self.path} is not on a mounted volume; entries would be lost when the machine stops. Write-behind stays off")
+            self.enabled = False
+        self.flush_interval_seconds = float(os.getenv("WRITE_BEHIND_FLUSH_INTERVAL_MS", "500")) / 1000
+        self.batch_size = int(os.getenv("WRITE_BEHIND_BATCH_SIZE", "200"))
+        self.max_attempts = int(os.getenv("WRITE_BEHIND_MAX_ATTEMPTS", "20"))
+        self.max_backoff_seconds = float(os.getenv("WRITE_BEHIND_MAX_BACKOFF_SECONDS", "300"))
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self.client_factory: Callable[[], Any] = lambda: None
+        self._appliers: Dict[str, Applier] = {}
+        self._local = threading.local()
+        # One flush at a time in this process, so the final flush in stop() can't overlap a running one
+        self._flush_lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        # A connection inherited across fork must not be used by the child
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # FULL: an entry is on disk before the request that logged it is answered
+            conn.execute("PRAGMA synchronous=FULL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS writes ("
+                " seq INTEGER PRIMARY KEY AUTOINCREMENT, user_id TEXT NOT NULL, op TEXT NOT NULL, payload TEXT NOT NULL,"
+                " created_at REAL NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, next_attempt_at REAL NOT NULL DEFAULT 0,"
+                " last_error TEXT, dead INTEGER NOT NULL DEFAULT 0)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS writes_user ON writes(user_id, seq)")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def register(self, op: str, applier: Applier):
+        self._appliers[op] = applier
+
+    def append(self, user_id: str, op: str, payload: Dict[str, Any]):
+        self._conn().execute(
+            "INSERT INTO writes (user_id, op, payload, created_at) VALUES (?, ?, ?, ?)",
+            (user_id, op, json.dumps(payload), time.time()),
+        )
+
+    def pending(self, user_id: str) -> List[Dict[str, Any]]:
+        rows = self._conn().execute(
+            "SELECT seq, op, payload, created_at FROM writes WHERE user_id = ? AND dead = 0 ORDER BY seq", (user_id,)
+        ).fetchall()
+        return [{"seq": seq, "op": op, "payload": json.loads(payload), "created_at": created_at} for seq, op, payload, created_at in rows]
+
+    def overlay(self, user_id: str, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """The user's promise rows as they will be once the log is flushed"""
+        entries = self.pending(user_id)
+        if not entries:
+            return rows
+        rows = [dict(row) for row in rows]
+        for entry in entries:
+            payload = entry["payload"]
+            if entry["op"] == INSERT:
+                created_at = datetime.fromtimestamp(entry["created_at"], timezone.utc).isoformat()
+                rows.append({**payload, "id": f"pending-{entry['seq']}", "resolved": False, "created_at": created_at})
+            elif entry["op"] == RESOLVE:
+                for row in rows:
+                    if row.get("content") == payload["content"] and not row.get("resolved"):
+                        row["resolved"] = True
+        return rows
+
+    def _due(self, now: float) -> List[tuple]:
+        # An entry is due unless it, or an earlier entry of the same user, is backing off
+        return self._conn().execute(
+            "SELECT seq, user_id, op, payload, attempts FROM writes w WHERE dead = 0 AND NOT EXISTS ("
+            "  SELECT 1 FROM writes b WHERE b.user_id = w.user_id AND b.seq <= w.seq AND b.dead = 0 AND b.next_attempt_at > ?)"
+            " ORDER BY seq LIMIT ?",
+            (now, self.batch_size),
+        ).fetchall()
+
+    def _done(self, entries: List[tuple]):
+        conn = self._conn()
+        conn.executemany("DELETE FROM writes WHERE seq = ?", [(entry[0],) for entry in entries])
+        for entry in entries:
+            WRITE_BEHIND_FLUSHED.labels(entry[2], "ok").inc()
+            shared_store.incr(STATS_NAMESPACE, f"flushed:{entry[2]}")
+
+    def _failed(self, entry: tuple, error: Exception):
+        seq, user_id, op, _, attempts = entry
+        attempts += 1
+        dead = attempts >= self.max_attempts
+        self._conn().execute(
+            "UPDATE writes SET attempts = ?, next_attempt_at = ?, last_error = ?, dead = ? WHERE seq = ?",
+            (attempts, time.time() + min(self.max_backoff_seconds, 2 ** attempts), str(error)[:500], int(dead), seq),
+        )
+        WRITE_BEHIND_FLUSHED.labels(op, "dead" if dead else "retry").inc()
+        shared_store.incr(STATS_NAMESPACE, "dead" if dead else "retries")
+        log = logger.error if dead else logger.warning
+        log(f"Write-behind - User {user_id} - {op} #{seq} failed (attempt {attempts}){', giving up' if dead else ''}: {error}")
+
+    def _flush_user(self, client: Any, user_id: str, entries: List[tuple]) -> int:
+        flushed = 0
+        index = 0
+        while index < len(entries):
+            # Consecutive entries with the same op go to Supabase together
+            run = [entries[index]]
+            while index + len(run) < len(entries) and entries[index + len(run)][2] == run[0][2]:
+                run.append(entries[index + len(run)])
+            op = run[0][2]
+            try:
+                self._appliers[op](client, user_id, [json.loads(entry[3]) for entry in run])
+                self._done(run)
+            except Exception as batch_error:
+                if len(run) == 1:
+                    self._failed(run[0], batch_error)
+                    return flushed
+                # Find the entry that fails: apply the run one entry at a time
+                for entry in run:
+                    try:
+                        self._appliers[op](client, user_id, [json.loads(entry[3])])
+                        self._done([entry])
+                        flushed += 1
+                    except Exception as entry_error:
+                        self._failed(entry, entry_error)
+                        return flushed
+                index += len(run)
+                continue
+            flushed += len(run)
+            index += len(run)
+        return flushed
+
+    def flush_once(self, client: Any) -> int:
+        """Apply the due entries to Supabase; returns how many were flushed"""
+        with self._flush_lock:
+            start = time.perf_counter()
+            by_user: Dict[str, List[tuple]] = {}
+            for entry in self._due(time.time()):
+                by_user.setdefault(entry[1], []).append(entry)
+            flushed = sum(self._flush_user(client, user_id, entries) for user_id, entries in by_user.items())
+        if by_user:
+            observe_stage("write_behind.flush", time.perf_counter() - start)
+        self.stats()
+        return flushed
+
+    def _lead(self) -> bool:
+        """Hold the flusher lock; the holder renews it every round, so it only moves when a worker stops"""
+        def apply(holder: Optional[str]):
+            if holder is None or holder == self.owner:
+                return self.owner, True
+            return holder, False
+        return shared_store.update(LOCK_NAMESPACE, "flusher", apply, ttl_seconds=max(5.0, 10 * self.flush_interval_seconds))
+
+    async def _run(self):
+        while True:
+            try:
+                if self._lead():
+                    flushed = await run_in_threadpool(self.flush_once, self.client_factory())
+                    # A full batch means there is more waiting: go again without sleeping
+                    if flushed >= self.batch_size:
+                        continue
+            except Exception as flush_error:
+                logger.error(f"Write-behind - Flush failed: {flush_error}")
+            await asyncio.sleep(self.flush_interval_seconds)
+
+    def start(self, client_factory: Callable[[], Any]):
+        if not self.enabled or self._task is not None:
+            return
+        self.client_factory = client_factory
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Write-behind - Flushing {self.path} every {self.flush_interval_seconds * 1000:.0f}ms")
+
+    async def stop(self):
+        """Stop the flusher after one last flush; entries that still fail stay in the log for the next start"""
+        if self._task is None:
+            return
+        task, self._task = self._task, None
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+        # The cancel doesn't interrupt a flush_once already running in the threadpool (and the await above
+        # returns without it); the final flush waits for it on the flush lock, so entries aren't applied twice
+        if self._lead():
+            await run_in_threadpool(self.flush_once, self.client_factory())
+        shared_store.update(LOCK_NAMESPACE, "flusher", lambda holder: (None if holder == self.owner else holder, None))
+
+    def stats(self) -> Dict[str, Any]:
+        pending, dead, oldest = self._conn().execute(
+            "SELECT SUM(dead = 0), SUM(dead), MIN(CASE WHEN dead = 0 THEN created_at END) FROM writes"
+        ).fetchone()
+        lag = time.time() - oldest if oldest else 0.0
+        WRITE_BEHIND_PENDING.set(pending or 0)
+        WRITE_BEHIND_LAG.set(lag)
+        counters = shared_store.items(STATS_NAMESPACE)
+        return {
+            "enabled": self.enabled,
+            "path": self.path,
+            "flusher": shared_store.get(LOCK_NAMESPACE, "flusher"),
+            "pending": pending or 0,
+            "dead": dead or 0,
+            "lag_seconds": round(lag, 3),
+            "flushed": {key.split(":", 1)[1]: n for key, n in counters.items() if key.startswith("flushed:")},
+            "retries": counters.get("retries", 0),
+        }
+
+
+# Global instance
+write_behind_log = WriteBehindLog()
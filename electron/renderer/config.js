@@ -21,7 +21,9 @@ const API_CONFIG = {
     // API Endpoints
     endpoints: {
         extractPromisesFile: "/extract_promises_file",
-        extractPromisesFileAuth: "/extract_promises_file_auth"
+        extractPromisesFileAuth: "/extract_promises_file_auth",
+        precheckFrameAuth: "/precheck_frame_auth",
+        promiseChanges: "/promises/changes"
     },
     
     // Build full URL
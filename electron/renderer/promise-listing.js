@@ -13,6 +13,9 @@ class PromiseListingPage {
         this.isSettingsOpen = false;
         this.animationTimeouts = [];
         this.container = null;
+        // Change feed cursor: the backend sends the promises changed after it
+        this.changeCursor = null;
+        this.changeFeedActive = false;
         
         // Bind methods
         this.handleSearch = this.handleSearch.bind(this);
@@ -342,6 +345,7 @@ class PromiseListingPage {
         if (this.container) {
             this.container.style.display = 'none';
         }
+        this.stopChangeFeed();
         
         this.removeEventListeners();
         
@@ -359,6 +363,12 @@ class PromiseListingPage {
             return;
         }
 
+        // Sync incrementally through the backend's change feed; fall back to the full list from Supabase
+        if (await this.syncPromiseChanges()) {
+            this.startChangeFeed();
+            return;
+        }
+
         try {
             console.log('loadPromises: Loading promises for user', this.app.currentUser.id);
             const { data, error } = await window.PromiseKeeperConfig.supabaseClient
@@ -381,6 +391,75 @@ class PromiseListingPage {
         }
     }
 
+    // Fetch the promises changed since the last sync (all of them on the first call), following has_more.
+    // With wait (seconds), the backend holds the request until something changes. Returns false on failure.
+    async syncPromiseChanges(wait = 0) {
+        try {
+            const { data: { session } } = await window.PromiseKeeperConfig.supabaseClient.auth.getSession();
+            if (!session || !session.access_token) {
+                return false;
+            }
+            const apiConfig = window.PromiseKeeperConfig.API_CONFIG;
+            let changed = false;
+            while (true) {
+                const params = new URLSearchParams({ limit: '500' });
+                if (this.changeCursor) params.set('cursor', this.changeCursor);
+                if (wait) params.set('wait', String(wait));
+                const response = await fetch(`${apiConfig.getUrl(apiConfig.endpoints.promiseChanges)}?${params}`, {
+                    headers: { 'Authorization': `Bearer ${session.access_token}` }
+                });
+                if (!response.ok) {
+                    console.error('syncPromiseChanges: change feed returned', response.status);
+                    return false;
+                }
+                const page = await response.json();
+                if (page.changes.length > 0) {
+                    this.applyPromiseChanges(page.changes);
+                    changed = true;
+                }
+                this.changeCursor = page.cursor;
+                if (!page.has_more) break;
+                wait = 0;
+            }
+            if (changed) {
+                this.updateStats();
+                this.filterAndRenderPromises();
+            }
+            return true;
+        } catch (err) {
+            console.error('syncPromiseChanges: change feed unavailable:', err);
+            return false;
+        }
+    }
+
+    // Each changed row replaces the local copy (the feed leaves out NULL columns, so don't merge)
+    applyPromiseChanges(changes) {
+        const byId = new Map(this.promises.map(p => [p.id, p]));
+        for (const row of changes) {
+            byId.set(row.id, row);
+        }
+        this.promises = [...byId.values()].sort((a, b) => new Date(b.created_at) - new Date(a.created_at));
+    }
+
+    // Long-poll the change feed while the list is shown
+    startChangeFeed() {
+        if (this.changeFeedActive) return;
+        this.changeFeedActive = true;
+        (async () => {
+            while (this.changeFeedActive && this.app.currentUser) {
+                if (!(await this.syncPromiseChanges(25))) {
+                    // Backend unreachable: back off instead of retrying in a tight loop
+                    await new Promise(resolve => setTimeout(resolve, 30000));
+                }
+            }
+            this.changeFeedActive = false;
+        })();
+    }
+
+    stopChangeFeed() {
+        this.changeFeedActive = false;
+    }
+
     updateStats() {
         const total = this.promises.length;
         const completed = this.promises.filter(p => p.resolved).length;
@@ -787,11 +866,12 @@ class PromiseListingPage {
                         screenshot_id: screenshotId,
                         screenshot_timestamp: new Date(timestamp).toISOString(),
                         extracted_from_screenshot: true,
-                        extraction_data: JSON.stringify({
+                        // jsonb column: send the object, not a JSON string
+                        extraction_data: {
                             original_promise: promise,
                             to_whom: promise.to_whom,
                             deadline: promise.deadline
-                        })
+                        }
                     }
                 ])
                 .select()
@@ -1111,8 +1191,10 @@ class PromiseListingPage {
         }
         
         this.closeSettings();
+        this.stopChangeFeed();
         this.promises = [];
         this.filteredPromises = [];
+        this.changeCursor = null;
         this.container = null;
     }
     
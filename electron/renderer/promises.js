@@ -189,11 +189,12 @@ class PromiseManager {
                         screenshot_id: screenshotId,
                         screenshot_timestamp: new Date(timestamp).toISOString(),
                         extracted_from_screenshot: true,
-                        extraction_data: JSON.stringify({
+                        // jsonb column: send the object, not a JSON string
+                        extraction_data: {
                             original_promise: promise,
                             to_whom: promise.to_whom,
                             deadline: promise.deadline
-                        })
+                        }
                     }
                 ])
                 .select()
@@ -123,6 +123,13 @@ class ScreenshotManager {
         }
     }
 
+    // Pass the backend's recommended capture delay on to the main process scheduler
+    applyCaptureDelayHint(response) {
+        if (response && typeof response.next_capture_delay_ms === 'number' && window.electronAPI?.screenshots?.setNextCaptureDelay) {
+            window.electronAPI.screenshots.setNextCaptureDelay(response.next_capture_delay_ms);
+        }
+    }
+
     async processScreenshotForPromises(data) {
         if (!this.app.currentUser) {
             console.log('Screenshot promise processing skipped: user not logged in');
@@ -154,6 +161,8 @@ class ScreenshotManager {
             // Add screenshot metadata
             formData.append('screenshot_id', data.screenshotId);
             formData.append('screenshot_timestamp', new Date(data.timestamp).toISOString());
+            // Relative deadlines ("tomorrow at 8") are resolved in the user's timezone
+            formData.append('timezone', Intl.DateTimeFormat().resolvedOptions().timeZone);
 
             // Get the current user's access token
             const { data: { session } } = await window.PromiseKeeperConfig.supabaseClient.auth.getSession();
@@ -163,6 +172,32 @@ class ScreenshotManager {
                 return;
             }
 
+            // Ask the backend whether it needs this frame before uploading it
+            if (data.phash) {
+                try {
+                    const precheckResponse = await fetch(window.PromiseKeeperConfig.API_CONFIG.getUrl(window.PromiseKeeperConfig.API_CONFIG.endpoints.precheckFrameAuth), {
+                        method: 'POST',
+                        body: JSON.stringify({ phash: data.phash, frame_bytes: data.buffer.length }),
+                        headers: {
+                            'Content-Type': 'application/json',
+                            'Authorization': `Bearer ${session.access_token}`
+                        }
+                    });
+                    if (precheckResponse.ok) {
+                        const precheck = await precheckResponse.json();
+                        this.applyCaptureDelayHint(precheck);
+                        if (precheck.action === 'skip') {
+                            console.log(`Screenshot upload skipped by precheck (${precheck.reason})`);
+                            return;
+                        }
+                    }
+                } catch (precheckError) {
+                    // Older backends don't have the precheck endpoint; upload as before
+                    console.warn('Frame precheck failed, uploading anyway:', precheckError);
+                }
+                formData.append('phash', data.phash);
+            }
+
             // Call the API using the existing configuration
             const apiResponse = await fetch(window.PromiseKeeperConfig.API_CONFIG.getUrl(window.PromiseKeeperConfig.API_CONFIG.endpoints.extractPromisesFileAuth), {
                 method: 'POST',
@@ -176,6 +211,7 @@ class ScreenshotManager {
 
             if (apiResponse.ok) {
                 console.log('Screenshot processing result:', result);
+                this.applyCaptureDelayHint(result);
                 
                 const hasNewPromises = result.promises && result.promises.length > 0;
                 const hasResolvedPromises = result.resolved_promises && result.resolved_promises.length > 0;
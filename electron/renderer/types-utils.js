@@ -6,15 +6,15 @@
 console.log('Promise Keeper types-utils.js loading...');
 
 /**
- * Parse potential actions from JSON string
- * @param {string} actionsJson - JSON string of potential actions
+ * Parse potential actions from a jsonb column
+ * @param {Array|string} actionsJson - Array of potential actions, or a JSON string (rows written before the jsonb migration)
  * @returns {Array} Array of potential action objects
  */
 function parsePotentialActions(actionsJson) {
     if (!actionsJson) return [];
     
     try {
-        const actions = JSON.parse(actionsJson);
+        const actions = typeof actionsJson === 'string' ? JSON.parse(actionsJson) : actionsJson;
         return Array.isArray(actions) ? actions : [];
     } catch (error) {
         console.error('Failed to parse potential_actions:', error);
@@ -23,15 +23,15 @@ function parsePotentialActions(actionsJson) {
 }
 
 /**
- * Parse extraction data from JSON string
- * @param {string} extractionDataJson - JSON string of extraction data
+ * Parse extraction data from a jsonb column
+ * @param {Object|string} extractionDataJson - Extraction data, or a JSON string (rows written before the jsonb migration)
  * @returns {Object} Extraction data object
  */
 function parseExtractionData(extractionDataJson) {
     if (!extractionDataJson) return {};
     
     try {
-        return JSON.parse(extractionDataJson);
+        return typeof extractionDataJson === 'string' ? JSON.parse(extractionDataJson) : extractionDataJson;
     } catch (error) {
         console.error('Failed to parse extraction_data:', error);
         return {};
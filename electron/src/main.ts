@@ -1,4 +1,4 @@
-import { app, BrowserWindow, Tray, Menu, nativeImage, ipcMain, Notification, desktopCapturer, dialog, globalShortcut } from 'electron';
+import { app, BrowserWindow, Tray, Menu, nativeImage, NativeImage, ipcMain, Notification, desktopCapturer, dialog, globalShortcut } from 'electron';
 import * as path from 'path';
 import * as fs from 'fs';
 import * as os from 'os';
@@ -16,6 +16,30 @@ dotenv.config({ path: path.join(__dirname, '../.env.local') });
 
 const store = new Store();
 
+// 256-bit difference hash (dHash) of a frame, hex encoded: each bit says whether a cell
+// of a 17x16 grayscale thumbnail is darker than its right neighbour. The backend uses it
+// to tell near-identical frames apart before they are uploaded.
+function frameHash(image: NativeImage): string {
+  const width = 17;
+  const height = 16;
+  const bitmap = image.resize({ width, height, quality: 'good' }).toBitmap(); // BGRA
+  const gray = (x: number, y: number) => {
+    const i = (y * width + x) * 4;
+    return bitmap[i] * 114 + bitmap[i + 1] * 587 + bitmap[i + 2] * 299;
+  };
+  let hex = '';
+  for (let y = 0; y < height; y++) {
+    for (let x = 0; x < width - 1; x += 4) {
+      let nibble = 0;
+      for (let bit = 0; bit < 4; bit++) {
+        nibble = (nibble << 1) | (gray(x + bit, y) < gray(x + bit + 1, y) ? 1 : 0);
+      }
+      hex += nibble.toString(16);
+    }
+  }
+  return hex;
+}
+
 class PromiseKeeperApp {
   private mainWindow: BrowserWindow | null = null;
   private tray: Tray | null = null;
@@ -24,6 +48,8 @@ class PromiseKeeperApp {
   private promiseScreenshotsDir = path.join(os.homedir(), 'Documents', 'PromiseKeeper', 'PromiseScreenshots');
   private screenshotInterval: NodeJS.Timeout | null = null;
   private screenshotMode: 'off' | 'interval' | 'enter' = 'enter';
+  // Delay between interval captures; the backend adjusts it with next_capture_delay_ms hints
+  private nextCaptureDelayMs: number = 30000;
   private lastGlobalEnterTime: number = 0;
   private globalEnterCooldown: number = 60000; // 1 minute cooldown for global enter
   private globalKeyListener: boolean = false;
@@ -322,6 +348,16 @@ class PromiseKeeperApp {
       this.takeScreenshotAndProcess();
     });
 
+    // Handle capture delay hints from the backend's extraction responses
+    ipcMain.handle('set-next-capture-delay', (_, delayMs: number) => {
+      if (!Number.isFinite(delayMs)) return;
+      this.nextCaptureDelayMs = Math.min(300000, Math.max(5000, delayMs));
+      // Restart the wait from now, so a shorter delay takes effect immediately
+      if (this.screenshotMode === 'interval') {
+        this.scheduleNextCapture();
+      }
+    });
+
     // Handle screenshot mode changes
     ipcMain.handle('set-screenshot-mode', (_, mode: 'off' | 'interval' | 'enter') => {
       try {
@@ -346,19 +382,27 @@ class PromiseKeeperApp {
     
     // Clear existing interval
     if (this.screenshotInterval) {
-      clearInterval(this.screenshotInterval);
+      clearTimeout(this.screenshotInterval);
       this.screenshotInterval = null;
     }
     
     // Start interval if mode is 'interval'
     if (mode === 'interval') {
-      this.screenshotInterval = setInterval(() => this.takeScreenshotAndProcess(), 30000);
-      console.log('Started 30-second screenshot interval');
+      this.scheduleNextCapture();
+      console.log(`Started screenshot interval (${this.nextCaptureDelayMs / 1000}s, adjusted by the backend)`);
     }
     
     // Global key listener is always running, mode just determines if we act on Enter presses
   }
 
+  private scheduleNextCapture() {
+    if (this.screenshotInterval) clearTimeout(this.screenshotInterval);
+    this.screenshotInterval = setTimeout(() => {
+      this.takeScreenshotAndProcess();
+      this.scheduleNextCapture();
+    }, this.nextCaptureDelayMs);
+  }
+
   private setupGlobalKeyListener() {
     if (this.globalKeyListener) return;
     
@@ -420,6 +464,7 @@ class PromiseKeeperApp {
       
       if (sources[0]) {
         const screenshot = sources[0].thumbnail.toPNG();
+        const phash = frameHash(sources[0].thumbnail);
         const timestamp = Date.now();
         const screenshotId = `screenshot_${timestamp}`;
         const filename = `${screenshotId}.png`;
@@ -435,7 +480,8 @@ class PromiseKeeperApp {
             buffer: screenshot,
             filename: filename,
             screenshotId: screenshotId,
-            timestamp: timestamp
+            timestamp: timestamp,
+            phash: phash
           });
         }
         
@@ -41,7 +41,9 @@ contextBridge.exposeInMainWorld('electronAPI', {
       ipcRenderer.invoke('get-screenshot-path', screenshotId),
     takeScreenshotNow: () => ipcRenderer.invoke('take-screenshot-now'),
     setScreenshotMode: (mode: 'off' | 'interval' | 'enter') => 
-      ipcRenderer.invoke('set-screenshot-mode', mode)
+      ipcRenderer.invoke('set-screenshot-mode', mode),
+    setNextCaptureDelay: (delayMs: number) =>
+      ipcRenderer.invoke('set-next-capture-delay', delayMs)
   },
 
   // MCP operations
@@ -109,6 +111,7 @@ export interface ElectronAPI {
     getScreenshotPath: (screenshotId: string) => Promise<string>;
     takeScreenshotNow: () => Promise<void>;
     setScreenshotMode: (mode: 'off' | 'interval' | 'enter') => Promise<void>;
+    setNextCaptureDelay: (delayMs: number) => Promise<void>;
   };
   mcp: {
     contacts: {
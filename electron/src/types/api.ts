@@ -96,10 +96,11 @@ export interface DatabasePromise {
   extracted_from_screenshot: boolean;
   screenshot_id?: string;
   screenshot_timestamp?: string;
-  extraction_data?: string; // JSON string
-  potential_actions?: string; // JSON string of EnhancedPotentialAction[]
-  metadata?: string; // JSON string
-  action?: string; // JSON string of Action
+  // jsonb columns; rows written before the jsonb migration hold JSON strings
+  extraction_data?: ParsedExtractionData | string;
+  potential_actions?: EnhancedPotentialAction[] | string;
+  metadata?: Record<string, any> | string;
+  action?: Record<string, any> | string;
   due_date?: string; // ISO date string
   person?: string; // Who the promise was made to
   platform?: string; // Where the promise was made (Messages, Discord, Slack, etc.)
@@ -132,7 +133,9 @@ export const parsePromiseActions = (promise: DatabasePromise): ParsedPromiseWith
   
   try {
     if (promise.potential_actions) {
-      parsed.potential_actions_parsed = JSON.parse(promise.potential_actions);
+      parsed.potential_actions_parsed = typeof promise.potential_actions === 'string'
+        ? JSON.parse(promise.potential_actions)
+        : promise.potential_actions;
     }
   } catch (error) {
     console.error('Failed to parse potential_actions:', error);
@@ -141,7 +144,9 @@ export const parsePromiseActions = (promise: DatabasePromise): ParsedPromiseWith
   
   try {
     if (promise.extraction_data) {
-      parsed.extraction_data_parsed = JSON.parse(promise.extraction_data);
+      parsed.extraction_data_parsed = typeof promise.extraction_data === 'string'
+        ? JSON.parse(promise.extraction_data)
+        : promise.extraction_data;
     }
   } catch (error) {
     console.error('Failed to parse extraction_data:', error);
@@ -82,10 +82,13 @@ class AutoPromiseManager: ObservableObject {
             
             // Extract promises using BAML API (multipart form data)
             NSLog("🚀 Calling BAML API with image data...")
+            let frontmostApp = NSWorkspace.shared.frontmostApplication
             let response = try await bamlClient.extractPromisesFromImageData(
                 imageData,
                 screenshotId: screenshot.id,
-                screenshotTimestamp: ISO8601DateFormatter().string(from: screenshot.timestamp)
+                screenshotTimestamp: ISO8601DateFormatter().string(from: screenshot.timestamp),
+                appName: frontmostApp?.localizedName,
+                bundleId: frontmostApp?.bundleIdentifier
             )
             
             // Process detected promises
@@ -80,7 +80,9 @@ class BAMLAPIClient: ObservableObject {
     func extractPromisesFromImageData(
         _ imageData: Data,
         screenshotId: String? = nil,
-        screenshotTimestamp: String? = nil
+        screenshotTimestamp: String? = nil,
+        appName: String? = nil,
+        bundleId: String? = nil
     ) async throws -> PromiseListResponse {
         let url = URL(string: "\(baseURL)/extract_promises_file_auth")!
         
@@ -126,6 +128,16 @@ class BAMLAPIClient: ObservableObject {
             body.append("\r\n".data(using: .utf8)!)
         }
         
+        // Add the frontmost app, so the backend can skip apps that never contain promises,
+        // and the timezone relative deadlines ("tomorrow at 8") are resolved in
+        for (name, value) in [("app_name", appName), ("bundle_id", bundleId), ("timezone", TimeZone.current.identifier)] as [(String, String?)] {
+            guard let value = value else { continue }
+            body.append("--\(boundary)\r\n".data(using: .utf8)!)
+            body.append("Content-Disposition: form-data; name=\"\(name)\"\r\n\r\n".data(using: .utf8)!)
+            body.append(value.data(using: .utf8)!)
+            body.append("\r\n".data(using: .utf8)!)
+        }
+        
         body.append("--\(boundary)--\r\n".data(using: .utf8)!)
         
         request.httpBody = body
@@ -59,6 +59,72 @@ struct Promise: Codable, Identifiable, Equatable {
     }
 }
 
+// MARK: - JSONB Columns
+// extraction_data, action and metadata are jsonb. Rows written before the jsonb migration hold JSON
+// strings, newer rows hold objects; both decode to the JSON text so the model's fields stay String?.
+extension Promise {
+    init(from decoder: Decoder) throws {
+        let container = try decoder.container(keyedBy: CodingKeys.self)
+        id = try container.decodeIfPresent(Int64.self, forKey: .id)
+        created_at = try container.decode(Date.self, forKey: .created_at)
+        updated_at = try container.decode(Date.self, forKey: .updated_at)
+        content = try container.decode(String.self, forKey: .content)
+        owner_id = try container.decode(UUID.self, forKey: .owner_id)
+        resolved = try container.decodeIfPresent(Bool.self, forKey: .resolved)
+        extracted_from_screenshot = try container.decodeIfPresent(Bool.self, forKey: .extracted_from_screenshot)
+        screenshot_id = try container.decodeIfPresent(String.self, forKey: .screenshot_id)
+        screenshot_timestamp = try container.decodeIfPresent(String.self, forKey: .screenshot_timestamp)
+        resolved_screenshot_id = try container.decodeIfPresent(String.self, forKey: .resolved_screenshot_id)
+        resolved_screenshot_time = try container.decodeIfPresent(String.self, forKey: .resolved_screenshot_time)
+        resolved_reason = try container.decodeIfPresent(String.self, forKey: .resolved_reason)
+        extraction_data = try container.decodeJSONText(forKey: .extraction_data)
+        action = try container.decodeJSONText(forKey: .action)
+        metadata = try container.decodeJSONText(forKey: .metadata)
+        due_date = try container.decodeIfPresent(String.self, forKey: .due_date)
+        person = try container.decodeIfPresent(String.self, forKey: .person)
+        platform = try container.decodeIfPresent(String.self, forKey: .platform)
+    }
+}
+
+/// Any JSON value, so a jsonb column can be decoded whatever its shape
+private enum JSONValue: Codable {
+    case string(String), number(Double), bool(Bool), object([String: JSONValue]), array([JSONValue]), null
+
+    init(from decoder: Decoder) throws {
+        let container = try decoder.singleValueContainer()
+        if container.decodeNil() { self = .null }
+        else if let value = try? container.decode(Bool.self) { self = .bool(value) }
+        else if let value = try? container.decode(Double.self) { self = .number(value) }
+        else if let value = try? container.decode(String.self) { self = .string(value) }
+        else if let value = try? container.decode([JSONValue].self) { self = .array(value) }
+        else { self = .object(try container.decode([String: JSONValue].self)) }
+    }
+
+    func encode(to encoder: Encoder) throws {
+        var container = encoder.singleValueContainer()
+        switch self {
+        case .string(let value): try container.encode(value)
+        case .number(let value): try container.encode(value)
+        case .bool(let value): try container.encode(value)
+        case .object(let value): try container.encode(value)
+        case .array(let value): try container.encode(value)
+        case .null: try container.encodeNil()
+        }
+    }
+}
+
+extension KeyedDecodingContainer {
+    /// A jsonb column as JSON text: strings are returned as-is, other values are re-encoded
+    func decodeJSONText(forKey key: Key) throws -> String? {
+        guard let value = try decodeIfPresent(JSONValue.self, forKey: key) else { return nil }
+        switch value {
+        case .null: return nil
+        case .string(let text): return text
+        default: return String(data: try JSONEncoder().encode(value), encoding: .utf8)
+        }
+    }
+}
+
 // MARK: - Promise Creation Model (without ID for new promises)
 struct NewPromise: Codable {
     let content: String
@@ -92,16 +158,31 @@ extension Promise {
         return created_at > oneDayAgo
     }
     
-    var formattedDueDate: String? {
+    // due_date is a timestamptz ("2025-07-18T23:59:59+00:00"); older rows may hold a plain date
+    var dueDate: Date? {
         guard let due_date = due_date else { return nil }
-        // Try to parse and format the due date
+        let isoFormatter = ISO8601DateFormatter()
+        if let date = isoFormatter.date(from: due_date) {
+            return date
+        }
+        isoFormatter.formatOptions = [.withInternetDateTime, .withFractionalSeconds]
+        if let date = isoFormatter.date(from: due_date) {
+            return date
+        }
         let formatter = DateFormatter()
         formatter.dateFormat = "yyyy-MM-dd"
-        if let date = formatter.date(from: due_date) {
-            formatter.dateStyle = .medium
-            return formatter.string(from: date)
-        }
-        return due_date
+        return formatter.date(from: due_date)
+    }
+    
+    var formattedDueDate: String? {
+        guard let due_date = due_date else { return nil }
+        guard let date = dueDate else { return due_date }
+        let formatter = DateFormatter()
+        formatter.dateStyle = .medium
+        // Deadlines with a time of day ("tomorrow at 8") show it; end-of-day deadlines show just the date
+        let components = Calendar.current.dateComponents([.hour, .minute], from: date)
+        formatter.timeStyle = (components.hour == 23 && components.minute == 59) ? .none : .short
+        return formatter.string(from: date)
     }
     
     var displayPerson: String {
@@ -1057,18 +1057,30 @@ struct WidgetPromiseRow: View {
         }
     }
     
-    private func formatDueDate(_ dueDateString: String) -> String? {
+    // due_date is a timestamptz ("2025-07-18T23:59:59+00:00"); older rows may hold a plain date
+    private func parseDueDate(_ dueDateString: String) -> Date? {
+        let isoFormatter = ISO8601DateFormatter()
+        if let date = isoFormatter.date(from: dueDateString) {
+            return date
+        }
+        isoFormatter.formatOptions = [.withInternetDateTime, .withFractionalSeconds]
+        if let date = isoFormatter.date(from: dueDateString) {
+            return date
+        }
         let formatter = DateFormatter()
         formatter.dateFormat = "yyyy-MM-dd"
-        guard let date = formatter.date(from: dueDateString) else { return nil }
+        return formatter.date(from: dueDateString)
+    }
+    
+    private func formatDueDate(_ dueDateString: String) -> String? {
+        guard let date = parseDueDate(dueDateString) else { return nil }
+        let formatter = DateFormatter()
         formatter.dateStyle = .medium
         return formatter.string(from: date)
     }
     
     private func isOverdue(_ dueDateString: String) -> Bool {
-        let formatter = DateFormatter()
-        formatter.dateFormat = "yyyy-MM-dd"
-        guard let dueDate = formatter.date(from: dueDateString) else { return false }
+        guard let dueDate = parseDueDate(dueDateString) else { return false }
         return dueDate < Date()
     }
 }
@@ -0,0 +1,73 @@
+-- Database-enforced promise dedup: a normalized fingerprint per open promise, unique per owner.
+-- public.promise_fingerprint must stay in sync with backend/fingerprints.py.
+-- Safe to re-run: every fingerprint is recomputed.
+
+-- The first version bucketed on the deadline text
+DROP FUNCTION IF EXISTS public.promise_fingerprint(text, text, text);
+DROP FUNCTION IF EXISTS public.promise_deadline(jsonb);
+
+-- sha256 of "content|recipient|day", content and recipient lowercased with non-alphanumerics collapsed to
+-- single spaces; recipient defaults to "myself"; day is the UTC day of the due date, else of creation, so
+-- the same promise made again on a later day ("Call mom" / "tomorrow") is a new promise
+CREATE OR REPLACE FUNCTION public.promise_fingerprint(content text, person text, due_date timestamptz, created_at timestamptz)
+RETURNS text LANGUAGE sql STABLE AS $$
+  SELECT encode(sha256(convert_to(
+    btrim(regexp_replace(lower(coalesce(content, '')), '[^a-z0-9]+', ' ', 'g'))
+    || '|' || coalesce(nullif(btrim(regexp_replace(lower(coalesce(person, '')), '[^a-z0-9]+', ' ', 'g')), ''), 'myself')
+    || '|' || to_char(coalesce(due_date, created_at, now()) AT TIME ZONE 'UTC', 'YYYY-MM-DD'),
+    'UTF8')), 'hex')
+$$;
+
+ALTER TABLE public.promises
+ADD COLUMN IF NOT EXISTS fingerprint text;
+
+-- Rebuilt below, after the backfill
+DROP INDEX IF EXISTS public.idx_promises_owner_fingerprint;
+
+-- Backfill: the oldest open row of each duplicate group gets the fingerprint; later duplicates and
+-- resolved rows get NULL (NULLs don't conflict), so existing rows are never deleted
+WITH ranked AS (
+  SELECT
+    id,
+    public.promise_fingerprint(content, person, due_date, created_at) AS fp,
+    row_number() OVER (
+      PARTITION BY owner_id, public.promise_fingerprint(content, person, due_date, created_at)
+      ORDER BY created_at, id
+    ) AS rn
+  FROM public.promises
+  WHERE resolved IS NOT TRUE
+)
+UPDATE public.promises p
+SET fingerprint = CASE WHEN ranked.rn = 1 THEN ranked.fp END
+FROM ranked
+WHERE p.id = ranked.id
+  AND p.fingerprint IS DISTINCT FROM CASE WHEN ranked.rn = 1 THEN ranked.fp END;
+
+UPDATE public.promises
+SET fingerprint = NULL
+WHERE resolved IS TRUE AND fingerprint IS NOT NULL;
+
+-- The arbiter for the backend's upsert (on_conflict=owner_id,fingerprint). Not a partial index
+-- (WHERE NOT resolved): PostgREST's on_conflict can't name the predicate, so Postgres wouldn't infer
+-- it. Resolved rows leave the index by having their fingerprint cleared instead (trigger below).
+CREATE UNIQUE INDEX IF NOT EXISTS idx_promises_owner_fingerprint ON public.promises(owner_id, fingerprint);
+
+-- Inserts that don't send a fingerprint (e.g. from the Electron renderer) get one; resolving a promise
+-- clears it, so a recurring promise can be saved again. A reopened promise stays without one (dedup
+-- for it falls back to ShouldSaveNewPromise).
+CREATE OR REPLACE FUNCTION public.set_promise_fingerprint()
+RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+  IF NEW.resolved IS TRUE THEN
+    NEW.fingerprint := NULL;
+  ELSIF TG_OP = 'INSERT' AND NEW.fingerprint IS NULL THEN
+    NEW.fingerprint := public.promise_fingerprint(NEW.content, NEW.person, NEW.due_date, NEW.created_at);
+  END IF;
+  RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS promises_set_fingerprint ON public.promises;
+CREATE TRIGGER promises_set_fingerprint
+BEFORE INSERT OR UPDATE OF resolved ON public.promises
+FOR EACH ROW EXECUTE FUNCTION public.set_promise_fingerprint();
@@ -0,0 +1,84 @@
+-- Native jsonb values in the promises table's jsonb columns.
+-- Older rows hold JSON strings inside jsonb (the backend and Electron app used to JSON.stringify before
+-- inserting). This adds the procedure that rewrites them to real objects in batches, and resolve_promise,
+-- which merges the resolution into metadata server-side. Safe to apply in one transaction.
+--
+-- The rewrite itself is a separate step, jsonb_native_columns_backfill.sql: the procedure commits after
+-- each batch, which a single-transaction run (psql -1, the Supabase SQL editor) doesn't allow.
+
+-- A jsonb value with a JSON string unwrapped. Strings that aren't JSON (or that hold another string)
+-- become {"raw": "..."} so every row ends up rewritten.
+CREATE OR REPLACE FUNCTION public.jsonb_unwrap(value jsonb)
+RETURNS jsonb LANGUAGE plpgsql IMMUTABLE AS $$
+DECLARE
+  parsed jsonb;
+BEGIN
+  IF value IS NULL OR jsonb_typeof(value) <> 'string' THEN
+    RETURN value;
+  END IF;
+  BEGIN
+    parsed := (value #>> '{}')::jsonb;
+  EXCEPTION WHEN others THEN
+    RETURN jsonb_build_object('raw', value #>> '{}');
+  END;
+  IF jsonb_typeof(parsed) = 'string' THEN
+    RETURN jsonb_build_object('raw', parsed #>> '{}');
+  END IF;
+  RETURN parsed;
+END;
+$$;
+
+-- Rewrites string-encoded rows in id ranges of batch_size, committing after each range
+CREATE OR REPLACE PROCEDURE public.unwrap_promise_json_columns(batch_size integer DEFAULT 1000)
+LANGUAGE plpgsql AS $$
+DECLARE
+  last_id bigint := 0;
+  max_id bigint;
+  rewritten integer;
+BEGIN
+  SELECT coalesce(max(id), 0) INTO max_id FROM public.promises;
+  WHILE last_id < max_id LOOP
+    UPDATE public.promises
+    SET extraction_data = public.jsonb_unwrap(extraction_data),
+        action = public.jsonb_unwrap(action),
+        metadata = public.jsonb_unwrap(metadata),
+        potential_actions = public.jsonb_unwrap(potential_actions)
+    WHERE id > last_id AND id <= last_id + batch_size
+      AND (jsonb_typeof(extraction_data) = 'string' OR jsonb_typeof(action) = 'string'
+        OR jsonb_typeof(metadata) = 'string' OR jsonb_typeof(potential_actions) = 'string');
+    GET DIAGNOSTICS rewritten = ROW_COUNT;
+    IF rewritten > 0 THEN
+      RAISE NOTICE 'Rewrote % promise rows with ids in (%, %]', rewritten, last_id, last_id + batch_size;
+    END IF;
+    last_id := last_id + batch_size;
+    COMMIT;
+  END LOOP;
+END;
+$$;
+
+-- Marks a user's open promises with the given content resolved, merging the resolution into metadata
+-- in the same statement (no read-modify-write round trip). Returns the updated rows.
+CREATE OR REPLACE FUNCTION public.resolve_promise(
+  p_owner_id uuid,
+  p_content text,
+  p_screenshot_id text,
+  p_screenshot_time text,
+  p_reason text,
+  p_evidence text
+)
+RETURNS SETOF public.promises LANGUAGE sql AS $$
+  UPDATE public.promises
+  SET resolved = true,
+      resolved_screenshot_id = p_screenshot_id,
+      resolved_screenshot_time = p_screenshot_time,
+      resolved_reason = p_reason,
+      updated_at = now(),
+      metadata = (CASE WHEN jsonb_typeof(public.jsonb_unwrap(metadata)) = 'object' THEN public.jsonb_unwrap(metadata) ELSE '{}'::jsonb END)
+        || jsonb_build_object('resolution_evidence', p_evidence, 'resolution_reasoning', p_reason)
+  WHERE owner_id = p_owner_id AND content = p_content AND resolved = false
+  RETURNING *;
+$$;
+
+-- Only the backend (service role) resolves promises through this function
+REVOKE ALL ON FUNCTION public.resolve_promise(uuid, text, text, text, text, text) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.resolve_promise(uuid, text, text, text, text, text) TO service_role;
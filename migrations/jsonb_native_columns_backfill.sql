@@ -0,0 +1,5 @@
+-- Rewrites string-encoded jsonb values in the promises table to real objects (after jsonb_native_columns.sql).
+-- Run on its own, outside an explicit transaction (psql -f without -1): the procedure commits after each
+-- batch of 1000 ids, which fails with "invalid transaction termination" inside a transaction block.
+-- Safe to re-run; rows already rewritten are skipped.
+CALL public.unwrap_promise_json_columns();
@@ -0,0 +1,48 @@
+-- Incremental sync: clients read the promises changed after a cursor, in (updated_at, id) order.
+
+-- Rows that never got an updated_at sort by creation time. This runs before the trigger below exists,
+-- so the trigger doesn't overwrite these values.
+UPDATE public.promises SET updated_at = created_at WHERE updated_at IS NULL;
+ALTER TABLE public.promises ALTER COLUMN updated_at SET DEFAULT now();
+
+-- Every write moves the row to the end of the feed, including writes by the clients themselves.
+-- clock_timestamp (not now()) narrows the gap between a row's updated_at and its commit.
+CREATE OR REPLACE FUNCTION public.touch_promise_updated_at()
+RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+  NEW.updated_at := clock_timestamp();
+  RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS promises_touch_updated_at ON public.promises;
+CREATE TRIGGER promises_touch_updated_at
+BEFORE INSERT OR UPDATE ON public.promises
+FOR EACH ROW EXECUTE FUNCTION public.touch_promise_updated_at();
+
+-- The keyset: one index range scan per page
+CREATE INDEX IF NOT EXISTS idx_promises_owner_updated_id ON public.promises(owner_id, updated_at, id);
+
+-- A page of the owner's rows changed after (p_after_updated_at, p_after_id); NULLs start from the beginning.
+-- Rows changed in the last p_settle_ms are held back: a transaction that commits late must not land behind
+-- a cursor that was already handed out.
+CREATE OR REPLACE FUNCTION public.promise_changes(
+  p_owner_id uuid,
+  p_after_updated_at timestamptz,
+  p_after_id bigint,
+  p_limit integer,
+  p_settle_ms integer DEFAULT 1000
+)
+RETURNS SETOF public.promises LANGUAGE sql STABLE AS $$
+  SELECT *
+  FROM public.promises
+  WHERE owner_id = p_owner_id
+    AND (updated_at, id) > (coalesce(p_after_updated_at, '-infinity'::timestamptz), coalesce(p_after_id, 0))
+    AND updated_at <= clock_timestamp() - make_interval(secs => p_settle_ms / 1000.0)
+  ORDER BY updated_at, id
+  LIMIT p_limit;
+$$;
+
+-- Only the backend (service role) reads the feed; it passes the authenticated user's id
+REVOKE ALL ON FUNCTION public.promise_changes(uuid, timestamptz, bigint, integer, integer) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.promise_changes(uuid, timestamptz, bigint, integer, integer) TO service_role;
@@ -0,0 +1,21 @@
+-- due_date holds the resolved deadline (timestamptz), filled in by the backend on insert.
+-- set_promise_due_dates writes a batch of them in one statement, for backend/backfill_due_dates.py.
+
+-- updates: [{"id": 1, "due_date": "2025-07-18T23:59:59+00:00"}, ...]. Only rows whose due_date is still
+-- NULL are written, so a re-run never overwrites a date set since. Returns the number of rows updated.
+CREATE OR REPLACE FUNCTION public.set_promise_due_dates(updates jsonb)
+RETURNS integer LANGUAGE sql AS $$
+  WITH updated AS (
+    UPDATE public.promises p
+    SET due_date = u.due_date,
+        updated_at = now()
+    FROM jsonb_to_recordset(updates) AS u(id bigint, due_date timestamptz)
+    WHERE p.id = u.id AND p.due_date IS NULL
+    RETURNING 1
+  )
+  SELECT count(*)::integer FROM updated;
+$$;
+
+-- Only the backend (service role) runs the backfill
+REVOKE ALL ON FUNCTION public.set_promise_due_dates(jsonb) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.set_promise_due_dates(jsonb) TO service_role;